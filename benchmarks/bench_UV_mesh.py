@@ -0,0 +1,57 @@
+"""
+Benchmark of the bulk uv read (UV_mesh) and the UDIM bucketing of uv_list without MODO.
+ArraySource stands in for the Mesh SDK: the read time is packing the python lists,
+the accessor calls in MODO are not part of it. The per-polygon loop is the bucketing of the old uv_list for comparison.
+
+python benchmarks/bench_UV_mesh.py [quads]
+"""
+
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import UV_mesh
+import UV_udim
+
+
+def quad_mesh(quads, tiles=10):
+    """ArraySource with quads spread over tiles x tiles UDIMs, one uv map 'Texture'"""
+    side = int(math.ceil(math.sqrt(quads)))
+    size = 0.5 * tiles / side
+    polygons = []
+    uvs = []
+    for index in xrange(quads):
+        u0 = (index % side) * (float(tiles) / side)
+        v0 = (index // side) * (float(tiles) / side)
+        polygons.append([index * 4, index * 4 + 1, index * 4 + 2, index * 4 + 3])
+        uvs.append([(u0, v0), (u0 + size, v0), (u0 + size, v0 + size), (u0, v0 + size)])
+
+    return UV_mesh.ArraySource(polygons, {"Texture":uvs})
+
+
+def main(quads):
+    source = quad_mesh(quads)
+
+    t1 = time.time()
+    poly_uvs = source.read("Texture")
+    print "Read of %s quads (pack): %.3f s" % (quads, time.time() - t1)
+
+    t1 = time.time()
+    first = poly_uvs.first_uvs()
+    udim_map = UV_udim.bucket_polys(poly_uvs.poly_index(), first[:, 0], first[:, 1])
+    print "Bucketing into %s UDIMs: %.3f s" % (len(udim_map), time.time() - t1)
+
+    # Old uv_list: one dict append per polygon
+    t1 = time.time()
+    buckets = {}
+    for poly, corner_uvs in enumerate(source.uvmaps["Texture"]):
+        u, v = corner_uvs[0]
+        buckets.setdefault(1001 + int(math.floor(v)) * 10 + int(math.floor(u)), []).append(poly)
+    print "Per-polygon loop into %s UDIMs: %.3f s" % (len(buckets), time.time() - t1)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,94 @@
+"""
+Benchmark of the filename parser (MTK_filename) against the old create_TagsFromFilename
+of MARI_Tools, which split each filename with the delimiters of the template.
+Checks that both give the same tags for all names.
+
+python benchmarks/bench_filename.py [filenames]
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import MTK_filename
+
+MARI_VARS = MTK_filename.MARI_VARS
+
+
+def old_tags(fileNameUser, fileName):
+    """create_TagsFromFilename before MTK_filename"""
+    foundMARI_vars = []
+    for i in MARI_VARS:
+        if i in fileNameUser:
+            foundMARI_vars.insert(fileNameUser.index(i), i)
+
+    if len(foundMARI_vars) == 1 and '$UDIM' in foundMARI_vars:
+        delimiter = filter(None, fileNameUser.replace('$UDIM', '%3%').split('%3%'))
+        for i in delimiter:
+            if i in fileName:
+                fileName = fileName.replace(i, '%3%')
+        for string in fileName.split('%3%'):
+            try:
+                int(string)
+            except:
+                pass
+            else:
+                if len(string) == 4:
+                    return {foundMARI_vars[0][:4]:string}
+
+    else:
+        d = filter(None, re.split("\\" + "|\\".join(MARI_VARS), fileNameUser))
+        d = re.escape("|".join(d)).replace('\\|', '|')
+
+        fileVars = {}
+        fileName = filter(None, re.split(d, fileName))
+        for var in foundMARI_vars:
+            fileVars[var[:4]] = fileName[foundMARI_vars.index(var)]
+        return fileVars
+
+
+def file_names(count, template):
+    """Filenames of 50 entities x 10 channels x UDIMs, count in total"""
+    names = []
+    for index in xrange(count):
+        values = {"$ENTITY":"Mesh%02d" % (index % 50), "$CHANNEL":"channel%d" % (index // 50 % 10),
+                  "$UDIM":str(1001 + index // 500 % 100)}
+        name = template
+        for var, value in values.iteritems():
+            name = name.replace(var, value)
+        names.append(name)
+
+    return names
+
+
+def run(template, names):
+    print "%s filenames, template %s" % (len(names), template)
+
+    t1 = time.time()
+    old = [old_tags(template, name) for name in names]
+    print "  old:         %.3f s" % (time.time() - t1)
+
+    MTK_filename.templates.clear()
+    t1 = time.time()
+    new = [MTK_filename.parse(template, name) for name in names]
+    print "  parse:       %.3f s" % (time.time() - t1)
+
+    MTK_filename.templates.clear()
+    t1 = time.time()
+    tags, errors = MTK_filename.parse_batch(template, names)
+    print "  parse_batch: %.3f s" % (time.time() - t1)
+
+    same = old == new and not errors and all(tags[name] == new_tags for name, new_tags in zip(names, new))
+    print "  same tags as the old parser: %s" % same
+
+
+def main(count):
+    run("$ENTITY_$CHANNEL.$UDIM", file_names(count, "$ENTITY_$CHANNEL.$UDIM"))
+    run("_$UDIM", file_names(count, "$ENTITY_$CHANNEL_$UDIM"))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
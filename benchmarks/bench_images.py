@@ -0,0 +1,73 @@
+"""
+Benchmark of the file probe (MTK_images.probe_files) on small PNG tiles in a temp folder,
+serial and with the thread pool. Network storage is simulated with a sleep in each stat.
+
+python benchmarks/bench_images.py [files] [latency in ms]
+"""
+
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import MTK_filename
+import MTK_images
+
+
+def png_header(width, height):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr + b"\0\0\0\0"
+
+
+def write_tiles(directory, count):
+    """count tiles of 10 channels, every tenth one an 8x8 placeholder"""
+    paths = []
+    for index in xrange(count):
+        path = os.path.join(directory, "Mesh_channel%s.%s.png" % (index % 10, 1001 + index // 10))
+        size = 8 if index % 10 == 9 else 4096
+        with open(path, "wb") as tile:
+            tile.write(png_header(size, size))
+        paths.append(path)
+
+    return paths
+
+
+def parse(path):
+    return MTK_filename.parse("$ENTITY_$CHANNEL.$UDIM", os.path.splitext(os.path.basename(path))[0])
+
+
+def run(paths, latency):
+    stat = os.stat
+    if latency:
+        def slow_stat(path):
+            time.sleep(latency)
+            return stat(path)
+        os.stat = slow_stat
+
+    try:
+        for workers in (1, MTK_images.WORKERS):
+            rows, seconds = MTK_images.probe_files(paths, parse, workers)
+            print "  %2s threads: %.3f s, %s placeholders" % (
+                workers, seconds, len(MTK_images.filter_placeholders(rows)[1]))
+    finally:
+        os.stat = stat
+
+
+def main(count, latency_ms):
+    directory = tempfile.mkdtemp()
+    try:
+        paths = write_tiles(directory, count)
+        print "%s tiles on the local disk" % count
+        run(paths, 0)
+        print "%s tiles, %s ms latency per stat" % (count, latency_ms)
+        run(paths, latency_ms / 1000.0)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000, float(sys.argv[2]) if len(sys.argv) > 2 else 2.0)
@@ -0,0 +1,61 @@
+"""
+Benchmark of placing image maps into their UDIM masks (MARI_Tools.moveImageMaps):
+the old loop over all masks per image against the join of MTK_scene.MaskIndex.
+The commands are counted, not run. The new version selects the images of a mask
+through the selection API and sends one texture.parent per mask.
+
+python benchmarks/bench_masks.py [entities]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import MTK_scene
+
+CHANNELS = 5
+UDIMS = 10
+
+
+def scene(entities):
+    """UDIM masks of entities x UDIMS and one image per entity, udim and channel"""
+    masks = {}
+    images = {}
+    for entity in xrange(entities):
+        for udim in xrange(1001, 1001 + UDIMS):
+            masks["mask_%s_%s" % (entity, udim)] = {'$MTK':'UDIM_mask', '$ENT':"Mesh%s" % entity, '$UDI':str(udim)}
+            for channel in xrange(CHANNELS):
+                images["img_%s_%s_%s" % (entity, udim, channel)] = {'$ENT':"Mesh%s" % entity, '$UDI':str(udim)}
+
+    return images, masks
+
+
+def old_moves(images, masks, evaluate):
+    """moveImageMaps before the join"""
+    for imageID, imageTag in images.iteritems():
+        UDIM_val = imageTag['$UDI']
+        for maskID, tags in masks.iteritems():
+            if tags['$MTK'] == 'UDIM_mask' and tags['$UDI'] == UDIM_val and tags['$ENT'] == imageTag['$ENT']:
+                evaluate('select.item %s' % imageID)
+                evaluate('texture.parent %s -1' % maskID)
+
+
+def new_moves(images, masks, evaluate):
+    for maskID, imageIDs in MTK_scene.MaskIndex.from_items(masks).udim_targets(images).iteritems():
+        evaluate('texture.parent {%s} -1' % maskID)
+
+
+def main(entities):
+    images, masks = scene(entities)
+    print "%s images, %s UDIM masks" % (len(images), len(masks))
+    for name, moves in (("old", old_moves), ("join", new_moves)):
+        sent = []
+        t1 = time.time()
+        moves(images, masks, sent.append)
+        print "  %-4s %.3f s, %s commands" % (name, time.time() - t1, len(sent))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 60)
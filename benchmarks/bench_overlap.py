@@ -0,0 +1,56 @@
+"""
+Benchmark of UV_overlap.find_overlaps without MODO.
+A grid of quads fills UDIM 1001, one shell of 1000 quads is stacked on top of it.
+The points are jittered a little, so the quads don't line up with the overlap grid.
+
+python benchmarks/bench_overlap.py [quads]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import numpy as np
+
+import UV_mesh
+import UV_overlap
+import UV_udim
+
+
+def quad_uvs(quads, side, shift=0.0):
+    """Corner uvs of a quad grid with side quads per row in 0-1"""
+    index = np.arange(quads)
+    size = 1.0 / side
+    u0 = (index % side) * size + shift
+    v0 = (index // side) * size + shift
+
+    uvs = np.empty((quads, 4, 2))
+    uvs[:, :, 0] = u0[:, None] + np.array([0, size, size, 0])
+    uvs[:, :, 1] = v0[:, None] + np.array([0, 0, size, size])
+    uvs = uvs.reshape(-1, 2)
+
+    # Shared points get the same offset, so the quads stay connected
+    jitter = np.sin(uvs * 7919.0 * side) * 0.2 * size
+    return uvs + jitter[:, ::-1]
+
+
+def main(quads):
+    side = int(np.ceil(np.sqrt(quads)))
+    uvs = np.concatenate((quad_uvs(quads, side), quad_uvs(1000, side, shift=0.3 / side)))
+    poly_num = quads + 1000
+
+    offsets = np.arange(0, poly_num * 4 + 1, 4, dtype=np.int32)
+    uv_data = UV_mesh.PolyUVs(offsets, np.arange(poly_num * 4), uvs)
+    first_uvs = uv_data.first_uvs()
+    udim_map = UV_udim.bucket_polys(uv_data.poly_index(), first_uvs[:, 0], first_uvs[:, 1])
+
+    t1 = time.time()
+    overlaps, tests = UV_overlap.find_overlaps(uv_data, udim_map)
+    print "%s quads: %s overlapping polys, %s exact tests, %.2f s" % (
+        poly_num, len(overlaps.polys), tests, time.time() - t1)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2400000)
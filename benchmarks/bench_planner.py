@@ -0,0 +1,60 @@
+"""
+Benchmark of the import planning (MTK_planner.plan_import) without MODO.
+3000 files of 50 entities x 6 channels x 10 UDIMs, 100 of the 300 folders are in the scene.
+
+python benchmarks/bench_planner.py [entities]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import MTK_planner
+from MTK_scene import FolderRegistry
+
+CHANNELS = ["diffuse", "spec", "bump", "gloss", "sss", "disp"]
+
+
+def file_rows(entities, udims=10):
+    """Probe rows of entities x channels x udims files"""
+    rows = []
+    for entity in xrange(entities):
+        for channel in CHANNELS:
+            for udim in xrange(1001, 1001 + udims):
+                tags = {'$ENTITY':"Mesh%02d" % entity, '$CHANNEL':channel, '$UDIM':str(udim)}
+                rows.append({'path':"/textures/Mesh%02d_%s.%s.tif" % (entity, channel, udim), 'tags':tags})
+
+    return rows
+
+
+def scene_folders(rows, count):
+    """Registry with the folders of the first count entity/channel pairs"""
+    registry = FolderRegistry()
+    for row in rows:
+        if len(registry) == count:
+            break
+        registry.add("folder%s" % len(registry), row['tags'])
+
+    return registry
+
+
+def main(entities):
+    rows = file_rows(entities)
+    registry = scene_folders(rows, 100)
+    entity_masks = dict(("Mesh%02d" % entity, "mask%s" % entity) for entity in xrange(0, entities, 2))
+
+    t1 = time.time()
+    plan = MTK_planner.plan_import(rows, registry, entity_masks)
+    print "Plan of %s files, %s existing folders: %.3f s" % (len(rows), len(registry), time.time() - t1)
+    for step, count in sorted(plan.summary().iteritems()):
+        print "  %s: %s" % (step, count)
+
+    t1 = time.time()
+    plan.without([row['path'] for row in rows[::7]])
+    print "Plan without every 7th file: %.3f s" % (time.time() - t1)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,57 @@
+"""
+Benchmark of the incremental UDIM selection set update (UV_selSets.create_selSets)
+without MODO: fingerprint diff, UDIM update and grouping of the moved polys.
+Reading the uvs through the Mesh SDK is not part of it.
+
+python benchmarks/bench_selSets.py [quads]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import numpy as np
+
+import UV_udim
+
+
+def quad_grid(quads, tiles=10):
+    """Offsets and uvs of quads spread over tiles x tiles UDIMs"""
+    side = int(np.ceil(np.sqrt(quads)))
+    index = np.arange(quads)
+    u0 = (index % side) * (float(tiles) / side)
+    v0 = (index // side) * (float(tiles) / side)
+    size = 0.5 * tiles / side
+
+    uvs = np.empty((quads, 4, 2))
+    uvs[:, :, 0] = u0[:, None] + np.array([0, size, size, 0])
+    uvs[:, :, 1] = v0[:, None] + np.array([0, 0, size, size])
+
+    offsets = np.arange(0, quads * 4 + 1, 4, dtype=np.int32)
+    return offsets, uvs.reshape(-1, 2)
+
+
+def main(quads):
+    offsets, uvs = quad_grid(quads)
+
+    t1 = time.time()
+    assignment = UV_udim.UDIMAssignment(offsets, uvs)
+    print "First run, assignment of %s quads: %.3f s" % (quads, time.time() - t1)
+
+    # Move one island of 1000 quads into the next UDIM
+    moved_uvs = uvs.copy()
+    moved_uvs[:4000, 0] += 1.0
+
+    t1 = time.time()
+    changed, old_udims = assignment.update(offsets, moved_uvs)
+    new_udims = assignment.udims[changed]
+    moved = old_udims != new_udims
+    sets = UV_udim.group_by_udim(changed[moved], new_udims[moved])
+    print "Update, %s polys changed, %s moved into %s UDIMs: %.3f s" % (
+        len(changed), moved.sum(), len(sets), time.time() - t1)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000000)
@@ -1,5 +1,15 @@
 #python
 
+import sys
+
+# The helper modules are in the scripts folder of the kit
+kit_scripts = lx.eval("query platformservice alias ? {kit_MARIToolKit:scripts}")
+if kit_scripts not in sys.path:
+    sys.path.append(kit_scripts)
+
+import UV_mesh
+import UV_selSets
+
 def scanMatGroups():
     """Look for UDIM group masks in the shader tree. Returns a list of the ptag values of the group mask."""
     sceneservice.select("item.N", "all")
@@ -29,17 +39,22 @@ def renderID():
             return sceneservice.query("item.id")
             break
 
-def UDIMSets():
-    # Get UDIM selection sets in scene
+def mainLayer():
+    """Return the ID of the main layer"""
     layerservice.select("layer", "main")
-    polysetNum = layerservice.query("polset.N")
-    data = []
-    for i in range(polysetNum):
-        layerservice.select("polset.name", str(i))
-        polySetName = layerservice.query("polset.name")
-        if "UDIM" in polySetName:
-            data.append(polySetName)
-    return data
+    return layerservice.query("layer.id")
+
+def UDIMSets():
+    """
+    Return the UDIM selection set names which exist on the main layer.
+    The names are read from the polygon tags in one pass through the Mesh SDK.
+    """
+    try:
+        source = UV_mesh.MeshSource(mainLayer())
+    except LookupError:
+        return []
+
+    return sorted(source.selSet_names(UV_selSets.PREFIX))
 
 def createMaterial(maskColorTag):
     """
@@ -94,7 +109,12 @@ def sortIntoGroups():
             lx.eval("texture.parent %s -1" %maskDict[key])
 
 def checkSelSets():
-    if not UDIMSets():
+    """
+    Create the UDIM selection sets if they are missing or don't match the UDIMs of the uvs.
+    The UDIMs of the uvs come from the cached UDIMMap of the selected uv map.
+    """
+    uvmap_name = lx.eval("vertMap.list txuv ?")
+    if not UDIMSets() or UV_selSets.stale_meshes([mainLayer()], uvmap_name):
         lx.eval("@UV_tools.py create_selSets")
     else:
         pass
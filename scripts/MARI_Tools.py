@@ -5,7 +5,7 @@ MARI TOOLs
 Bjoern Siegert aka nicelife
 
 Arguments:
-loadFiles, gammaCorrect, setUVoffset, sortSelection, createPolySets
+loadFiles, gammaCorrect, setUVoffset, sortSelection, createPolySets, fixUVs, repackUDIMs, checkOverlaps, analyzeTextures
 
 Import textures from MARI and some tools to manage these:
 For import the user can choose:
@@ -19,41 +19,53 @@ Tools:
 - Gamma correction of imported texutres if needed
 - Sort the images in scene tree in alphabetic order
 - Create polygon sets for each UDIM
+- Repack the uv islands of all UDIMs
+- Find overlapping uvs in each UDIM
+- Texel density and texture memory per UDIM against a budget, checked before the import
 """
 
-import re
+import sys
 import lx
 import lxu.select
 
+# Make the other kit scripts importable
+kit_scripts = lx.eval("query platformservice alias ? {kit_MARIToolKit:scripts}")
+if kit_scripts not in sys.path:
+    sys.path.append(kit_scripts)
+
+import MTK_commands
+import MTK_effects
+import MTK_filename
+import MTK_images
+import MTK_planner
+import MTK_scene
+import MTK_sort
+# The UV modules (UV_mesh, UV_selSets, UV_texel) need NumPy.
+# They are imported by the UV tools only, so all other tools run without it.
+
 def locator_ID(imageMap_ID):
     """
     Find ID of the texture locator of an image map. The ID of the image map in the shadertree is needed as argument.
+    The locator is looked up in the shade graph index of this command.
     """
-    layerservice.select('texture.N', 'all')
-    texture_num = layerservice.query('texture.N')
-    # Parse through all textures until texture ID of layer matches the selected one.
-    for i in xrange(texture_num):
-        layerservice.select('texture.id', str(i))
-        texture_ID = layerservice.query('texture.id')
-        if texture_ID == imageMap_ID:            
-            return layerservice.query('texture.locator') #retruns the texture locator ID
+    return shade_graph().locator(imageMap_ID) or texture_table().locator(imageMap_ID) #retruns the texture locator ID
 
 def create_imageMap(clipName, uvmap, UVoffSet):
     """
     Create texture in shader tree with the given file and UVoffset values.
     Returns imageMap.id
     """
-    lx.eval("shader.create constant")
-    lx.eval("item.setType imageMap textureLayer")
-    lx.eval("texture.setIMap {%s}" %clipName)
-    lx.eval("item.channel txtrLocator$useUDIM false")
-    lx.eval("item.channel imageMap$aa false")
-    lx.eval("item.channel txtrLocator$projType uv")
-    lx.eval("texture.setUV {%s}" %uvmap)
-    lx.eval("item.channel txtrLocator$tileU reset")
-    lx.eval("item.channel txtrLocator$tileV reset")
-    lx.eval("item.channel txtrLocator$m02 %s" %UVoffSet[0])
-    lx.eval("item.channel txtrLocator$m12 %s" %UVoffSet[1])
+    commands.eval("shader.create constant")
+    commands.eval("item.setType imageMap textureLayer")
+    commands.eval("texture.setIMap {%s}" %clipName)
+    commands.eval("item.channel txtrLocator$useUDIM false")
+    commands.eval("item.channel imageMap$aa false")
+    commands.eval("item.channel txtrLocator$projType uv")
+    commands.eval("texture.setUV {%s}" %uvmap)
+    commands.eval("item.channel txtrLocator$tileU reset")
+    commands.eval("item.channel txtrLocator$tileV reset")
+    commands.eval("item.channel txtrLocator$m02 %s" %UVoffSet[0])
+    commands.eval("item.channel txtrLocator$m12 %s" %UVoffSet[1])
     
     sceneservice.select('selection', 'imageMap')
     imageMapID = sceneservice.query('selection')
@@ -61,13 +73,13 @@ def create_imageMap(clipName, uvmap, UVoffSet):
 
 def create_imageMapFromFolder(imageFolderID, uvmap):
     """Create image map with an imageFolder. This will use the automatic UDIM from modo"""
-    lx.eval("shader.create constant")
-    lx.eval("item.setType imageMap textureLayer")
-    lx.eval("texture.setIMap {%s}" %imageFolderID)
-    lx.eval("item.channel txtrLocator$useUDIM true")
-    lx.eval("item.channel imageMap$aa false")
-    lx.eval("item.channel txtrLocator$projType uv")
-    lx.eval("texture.setUV {%s}" %uvmap)    
+    commands.eval("shader.create constant")
+    commands.eval("item.setType imageMap textureLayer")
+    commands.eval("texture.setIMap {%s}" %imageFolderID)
+    commands.eval("item.channel txtrLocator$useUDIM true")
+    commands.eval("item.channel imageMap$aa false")
+    commands.eval("item.channel txtrLocator$projType uv")
+    commands.eval("texture.setUV {%s}" %uvmap)    
     
     sceneservice.select('selection', 'imageMap')
     imageMapID = sceneservice.query('selection')
@@ -79,12 +91,12 @@ def load_files():
     Load in files and save complete paths in a list
     """
     try:
-        lx.eval("dialog.setup fileOpenMulti")
-        lx.eval("dialog.title {Import MARI textures}")
-        lx.eval("dialog.result ok")
-        lx.eval("dialog.open")
+        commands.eval("dialog.setup fileOpenMulti")
+        commands.eval("dialog.title {Import MARI textures}")
+        commands.eval("dialog.result ok")
+        commands.eval("dialog.open")
         
-        return lx.evalN("dialog.result ?")
+        return commands.evalN("dialog.result ?")
     
     except RuntimeError:
         return False
@@ -112,77 +124,20 @@ def get_filename(filePath):
 def create_TagsFromFilename(fileNameUser, fileName):    
     """Extract MARI variables from filename (without extension).
     Returns a dictionary with all found variables and their values:
-    {'$CHA':'diffuse','$UDI':'1002','$ENT':'Mesh'}"""
-    
-    # MARI filename variables
-    MARI_vars = ["$ENTITY", "$CHANNEL", "$UDIM", "$LAYER", "$FRAME", "$NUMBER", "$COUNT", "$[METADATA VALUE]"]
-    
-    foundMARI_vars = []
-    for i in MARI_vars:
-        if i in fileNameUser:
-            foundMARI_vars.insert(fileNameUser.index(i),i) # index is used to maintain the correct order from fileNameUser
-    #lx.out('vars in filename:', foundMARI_vars)
-    
-    # If only the UDIM is in the filename template try
-    # to extract it from the image filename
-    if len(foundMARI_vars) == 1 and '$UDIM' in foundMARI_vars:
-        
-        # Extract the delimiters from filename template
-        delimiter = fileNameUser.replace('$UDIM', '%3%').split('%3%')
-        delimiter = filter(None, delimiter) # Delete empty strings
-
-        # Find delimiter in the actual filename
-        # Reformat the filename to a list
-        for i in delimiter:
-            if i in fileName:
-                fileName = fileName.replace(i, '%3%')
-        fileName = fileName.split('%3%')
-        
-        # Search filename list and look for a
-        # four digit UDIM string and return it
-        for string in fileName:
-            try:
-                int(string)
-            except:
-                pass
-            else:
-                if len(string) == 4:
-                    return {foundMARI_vars[0][:4]:string}
-    
-    else:    
-        ## Extract delimiter from the filename ##
-        # All chars which are not within the MARI_vars are seen as delimiter
-        # Returns a list of delimiters
-        d = fileNameUser # $ENTITY-$CHANNEL.$UDIM
-        d = re.split("\\" + "|\\".join(MARI_vars), d) # re.split uses regular expressions "\\" is used as escape character for "$": join -> "\$ENTITY|\$CHANNEL|\$UDIM" split -> ['','-','.','']
-        d = filter(None, d) # Clean up list -> remove items which are empty e.g.: ''
-        
-        # Convert delimiter to regular expressions
-        # re.escape: escapes all special character in string
-        d = re.escape("|".join(d)).replace('\\|', '|') # convert '\|' -> '|' after re.escape
-        #lx.out('d', d)
-        
-        # Extract the values of the foundMARI_vars from the actual filename
-        fileVars = {}
-        fileName = re.split(d, fileName)
-        #lx.out('filename:', fileName)
-        fileName = filter(None, fileName)
-    
-        for var in foundMARI_vars:
-            fileVars[var[:4]] = fileName[foundMARI_vars.index(var)]
-        return fileVars
+    {'$CHA':'diffuse','$UDI':'1002','$ENT':'Mesh'}
+    The template is compiled once per session (see MTK_filename).
+    Raises MTK_filename.FilenameError if the filename doesn't match the template."""
+    return MTK_filename.parse(fileNameUser, fileName)
     
     
 def get_clipPath(selection): # Not used currently
     """Returns a dictionary. The key is the actual file path of the image map. Per key the current
     position number and the texture ID are saved."""
+    textures = texture_table()
     list = {}
     for imap in selection:
-        layerservice.select('texture.N', 'all')
-        for number in range(layerservice.query('texture.N')):
-            layerservice.select('texture.id', str(number))
-            if layerservice.query('texture.id') == imap:
-                list [layerservice.query('texture.clipFile')] = [number,imap]
+        if imap in textures:
+            list [textures.clip_file(imap)] = [textures.numbers.get(imap),imap]
     return list
 
 
@@ -199,13 +154,51 @@ def getUVoffSet(UDIM):
         return False
 
 def filterClips(clipID, clip_size= 'w:8'):
-    '''Delete a clip which has a given pixel size'''
+    '''Delete a clip which has a given pixel size. Returns True if the clip was deleted.'''
     layerservice.select('clip.N', 'all')
     for num in xrange(layerservice.query('clip.N')):
         layerservice.select('clip.id', str(num))
         if clipID == layerservice.query('clip.id') and clip_size in layerservice.query('clip.info').split(' '):
-            lx.eval('clip.delete')
+            commands.eval('clip.delete')
             lx.out('8x8 clip deleted:', clipID)
+            return True
+    
+    return False
+
+
+def probe_table(fileList, filter_clips, fileNameUser):
+    '''Probe all files before they are loaded: size, date, resolution and the tags from the filename.
+    The files are read side by side by a thread pool. Files which are missing or whose name doesn't
+    match the template are dropped, with filter_clips also the 8x8 placeholder tiles.
+    Returns the rows of the files to load (see MTK_images.probe_file) and the paths
+    whose resolution is unknown; those are still checked with filterClips after loading.'''
+    # A broken template stops the import before any file is read
+    try:
+        template = MTK_filename.compile_template(fileNameUser)
+    except MTK_filename.TemplateError as error:
+        warning_msg(error)
+        return [], set()
+    
+    rows, seconds = MTK_images.probe_files(fileList, parse=lambda path: template.parse(get_filename(path)))
+    lx.out('MARI ToolKit: %s files probed in %.3f sec' %(len(rows), seconds))
+    
+    files = []
+    for row in rows:
+        if row['size'] is None:
+            lx.out('File not found:', row['path'])
+        elif not row['tags']:
+            lx.out('There was a problem with the filename: ', row['error'] or get_filename(row['path']))
+        else:
+            files.append(row)
+    
+    unchecked = set()
+    if filter_clips == True:
+        files, placeholders, unknown = MTK_images.filter_placeholders(files)
+        for row in placeholders:
+            lx.out('8x8 texture skipped:', row['path'])
+        unchecked = set(row['path'] for row in unknown)
+    
+    return files, unchecked
        
     
 def set_gamma(value):
@@ -214,7 +207,7 @@ def set_gamma(value):
     selection = sceneservice.queryN('selection')
     if selection:
         for i in selection:
-            lx.eval("item.channel imageMap$gamma %s" %value)
+            commands.eval("item.channel imageMap$gamma %s" %value)
     else:
         lx.out("MARI ToolKit: nothing selected")
     
@@ -246,35 +239,32 @@ def loadTextures(fileList, filter_clips, fileNameUser, UVmap_name):
     Returns Dictionary of created textures: {}'''
 
     # Clear Selection
-    lx.eval('select.drop item')    
+    commands.eval('select.drop item')    
     
-    # Setup tags from filename, create clip and then create tags for clip    
+    # Probe all files first. Placeholder tiles are not loaded at all
+    fileTable, unchecked = probe_table(fileList, filter_clips, fileNameUser)
+    
+    # Tags come from the filename, create clip and then create tags for clip    
     clipList = {}
-    for clipPath in fileList:
-        try:
-            tags = create_TagsFromFilename(fileNameUser, get_filename(clipPath))
-        except:
-            lx.out('There was a problem with the filename: ',get_filename(clipPath))
-            continue
-        
+    for row in fileTable:
+        clipPath = row['path']
+        tags = dict(row['tags'])
         tags[MTK_TYPE] = 'imageMap'
         
         # Load texture as clip
-        lx.eval("clip.addStill %s" %clipPath)
+        commands.eval("clip.addStill %s" %clipPath)
+        sceneservice.select('selection', 'videoStill')
+        clipID = sceneservice.query('selection')            
         
-        # Check clip size if delete 8x8 textures should be ignored
-        if filter_clips == True:
-            sceneservice.select('selection', 'videoStill')
-            clipID = sceneservice.query('selection')            
-            filterClips(clipID, clip_size='w:8')
+        # Files without a readable header are checked for 8x8 after loading
+        if clipPath in unchecked and filterClips(clipID, clip_size='w:8'):
+            continue
         
-        else:
-            # create tags for item
-            createTags(tags)
+        # create tags for item
+        createTags(tags)
 
-            # Save clipID with its tags
-            sceneservice.select('selection', 'videoStill')
-            clipList[sceneservice.query('selection')] = tags
+        # Save clipID with its tags
+        clipList[clipID] = tags
     
     # Create the image maps from the clipList
     imageMaps = {}
@@ -285,109 +275,164 @@ def loadTextures(fileList, filter_clips, fileNameUser, UVmap_name):
     
     return imageMaps
 
-def loadTextures2(fileList, filter_clips, fileNameUser, UVmap_name):
+def loadTextures2(fileTable, unchecked, fileNameUser, UVmap_name):
     '''Uses the new UDIM functionality introduced in modo 801. 
     Loads the textures into image folders in the clip browser. Sets the UDIM according to the filename.
     If channel and/or entity is specified in the filename template the folder name is $ENTITY_$CHANNEL.
+    With $ENTITY in the template the image maps are moved into their ENTITY mask, missing masks are created.
+    The whole import is planned first (see MTK_planner) and then executed.
+    fileTable, unchecked: the probed files of probe_table
     
     returns dict of created imagemaps'''
     
-    # Clear Selection and walk through files
-    lx.eval('select.drop item')    
-    clipList = {}
-    for clipPath in fileList:
-        
-        # Clear selection and scan for image folders
-        lx.eval('select.drop item')
-        imageFolders = getItemTags(item_type='imageFolder')
+    entity_masks = None
+    if '$ENTITY' in fileNameUser:
+        entity_masks = scene_index().masks.entities
+    
+    # Existing folders are looked up in the folder registry of the scene index.
+    # New folders are added to it by index_item after clip.newFolder.
+    plan = MTK_planner.plan_import(fileTable, scene_index().folders, entity_masks)
+    lx.out('MARI ToolKit: import plan', plan.summary())
+    
+    return execute_importPlan(plan, unchecked, UVmap_name)
 
-        # Extract tags from the filename
-        try:
-            tags = create_TagsFromFilename(fileNameUser, get_filename(clipPath))
 
-        except:
-            lx.out('There was a problem with the filename: ',get_filename(clipPath))
+def execute_importPlan(plan, unchecked, UVmap_name):
+    '''Apply a MTK_planner.ImportPlan to the scene.
+    unchecked are the files whose resolution is unknown; 8x8 clips of them are deleted after loading.
+    
+    returns dict of created imagemaps {imageMap.id:{tags}}'''
+    
+    # Load all clips and attach their tags
+    commands.eval('select.drop item')
+    clipIDs = {}
+    deleted = []
+    for clipPath, tags in plan.clips:
+        commands.eval("clip.addStill %s" %clipPath)
+        sceneservice.select('selection', 'videoStill')
+        clipID = sceneservice.query('selection')            
+        if clipPath in unchecked and filterClips(clipID, clip_size='w:8'):
+            deleted.append(clipPath)
             continue
-
-        else:
-            # Tags for the image folder; UDIM is removed and MTK_TYPE added
-            tags_folder = tags
-            tags_folder.pop(UDIM, None)
-            tags_folder[MTK_TYPE] = 'imageFolder'
-            
-            # Create image map and check clip size 
-            # If filter_clips is active 8x8 textures are deleted
-            tags[MTK_TYPE] = 'imageMap'
-            lx.eval("clip.addStill %s" %clipPath)
-            if filter_clips == True:
-                sceneservice.select('selection', 'videoStill')
-                clipID = sceneservice.query('selection')            
-                filterClips(clipID, clip_size='w:8')
-            
-            else:
-                # Set the UDIM value and attach tags to image
-                lx.eval('clip.setUdimFromFilename')
-                createTags(tags)
-                
-                # Get clipID
-                sceneservice.select('selection', 'videoStill')
-                clipID = sceneservice.query('selection')            
-            
-            # Create folder name from tags
-            # If neither CHANNEL nor ENTITY is found the default name 'MTK IMPORT' is given
-            if CHANNEL in tags_folder:
-                if ENTITY in tags_folder:
-                    imageFolder_name = tags_folder[ENTITY] + '_' + tags_folder[CHANNEL]
-                else:
-                    imageFolder_name = tags_folder[CHANNEL]
-            elif CHANNEL not in tags_folder:
-                if ENTITY in tags_folder:
-                    imageFolder_name = tags_folder[ENTITY]
-                else:
-                    imageFolder_name = 'MTK IMPORT'
-            
-            # Find a matching image folder
-            # If no folder is found image_folderID is None
-            image_folderID = None
-            for folder_id, folder_tag in imageFolders.iteritems():
-                compare = set(folder_tag.values()) ^ set(tags_folder.values()) # len of zero -> its a match
-                if len(compare) == 0:
-                    image_folderID = folder_id
-                    break
-                else:
-                    pass
-            
-            # Create new image folder
-            if image_folderID == None:    
-                lx.eval('clip.newFolder')
-                
-                createTags(tags_folder)
-                lx.eval('clip.name {%s}' %imageFolder_name)
-            
-                sceneservice.select('selection', 'imageFolder')
-                image_folderID = sceneservice.query('selection')
-                new_imageFolder = True
-            
-            else:
-                new_imageFolder = False
-            
-            # Move image under image folder
-            # If a new folder was created save its id and tags into the clipList
-            # -> only new folders create new imagemaps in the shadertree
-            lx.eval('item.parent {%s} {%s} 0' %(clipID, image_folderID))
-            if new_imageFolder == True:
-                clipList[image_folderID] = tags_folder
-
-    # Create image maps in Shader Tree and return all created maps as a dict
+        
+        # Set the UDIM value and attach tags to image
+        commands.eval('clip.setUdimFromFilename')
+        createTags(tags)
+        index_item(clipID, 'videoStill', tags)
+        clipIDs[clipPath] = clipID
+    
+    # Folders which only had deleted clips are not created
+    if deleted:
+        plan = plan.without(deleted)
+    
+    # Create the new image folders and move the clips into their folder
+    folderIDs = dict(plan.folders)
+    commands.eval('select.drop item')
+    for key, name, tags in plan.new_folders:
+        commands.eval('clip.newFolder')
+        createTags(tags)
+        commands.eval('clip.name {%s}' %name)
+        
+        sceneservice.select('selection', 'imageFolder')
+        folderIDs[key] = sceneservice.query('selection')
+        index_item(folderIDs[key], 'imageFolder', tags)
+    
+    for clipPath, key in plan.clip_parents:
+        commands.eval('item.parent {%s} {%s} 0' %(clipIDs[clipPath], folderIDs[key]))
+    
+    # Missing ENTITY masks are created before the image maps,
+    # so each map is moved right after its creation while it is still selected
+    maskIDs = dict(plan.entity_masks or {})
+    if plan.masks:
+        render = renderID()
+        for entity in plan.masks:
+            commands.eval('select.drop item')
+            maskIDs[entity] = create_mask_ENTITY(render, {'$ENTITY':entity}, name=entity)
+        commands.eval('select.drop item')
+    
+    # Create image maps in Shader Tree, one per new folder
+    map_parents = dict(plan.map_parents)
     imageMaps = {}
-    for folderID, clipTags in clipList.iteritems():
-        imageMapID = create_imageMapFromFolder(folderID, UVmap_name)
-        createTags(clipTags)
-        imageMaps[imageMapID] = clipTags
+    for key, tags in plan.image_maps:
+        imageMapID = create_imageMapFromFolder(folderIDs[key], UVmap_name)
+        createTags(tags)
+        index_item(imageMapID, 'imageMap', tags)
+        if key in map_parents:
+            commands.eval('texture.parent %s -1' %maskIDs[map_parents[key]])
+        imageMaps[imageMapID] = tags
     
     return imageMaps
 
 
+def probe_tiles(fileTable):
+    """Return the probed files as tiles for UV_texel.analyze, before they are loaded.
+    Entity, channel and UDIM come from the filename, size, channels and bit depth from the file header.
+    [{'entity':'Mesh', 'channel':'diffuse', 'udim':1001, 'width':4096, 'height':4096, 'channels':4, 'bits':16, 'file':path},...]"""
+    tiles = []
+    for row in fileTable:
+        tags = row['tags']
+        if row['width'] is None or UDIM not in tags:
+            lx.out('MARI ToolKit: No UDIM or size found for file', row['path'])
+            continue
+        
+        tiles.append({'entity':tags.get(ENTITY), 'channel':tags.get(CHANNEL), 'udim':int(tags[UDIM]),
+                      'width':row['width'], 'height':row['height'], 'channels':row['channels'] or 4,
+                      'bits':row['bits'] or 8, 'file':row['path']})
+    
+    return tiles
+
+
+def texture_budget(fileTable, meshIDs, uvmap_name):
+    """Planning step of the import: texel density and texture memory of the probed files
+    per UDIM against the budget, written to the event log. Nothing is loaded.
+    Returns False if the files are over the budget."""
+    tiles = probe_tiles(fileTable)
+    if not tiles:
+        return True
+    
+    try:
+        import UV_texel
+    except ImportError:
+        lx.out("MARI ToolKit: Texture budget needs NumPy. Skipped.")
+        return True
+    
+    budget = commands.eval("user.value MARI_TOOLS_texture_budget ?") * 1024 * 1024 # MB -> bytes
+    densities = mesh_densities(meshIDs, uvmap_name)
+    rows, totals = UV_texel.analyze(tiles, densities, commands.eval("user.value MARI_TOOLS_texel_density ?"))
+    
+    for line in UV_texel.report(rows, totals, budget):
+        lx.out("MARI ToolKit: %s" %line)
+    
+    return sum(totals.values()) <= budget
+
+
+def mesh_densities(meshIDs, uvmap_name):
+    """Return the UV_texel.UDIMDensity of each mesh by its name. The key None holds all meshes together.
+    Meshes with the same name are summed up, the textures of an $ENTITY cover all of them.
+    Items which are not meshes or have no such uv map are skipped.
+    {'Mesh':UDIMDensity, None:UDIMDensity}"""
+    import UV_mesh
+    import UV_selSets
+    import UV_texel
+    
+    by_name = {}
+    for meshID in meshIDs:
+        try:
+            source = UV_mesh.MeshSource(meshID)
+            uv_data = source.read(uvmap_name)
+        except LookupError:
+            continue
+        
+        # The UDIMs are sorted from the uvs, the selection sets and their cache are left alone
+        udim_map = UV_selSets.uv_list(uv_data)
+        name = commands.eval('query sceneservice item.name ? {%s}' %meshID)
+        by_name.setdefault(name, []).append(UV_texel.UDIMDensity.from_mesh(uv_data, source.positions(), udim_map))
+    
+    densities = dict((name, UV_texel.UDIMDensity.merge(parts)) for name, parts in by_name.iteritems())
+    densities[None] = UV_texel.UDIMDensity.merge(densities.values())
+    return densities
+
+
 def renderID():
     """Return the render ID of the scene"""
     sceneservice.select("render.N", "all")
@@ -397,46 +442,21 @@ def renderID():
         return sceneservice.query("item.id")
     
 
-def get_UDIMSets(meshIDs):
-    """Return a dict of UDIM selection sets per mesh. A list of meshIDs must be given.
-    {'mesh':['UDIM1','UDIM2']}"""
-    
-    # Clear selection
-    lx.eval('select.drop item mesh') 
-    
-    # Go through the mesh items and save all UDIM selection sets in data
-    data = {}
-    for mesh in meshIDs:
-        lx.eval('select.subItem {0} set mesh'.format(mesh))
-        polysetNum = layerservice.query('polset.N')
-        for i in range(polysetNum):
-            layerservice.select("polset.name", str(i))
-            polySetName = layerservice.query("polset.name")
-            if "UDIM" in polySetName:
-                try:
-                    data[mesh].append(polySetName)
-                except:
-                    data[mesh] = [polySetName]
-            
-    lx.eval('select.drop item mesh')
-    
-    return data
-
-
 def create_mask_ENTITY(parent, tags, name=None):
     '''Create mask for ENTITY and return its mask.id'''
-    lx.eval("shader.create mask")
+    commands.eval("shader.create mask")
     
     sceneservice.select('selection', 'mask')
     maskID = sceneservice.query('selection')
     
-    lx.eval("texture.parent %s 1" %parent)
+    commands.eval("texture.parent %s 1" %parent)
     createTags(tags)
-    lx.eval('item.tag string $MTK ENTITY_mask')
-    lx.eval('item.name {%s} mask' %tags)
+    commands.eval('item.tag string $MTK ENTITY_mask')
+    commands.eval('item.name {%s} mask' %tags)
+    index_item(maskID, 'mask', dict(tags.items() + [(MTK_TYPE, 'ENTITY_mask')]))
     
     if name:
-        lx.eval('item.name {%s} mask' %name)
+        commands.eval('item.name {%s} mask' %name)
 
     return maskID
  
@@ -444,20 +464,21 @@ def create_mask_ENTITY(parent, tags, name=None):
 def create_mask_UDIM(parent, tags, selection_set, createMat=True):
     '''Create mask for UDIM and return its mask.id.
     sets the PTag to a selection set'''
-    lx.eval("shader.create mask")
+    commands.eval("shader.create mask")
 
     sceneservice.select('selection', 'mask')
     maskID = sceneservice.query('selection')
     
-    lx.eval("texture.parent %s 0" %parent)
+    commands.eval("texture.parent %s 0" %parent)
     createTags(tags)
-    lx.eval('item.tag string $MTK UDIM_mask')
-    lx.eval("mask.setPTagType {Selection Set}")
-    lx.eval("mask.setPTag {%s}" %selection_set)
+    commands.eval('item.tag string $MTK UDIM_mask')
+    index_item(maskID, 'mask', dict(tags.items() + [(MTK_TYPE, 'UDIM_mask')]))
+    commands.eval("mask.setPTagType {Selection Set}")
+    commands.eval("mask.setPTag {%s}" %selection_set)
     
     # create material in created group
     if createMat == True:
-        lx.eval("shader.create advancedMaterial")
+        commands.eval("shader.create advancedMaterial")
         createTags(tags)
 
     return maskID
@@ -466,81 +487,150 @@ def create_mask_UDIM(parent, tags, selection_set, createMat=True):
 def create_missing_entityGrps(imageItemList):    
     '''Scans for entity mask groups in the shader tree.
     If a group is missing it is created.'''
-    present_entityIDs = scan_masks('ENTITY_IDs')
+    masks = scene_index().masks
     if '$ENTITY' in fileNameUser:
-        imported_images = {}
-        for image, imageTag in imageItemList.iteritems():
-            try:
-                imported_images[imageTag[ENTITY]].append(image)
-            except:
-                imported_images[imageTag[ENTITY]] = [image]
+        imported_entities = set(imageTag[ENTITY] for imageTag in imageItemList.itervalues() if ENTITY in imageTag)
+        lx.out('imported entities: ', imported_entities)
         
-        lx.out('imported images: ',imported_images)
+        # New masks are added to the mask index, so each entity is only created once
+        for entity in imported_entities:
+            if masks.entity(entity) is None:
+                commands.eval('select.drop item')
+                create_mask_ENTITY(renderID(), {'$ENTITY':entity}, name=entity)
+
+
+def create_missing_masks(imageItemList):
+    '''Create the ENTITY and UDIM mask groups which are missing for the given images.
+    Two cases:
+    - $ENTITY is defined in filename template -> UDIM masks underneath their ENTITY mask
+    - No entity -> only UDIM mask are created
+    New masks are added to the mask index, so images with the same entity and udim
+    don't create double entries.'''
+    masks = scene_index().masks
+    if '$ENTITY' in fileNameUser:
+        # Save entity with its udims for all images
+        # {entity:[udim,udim,...]}
+        entity_udims = {}
+        for imageTag in imageItemList.itervalues():
+            entity_udims.setdefault(imageTag[ENTITY], []).append(imageTag[UDIM])
         
-        created = []
-        for entity, imageID in imported_images.iteritems():
-            if entity not in (present_entityIDs.keys() or created):
-                lx.eval('select.drop item')
-                new_entity = create_mask_ENTITY(renderID(), {'$ENTITY':entity}, name=entity)
-                created.append(new_entity)
+        for entity_name, udim_list in entity_udims.iteritems():
+            entity_mask = masks.entity(entity_name)
+            if entity_mask is None:
+                commands.eval('select.drop item')
+                entity_mask = create_mask_ENTITY(renderID(), {'$ENTITY':entity_name}, name=entity_name)
             else:
-                continue
+                lx.out('already in scene:', masks.entity_udims(entity_name))
+            
+            for udim in udim_list:
+                if masks.udim(entity_name, udim) is None:
+                    commands.eval('select.drop item')
+                    lx.out('created %s in %s' %(udim, entity_name))
+                    create_mask_UDIM(entity_mask, {'$UDIM':udim,'$ENTITY':entity_name}, '$UDIM:'+ udim, createMat=True)
+    
+    else:
+        # Create UDIM mask if these are not in the Shader tree
+        for imageTag in imageItemList.itervalues():
+            udim_val = imageTag[UDIM]
+            if not masks.udim_masks(udim_val):
+                commands.eval('select.drop item')
+                create_mask_UDIM(renderID(), {'$UDIM':udim_val}, '$UDIM:'+ udim_val, createMat=True)
 
 
 def createTags(dictionary):
     '''Create custom tags for a selected item. A dictionary with the tag values must be given.
     {'UDIM':'1011','ENTITY':'Mesh',...}'''
     for key, value in dictionary.iteritems():
-        lx.eval('item.tag string {%s} {%s}' %(key[:4], value)) # key value must be only 4 chars long
+        commands.eval('item.tag string {%s} {%s}' %(key[:4], value)) # key value must be only 4 chars long
+
+
+def scene_index():
+    '''Return the SceneIndex of this command. The scene is scanned only on the first call.'''
+    global sceneIndex
+    if sceneIndex is None:
+        sceneIndex = MTK_scene.SceneIndex.scan(sceneservice)
+    return sceneIndex
+
+
+def channel_effects():
+    '''Return the $CHANNEL to shader effect table of this command. The user values are read only on the first call.'''
+    global channelEffects
+    if channelEffects is None:
+        channelEffects = MTK_effects.effect_table(lambda name: commands.eval("user.value %s ?" %name))
+    return channelEffects
+
+
+def texture_table():
+    '''Return the TextureTable of this command. The textures are scanned only on the first call.'''
+    global textureTable
+    if textureTable is None:
+        textureTable = MTK_scene.TextureTable.scan(layerservice, sceneservice)
+    return textureTable
+
+
+def shade_graph():
+    '''Return the ShadeGraphIndex of this command. The shade-loc graph is walked only on the first call.'''
+    global shadeGraph
+    if shadeGraph is None:
+        shadeGraph = MTK_scene.ShadeGraphIndex.scan(MTK_scene.shadeGraph_links())
+    return shadeGraph
+
+
+def create_missingTags(imageMaps, imageTags):
+    '''Create the tags of image maps which have none yet. The tags are taken from the filename of their clip.
+    imageTags are the present tags {item.id:{tagType:tag}}'''
+    textures = texture_table()
+    for imageMap in imageMaps:
+        filePath = textures.clip_file(imageMap)
+        if imageMap not in imageTags and filePath:
+            try:
+                newTags = create_TagsFromFilename(fileNameUser, get_filename(filePath))
+            except ValueError as error:
+                lx.out('MARI ToolKit:', error)
+                continue
+            
+            commands.eval('select.item %s set' %imageMap)
+            newTags[MTK_TYPE] = 'imageMap'
+            createTags(newTags)
+            index_item(imageMap, 'imageMap', newTags)
+
+
+def index_item(itemID, item_type, tags):
+    '''Add an item created or tagged in this command to the SceneIndex,
+    so it is found without scanning the scene again.'''
+    if sceneIndex is not None:
+        sceneIndex.add(itemID, item_type, dict((key[:4], value) for key, value in tags.iteritems()))
 
 def move2entityMasks(images, masks):
-    """Move images into their entity mask groups"""
-    for imageID, imageTag in images.iteritems():
-        try:
-            entity = imageTag[ENTITY]
-        except:
-            continue
-        else:
-            for maskID, maskTags in masks.iteritems():
-                if maskTags[MTK_TYPE] == 'ENTITY_mask' and maskTags[ENTITY] == entity:
-                    lx.eval('select.item %s' %imageID)
-                    lx.eval('texture.parent %s -1' %maskID)                    
+    """Move images into their entity mask groups.
+    The masks are joined with the images on the entity. Expects two dicts: {item.id:{tags}}"""
+    parent_grouped(MTK_scene.MaskIndex.from_items(masks).entity_targets(images))
+
 
 def moveImageMaps(images, masks):
-    '''Move image maps to their UDIM_mask. Expects two dicts: {item.id:{tags}}'''
-    for imageID, imageTag in images.iteritems():
-        try:
-            ENTITY_val = imageTag[ENTITY]
-        except:
-            ENTITY_val = False
-        
-        # If a ENTITY is in the imageTags find the correct UDIM_mask underneath the ENTITY_mask and move image there
-        if ENTITY_val != False:
-            UDIM_val = imageTag[UDIM]
-            for maskID, tags in masks.iteritems():
-                if tags[MTK_TYPE] == 'UDIM_mask' and tags[UDIM] == UDIM_val and tags[ENTITY] == ENTITY_val:
-                    lx.eval('select.item %s' %imageID)
-                    lx.eval('texture.parent %s -1' %maskID)
-
-        # Where no ENTITY_mask is found image is moved to the nearest UDIM_mask which matches
-        else:
-            UDIM_val = imageTag[UDIM]
-            for maskID, tags in masks.iteritems():
-                if tags[MTK_TYPE] == 'UDIM_mask' and tags[UDIM] == UDIM_val:
-                    lx.eval('select.item %s' %imageID)
-                    lx.eval('texture.parent %s -1' %maskID)   
+    '''Move image maps to their UDIM_mask. Expects two dicts: {item.id:{tags}}
+    The masks are joined with the images on (entity, udim), see MTK_scene.MaskIndex.udim_targets.'''
+    parent_grouped(MTK_scene.MaskIndex.from_items(masks).udim_targets(images))
 
 
+def parent_grouped(targets):
+    '''Move image maps into their masks in one batch. The images of a mask are selected
+    together and moved with one texture.parent. {mask.id:[imageMap.id,...]}'''
+    for maskID, imageIDs in targets.iteritems():
+        select_items(imageIDs)
+        commands.eval('texture.parent {%s} -1' %maskID)
 
-def check_UDIMSelSets(meshIDs):
-    """Check if selection sets are already created for the selected mesh item."""
-    if not get_UDIMSets(meshIDs):
-        try:
-            dialog_yesNo('There are no UDIM selection sets. Should I create them? This could take a while. So maybe you grab a coffe.')
-            for mesh in meshIDs:
-                lx.eval('select.subItem %s set mesh' %mesh)
-                lx.eval("@UV_tools.py create_selSets")
-        except:
+
+def check_UDIMSelSets(meshIDs, uvmap_name):
+    """Check if selection sets are already created and up to date for the selected mesh items.
+    Meshes with unchanged uvs are looked up in the UDIM cache."""
+    import UV_selSets
+    
+    stale = UV_selSets.stale_meshes(meshIDs, uvmap_name)
+    if stale:
+        if dialog_yesNo('UDIM Selection Sets', 'There are missing or outdated UDIM selection sets. Should I create them? This could take a while. So maybe you grab a coffe.'):
+            UV_selSets.batch_create_selSets(stale, uvmap_name)
+        else:
             return False
     else:
         lx.out("MARI ToolKit: UDIM selection sets existing.")
@@ -570,34 +660,18 @@ def setShaderEffect(imageItemList=None):
     bump
     displace
     normal.
-    """
-    # $CHANNEL user values
-    chan_diff = lx.eval("user.value MARI_TOOLS_CHAN_diff ?")
-    chan_spec = lx.eval("user.value MARI_TOOLS_CHAN_spec ?")
-    chan_refl = lx.eval("user.value MARI_TOOLS_CHAN_refl ?")
-    chan_bump = lx.eval("user.value MARI_TOOLS_CHAN_bump ?")
-    chan_dspl = lx.eval("user.value MARI_TOOLS_CHAN_displ ?")
-    chan_nrml = lx.eval("user.value MARI_TOOLS_CHAN_normal ?")
     
+    The $CHANNEL user values are read once per command (see channel_effects).
+    The images are grouped by effect and each effect is set for its whole group at once.
+    """
     # Mapping from user values to shader effects #
-    chan_values = {chan_diff:"diffColor",
-                   chan_spec:"specAmount",
-                   chan_refl:"reflAmount",
-                   chan_bump:"bump",
-                   chan_dspl:"displace",
-                   chan_nrml:"normal"
-                   }
+    chan_values = channel_effects()
     
     sceneservice.select("selection", "imageMap")
     selection = sceneservice.queryN("selection")
     
     if selection and imageItemList is None:
-        itemList = getItemTags('imageMap')
-        
-        # remove not found items
-        for imageID, value in getItemTags('imageMap').iteritems():
-            if imageID not in selection:
-                del itemList[imageID]
+        itemList = getItemTags(selection=selection)
         
     elif imageItemList is None and not selection:
         itemList = getItemTags('imageMap')
@@ -605,51 +679,32 @@ def setShaderEffect(imageItemList=None):
     elif imageItemList is not None:
         itemList = imageItemList
     
-    for imageID, tags in itemList.iteritems():
-        try:
-            chan_image = tags[CHANNEL]
-        except:
-            continue
-        
-        sceneservice.select("item.type", str(imageID))
-        if chan_image in chan_values:
-            lx.eval("select.subItem {%s} set textureLayer" %imageID)
-            lx.eval("shader.setEffect {%s}" %chan_values[chan_image])
+    for effect, imageIDs in MTK_effects.group_by_effect(itemList, chan_values).iteritems():
+        select_items(imageIDs)
+        commands.eval("shader.setEffect {%s}" %effect)
+
+
+def select_items(itemIDs):
+    """Select all items in one go through the selection API instead of one select command per item"""
+    lxu.select.ItemSelection().select(list(itemIDs))
+    commands.selected(itemIDs)
      
             
 def getImageMaps(clip_list):
     """From Matt Cox. Returns a list of all the clips which are used in the shader tree.
-    returns only the name of the clip not the extension."""
+    returns only the name of the clip not the extension.
+    The image maps of each clip are looked up in the shade graph index of this command."""
+    graph = shade_graph()
     images = []
     
     for clip_obj in clip_list:
+        if isinstance(clip_obj, basestring):
+            clipID = clip_obj
+        else:
+            clipID = lx.object.Item(clip_obj).Ident()
         
-        try:
-            scn_svc = lx.service.Scene ()
-            
-            clip_type = scn_svc.ItemTypeLookup (lx.symbol.sITYPE_VIDEOSTILL)
-            image_type = scn_svc.ItemTypeLookup (lx.symbol.sITYPE_IMAGEMAP)
-            
-            scene = lxu.select.SceneSelection().current()
-            graph = lx.object.ItemGraph (scene.GraphLookup (lx.symbol.sGRAPH_SHADELOC))
-            
-            if isinstance (clip_obj, str) == True:
-                clip = scene.ItemLookupIdent (clip_obj)
-            else:
-                clip = lx.object.Item (clip_obj)
-                    
-            if clip.TestType (clip_type) == False:
-                return []
-            
-            count = graph.RevCount (clip)
-            
-            for i in range (count):
-                image = graph.RevByIndex (clip, i)
-                if image.TestType (image_type) == True:
-                    images.append (get_filename(clip_obj.split(";")[0]))
-                    
-        except:
-            pass
+        for image in graph.clip_maps.get(clipID, []):
+            images.append(get_filename(clipID.split(";")[0]))
             
     return images
 
@@ -665,161 +720,71 @@ def get_shaderTreeIndex(parent, item):
         pass
 
 def sortST(selection, item_type):
-    '''Sort specific shader tree items alphabetically. Structure is maintained.'''
+    '''Sort specific shader tree items alphabetically. Structure is maintained.
+    The items are sorted into the places they already take up underneath their parent.
+    Names are compared naturally, so UDIMs and other numbers sort by value.
+    Only items which are out of order are moved (see MTK_sort).'''
     # Check if something is selected
     if selection and len(selection) > 0:    
-        # Look up exposed item names and sort them in alphabetic order
-        itemList = []
-        for item in selection:
-            sceneservice.select('item', item)
-            itemList.append(sceneservice.query('item.name'))
-        itemList = sorted(itemList, key=str.lower)
-        lx.out(itemList)
-        # Check the item type and find the items position in shader tree
-        # Dict structure: {parent:[[indices],[items]]}
-        data = {}
-        for item in itemList:
-            lx.out(data)
-            lx.out('------------')
-            lx.out('item.id', item)
-            itemID = lx.eval('query sceneservice item.id ? {%s}' %item)
-            sceneservice.select('item.type', itemID)
+        if isinstance(selection, basestring): # A single selected item
+            selection = [selection]
+        
+        # Group the items by their parent. Items are resolved by ID, names can be ambiguous.
+        names = {}
+        parents = {}
+        for itemID in selection:
+            sceneservice.select('item', itemID)
             if sceneservice.query('item.type') == item_type:
-                lx.out(itemID)
-                parent = sceneservice.query('item.parent')
-                try:
-                    data[parent][0].append(get_shaderTreeIndex(parent, itemID))
-                    data[parent][1].append(item)
-                except:
-                    data[parent] = [[get_shaderTreeIndex(parent, itemID)],[itemID]]
-        lx.out(data)        
-        # Sort the items in the shader tree
-        for parent, value in data.iteritems():
-            bottomItem = (min(value[0]))
-            itemList = value[1]
-            for item in itemList:
-                lx.eval('select.item {%s}' %(item))
-                lx.eval('texture.parent {%s} {%s}' %(parent, bottomItem))
+                names[itemID] = sceneservice.query('item.name')
+                parents.setdefault(sceneservice.query('item.parent'), []).append(itemID)
+        
+        # The child order of each parent is read once
+        moves = 0
+        for parent, items in parents.iteritems():
+            sceneservice.select('item', parent)
+            children = list(sceneservice.queryN('item.children'))
+            target = MTK_sort.target_order(children, items, lambda item: (MTK_sort.natural_key(names[item]), item))
+            
+            for item, index in MTK_sort.minimal_moves(children, target):
+                commands.eval('select.item {%s} set' %item)
+                commands.eval('texture.parent {%s} {%s}' %(parent, index))
+                moves += 1
+        
+        lx.out('MARI ToolKit: %s items sorted, %s moved' %(len(names), moves))
     else:
         lx.out('Nothing selected or wrong type defined')
 
     
 def getItemTags(item_type='all', selection=None):
     '''Find item tags in scene created from the MARI Tool Kit. Default: all items are searched. A selection can also be given
-    Returns {item.id{tagType:tag,}}'''
+    Returns {item.id{tagType:tag,}}
+    The tags are looked up in the SceneIndex, the scene is only scanned once per command.'''
     # {item.id:{ENTITY:name,UDIM:1001,CHANNEL:diffuse}}
-    data = {}
-    if selection:
-        lx.out('selection: ',selection)
-        if isinstance(selection, str) == True:
-            selection = [selection]
-        for i in selection:            
-            sceneservice.select('item.id', str(i))
-            itemID = sceneservice.query('item.id')
-            try:
-                itemTagTypes = sceneservice.queryN('item.tagTypes')
-                itemTags = sceneservice.queryN('item.tags')
-                if '$MTK' in itemTagTypes:
-                    data[itemID] = dict(zip(itemTagTypes, itemTags))
-            except:
-                pass
-
-    else:
-        sceneservice.select('item.N', 'all')
-        item_num = sceneservice.query('item.N')
-        for item in xrange(item_num):
-            sceneservice.select('item.id', str(item))
-            itemID = sceneservice.query('item.id')
-            if sceneservice.query('item.type') == item_type or item_type == 'all':
-                try:
-                    itemTagTypes = sceneservice.queryN('item.tagTypes')
-                    itemTags = sceneservice.queryN('item.tags')
-                    if '$MTK' in itemTagTypes:
-                        data[itemID] = dict(zip(itemTagTypes, itemTags))
-                except:
-                    pass
-    return data
+    return scene_index().items(item_type, selection)
 
 
-def scan_masks(mode):
-    '''Returns a dict {entity:[maskid1,maskid2,...],...}.
-    Args:
-    ENTITY_UDIMs: {entity:[udim1, udim2]}
-    ENTITY_IDs: {entity:'mask01',entity:'mask02}
-    UDIM_IDs: {udim:[mesh1,mesh2,...]}'''
-
-    data={}
-    
-    # Create list with entities and all udims underneath them
-    if mode == 'ENTITY_UDIMs':
-        sceneservice.select('mask.N', 'all')
-        for num in xrange(sceneservice.query('mask.N')):
-            sceneservice.select('mask.id', str(num))
-            maskID = sceneservice.query('mask.id')
-            tagTypes = sceneservice.queryN('mask.tagTypes')
-            tagValues = sceneservice.queryN('mask.tags')
-
-            if (UDIM and ENTITY) in tagTypes and 'UDIM_mask' in tagValues:
-                temp = dict(zip(tagTypes, tagValues))                
-                try:
-                    data[temp[ENTITY]][temp[UDIM]] = maskID
-                except:
-                    data[temp[ENTITY]] = {temp[UDIM]:maskID}
-
-        return data
-
-    # Create list with entity names and all the mask ids
-    elif mode == 'ENTITY_IDs':
-        sceneservice.select('mask.N', 'all')
-        for num in xrange(sceneservice.query('mask.N')):
-            sceneservice.select('mask.id', str(num))
-            maskID = sceneservice.query('mask.id')
-            tagTypes = sceneservice.queryN('mask.tagTypes')
-            tagValues = sceneservice.queryN('mask.tags')
-            
-            if ENTITY in tagTypes and 'ENTITY_mask' in tagValues:
-                temp = dict(zip(tagTypes, tagValues))                
-                data[temp[ENTITY]] = maskID
-    
-        return data
-    
-    elif mode == 'UDIM_IDs':
-        sceneservice.select('mask.N', 'all')
-        for num in xrange(sceneservice.query('mask.N')):
-            sceneservice.select('mask.id', str(num))
-            maskID = sceneservice.query('mask.id')
-            tagTypes = sceneservice.queryN('mask.tagTypes')
-            tagValues = sceneservice.queryN('mask.tags')
-            
-            if UDIM in tagTypes and 'UDIM_mask' in tagValues:
-                temp = dict(zip(tagTypes, tagValues))                
-                data[temp[UDIM]] = maskID
-
-        return data
-                
-
 ##------------ DIALOGS & MESSAGES -----------##
 def warning_msg(name):
     """A modal warning dialog. Message text can be set through name var."""
     try:
-        lx.eval("dialog.setup warning")
-        lx.eval("dialog.title {Error}")
-        lx.eval("dialog.msg {Ooopsy. %s.}" %name)
-        lx.eval("dialog.result ok")
-        lx.eval("dialog.open")
+        commands.eval("dialog.setup warning")
+        commands.eval("dialog.title {Error}")
+        commands.eval("dialog.msg {Ooopsy. %s.}" %name)
+        commands.eval("dialog.result ok")
+        commands.eval("dialog.open")
         
     except RuntimeError:
         pass
 
 def dialog_yesNo(header, text):
     try:
-        lx.eval("dialog.setup yesNo")
-        lx.eval("dialog.title {%s}" %header)
-        lx.eval("dialog.msg {%s}" %text)
-        lx.eval("dialog.result ok")
-        lx.eval("dialog.open")
+        commands.eval("dialog.setup yesNo")
+        commands.eval("dialog.title {%s}" %header)
+        commands.eval("dialog.msg {%s}" %text)
+        commands.eval("dialog.result ok")
+        commands.eval("dialog.open")
         
-        lx.eval("dialog.result ?")
+        commands.eval("dialog.result ?")
         return True
     
     except RuntimeError:
@@ -828,13 +793,13 @@ def dialog_yesNo(header, text):
 
 def dialog_brake():
     try:
-        lx.eval("dialog.setup yesNo")
-        lx.eval("dialog.title {Coffee Brake?}")
-        lx.eval("dialog.msg {This could take a while. Do you want to grab a cup of coffee?}")
-        lx.eval("dialog.result ok")
-        lx.eval("dialog.open")
+        commands.eval("dialog.setup yesNo")
+        commands.eval("dialog.title {Coffee Brake?}")
+        commands.eval("dialog.msg {This could take a while. Do you want to grab a cup of coffee?}")
+        commands.eval("dialog.result ok")
+        commands.eval("dialog.open")
         
-        lx.eval("dialog.result ?")
+        commands.eval("dialog.result ?")
         return True
     
     except RuntimeError:
@@ -846,16 +811,21 @@ def dialog_brake():
 ## MODO SERVICES ##
 layerservice = lx.Service("layerservice")
 sceneservice = lx.Service("sceneservice")
+commands = MTK_commands.CommandLayer(lx.eval, lx.evalN) # All commands go through it, redundant selections are dropped
 
 ## TAG TYPE VALUES ##
-MTK_TYPE = '$MTK' # Type description: ENTITY_mask, UDIM_mask, imageMap
-ENTITY = '$ENT'
-UDIM = '$UDI'
-CHANNEL = '$CHA'
+MTK_TYPE = MTK_scene.MTK_TYPE # Type description: ENTITY_mask, UDIM_mask, imageMap
+ENTITY = MTK_scene.ENTITY
+UDIM = MTK_scene.UDIM
+CHANNEL = MTK_scene.CHANNEL
 
 ## VARIABLES ##
 args = lx.args()[0] # Arguments. Only the first argument is passed.
 maskColorTag = "none" # Color tag for UDIM mask groups
+sceneIndex = None # MTK_scene.SceneIndex, built on the first lookup of this command
+textureTable = None # MTK_scene.TextureTable, built on the first lookup of this command
+shadeGraph = None # MTK_scene.ShadeGraphIndex, built on the first lookup of this command
+channelEffects = None # {channel name:shader effect} of the user values, read on the first lookup of this command
 
 ## Store Layer index and vmaps ##
 layerservice.select('layer.id','main')
@@ -867,11 +837,11 @@ vmap_num = layerservice.query('vmap.N') # Number of vertex maps of selected mesh
 #################################
 #           USER VALUES         #
 #################################
-gamma_correction = lx.eval("user.value MARI_TOOLS_gamma ?") # Gamma correction on/off
-gamma_value = lx.eval("user.value MARI_TOOLS_gammavalue ?") # Gamma value from UI
-fileNameUser = lx.eval("user.value MARI_TOOLS_filename ?") # Filename structure
-filter_clips = lx.eval("user.value MARI_TOOLS_filter_clips ?") # Delete 8x8 clips on/off
-create_maskGroups = lx.eval("user.value MARI_TOOLS_create_maskGroups ?") # create missing UDIM mask groups on/off
+gamma_correction = commands.eval("user.value MARI_TOOLS_gamma ?") # Gamma correction on/off
+gamma_value = commands.eval("user.value MARI_TOOLS_gammavalue ?") # Gamma value from UI
+fileNameUser = commands.eval("user.value MARI_TOOLS_filename ?") # Filename structure
+filter_clips = commands.eval("user.value MARI_TOOLS_filter_clips ?") # Delete 8x8 clips on/off
+create_maskGroups = commands.eval("user.value MARI_TOOLS_create_maskGroups ?") # create missing UDIM mask groups on/off
 
 
 ######################################
@@ -921,35 +891,37 @@ if args == "organizeLoadFiles2":
         UVmap_name = vmap_selected(vmap_num, layer_index)        
         
         # Open dialog to load image files
-        fileList = load_files() 
+        fileList = load_files() or []
+        
+        # Probe all files first. Placeholder tiles are not loaded at all
+        fileTable, unchecked = probe_table(fileList, filter_clips, fileNameUser)
+        
+        # Planning step: memory of the incoming tiles against the budget. A budget of 0 skips it.
+        if fileTable and commands.eval("user.value MARI_TOOLS_texture_budget ?") > 0:
+            if not texture_budget(fileTable, mesh_items, UVmap_name) and not dialog_yesNo('Texture Budget',
+                    'The textures are over the memory budget. Have a look at the event log for lower resolutions. Import anyway?'):
+                fileTable = []
+                lx.out("MARI ToolKit: Canceld by user.")
         
         # Load the textures and create image maps in shader tree
-        imageItemList = loadTextures2(fileList, filter_clips, fileNameUser, UVmap_name)
+        imageItemList = loadTextures2(fileTable, unchecked, fileNameUser, UVmap_name)
      
         if imageItemList:
             
             # Check if the selection sets are created
-            check_UDIMSelSets(mesh_items)
-            
-            # Clear selection
-            lx.eval('select.drop item')
-            
-            # Find present mask groups in shadertree
-            # And create missing groups for imported images
-            create_missing_entityGrps(imageItemList) 
-            
-            # Sort the images into their masks and change the shader effect
-            move2entityMasks(imageItemList, getItemTags('mask'))                        
+            check_UDIMSelSets(mesh_items, UVmap_name)
             
+            # The images were sorted into their ENTITY masks by the import plan
+            # Change the shader effect
             if CHANNEL in fileNameUser:
                 setShaderEffect(imageItemList)
             else:
                 pass
             
             # Select imported images
-            lx.eval('select.drop item')
+            commands.eval('select.drop item')
             for i in imageItemList.keys():
-                lx.eval('select.subItem {0} add textureLayer'.format(i))
+                commands.eval('select.subItem {0} add textureLayer'.format(i))
         
             if gamma_correction == True:
                 set_gamma(gamma_value)            
@@ -1008,75 +980,13 @@ if args == "organizeLoadFiles":
         if imageItemList:
             
             ## Check if the selection sets are created##
-            check_UDIMSelSets(mesh_items)
+            check_UDIMSelSets(mesh_items, UVmap_name)
             
             # Clear selection
-            lx.eval('select.drop item')
+            commands.eval('select.drop item')
             
             # Check/create ENTITY and UDIM mask groups
-            # Two cases:
-            # - $ENTITY is defined in filename template
-            # - No entity -> only UDIM mask are created 
-            if '$ENTITY' in fileNameUser:
-                # Save entity with its udims for all imported images
-                # {entity:[udim,udim,...]}
-                imported_images = {}
-                for image, imageTag in imageItemList.iteritems():
-                    try:
-                        imported_images[imageTag[ENTITY]].append(imageTag[UDIM])
-                    except:
-                        imported_images[imageTag[ENTITY]] = [imageTag[UDIM]]
-
-
-                # Scan the scene for any entity groups
-                present_masks = scan_masks('ENTITY_UDIMs')
-                present_entityIDs = scan_masks('ENTITY_IDs')
-
-                # Go through all imported images and their entity entries
-                # If there are entity masks in the shader tree we check each udim if it has already a mask in the shader tree
-                # If not it is created and moved underneath its entity
-                # To stop recursion we save its udim value in the created list so images with same udim and entity don't create double entries
-                # If there are entity masks in the shader tree we create those
-                for entity_name, udim_list in imported_images.iteritems():
-                    created = [] # list for all new created groups
-                    if present_entityIDs and entity_name in present_entityIDs.keys():
-                        lx.out('already in scene:', present_masks[entity_name].keys())
-                        for udim in udim_list:
-                            lx.out('------------------------')
-                            lx.out('UDIM:', udim)
-                            lx.eval('select.drop item')
-                            if udim not in created and udim not in present_masks[entity_name].keys():
-                                lx.out('created %s in %s' %(udim, entity_name))
-                                create_mask_UDIM(present_entityIDs[entity_name], {'$UDIM':udim,'$ENTITY':entity_name}, '$UDIM:'+ udim, createMat=True)
-                                created.append(udim) # store new created group
-                            else:
-                                pass
-                            lx.out('------------------------')
-                    else:
-                        lx.eval('select.drop item')
-                        new_entity = create_mask_ENTITY(renderID(), {'$ENTITY':entity_name}, name=entity_name)
-                        for udim in udim_list:
-                            lx.out('------------------------')
-                            lx.out('UDIM:', udim)
-                            lx.eval('select.drop item')
-                            if udim not in created: #and udim not in present_masks[entity_name].keys():
-                                lx.out('created %s in %s' %(udim, entity_name))
-                                create_mask_UDIM(new_entity, {'$UDIM':udim,'$ENTITY':entity_name}, '$UDIM:'+ udim, createMat=True)
-                                created.append(udim) # store new created group
-                            else:
-                                pass
-                            lx.out('------------------------')
-                            
-            else:
-                # Create UDIM mask if these are not in the Shader tree
-                lx.out(imageItemList)
-                present_udims = scan_masks('UDIM_IDs')
-                created = []
-                for image in imageItemList.values():
-                    udim_val = image[UDIM]
-                    if udim_val not in created and udim_val not in present_udims.keys():
-                        create_mask_UDIM(renderID(), {'$UDIM':udim_val}, '$UDIM:'+ udim, createMat=True)
-                        created.append(udim_val)
+            create_missing_masks(imageItemList)
                             
             # Sort the images into their masks and change the shader effect
             moveImageMaps(imageItemList, getItemTags('mask'))                        
@@ -1143,69 +1053,7 @@ elif args == "sortToGroups":
     if create_maskGroups == True:
         
         # Check/create ENTITY and UDIM mask groups
-        # Two cases:
-        # - $ENTITY is defined in filename template
-        # - No entity -> only UDIM mask are created 
-        if '$ENTITY' in fileNameUser:
-            # Save entity with its udims for all imported images
-            # {entity:[udim,udim,...]}
-            selected_imageMaps = {}
-            for image, imageTag in imageItemList.iteritems():
-                try:
-                    selected_imageMaps[imageTag[ENTITY]].append(imageTag[UDIM])
-                except:
-                    selected_imageMaps[imageTag[ENTITY]] = [imageTag[UDIM]]
-    
-    
-            # Scan the scene for any entity groups
-            present_masks = scan_masks('ENTITY_UDIMs')
-            present_entityIDs = scan_masks('ENTITY_IDs')
-    
-            # Go through all imported images and their entity entries
-            # If there are entity masks in the shader tree we check each udim if it has already a mask in the shader tree
-            # If not it is created and moved underneath its entity
-            # To stop recursion we save its udim value in the created list so images with same udim and entity don't create double entries
-            # If there are entity masks in the shader tree we create those
-            for entity_name, udim_list in selected_imageMaps.iteritems():
-                created = [] # list for all new created groups
-                if present_entityIDs and entity_name in present_entityIDs.keys():
-                    lx.out('already in scene:', present_masks[entity_name].keys())
-                    for udim in udim_list:
-                        lx.out('------------------------')
-                        lx.out('UDIM:', udim)
-                        lx.eval('select.drop item')
-                        if udim not in created and udim not in present_masks[entity_name].keys():
-                            lx.out('created %s in %s' %(udim, entity_name))
-                            create_mask_UDIM(present_entityIDs[entity_name], {'$UDIM':udim,'$ENTITY':entity_name}, '$UDIM:'+ udim, createMat=True)
-                            created.append(udim) # store new created group
-                        else:
-                            pass
-                        lx.out('------------------------')
-                else:
-                    lx.eval('select.drop item')
-                    new_entity = create_mask_ENTITY(renderID(), {'$ENTITY':entity_name}, name=entity_name)
-                    for udim in udim_list:
-                        lx.out('------------------------')
-                        lx.out('UDIM:', udim)
-                        lx.eval('select.drop item')
-                        if udim not in created: #and udim not in present_masks[entity_name].keys():
-                            lx.out('created %s in %s' %(udim, entity_name))
-                            create_mask_UDIM(new_entity, {'$UDIM':udim,'$ENTITY':entity_name}, '$UDIM:'+ udim, createMat=True)
-                            created.append(udim) # store new created group
-                        else:
-                            pass
-                        lx.out('------------------------')
-                        
-        else:
-            # Create UDIM mask if these are not in the Shader tree
-            lx.out(imageItemList)
-            present_udims = scan_masks('UDIM_IDs')
-            created = []
-            for image in imageItemList.values():
-                udim_val = image[UDIM]
-                if udim_val not in created and udim_val not in present_udims.keys():
-                    create_mask_UDIM(renderID(), {'$UDIM':udim_val}, '$UDIM:'+ udim, createMat=True)
-                    created.append(udim_val)
+        create_missing_masks(imageItemList)
                         
         # Sort the images into their masks and change the shader effect
         moveImageMaps(imageItemList, getItemTags('mask'))          
@@ -1229,37 +1077,22 @@ elif args == "setUVoffset":
     
     # Check the selected imageMaps if any Tags are present.
     # If not those are created
-    for imageMap in selection:
-        if imageMap not in imageTags:
-            layerservice.select('texture.N', 'all')
-            for i in xrange(layerservice.query('texture.N')):
-                layerservice.select('texture.id', str(i))
-                if layerservice.query('texture.id') == imageMap:
-                    filePath = layerservice.query('texture.clipFile')
-                    lx.eval('select.item %s set' %imageMap)
-                    newTags = create_TagsFromFilename(fileNameUser, get_filename(filePath))
-                    newTags[MTK_TYPE] = 'imageMap'
-                    createTags(newTags)
-                    break
-                else:
-                    pass
-        else:
-            pass
+    create_missingTags(selection, imageTags)
     
     # After check the tags we can set the UVoffset for the selected textures
-    imageTags = getItemTags('imageMap')
-    lx.eval('select.drop item')
+    # The locators come from the texture table
+    imageTags = getItemTags(selection=selection)
+    commands.eval('select.drop item')
     lx.out(imageTags)
     for imap in selection:    
-        if imap in imageTags.keys():
-            lx.eval('select.item %s set' %imap)
-            txtrLoc = lx.eval("texture.setLocator {%s} ?" %imap)
+        if imap in imageTags:
+            txtrLoc = locator_ID(imap)
             UDIM_val = imageTags[imap][UDIM]
-            lx.eval("select.subItem {%s} set" %txtrLoc)
-            lx.eval("item.channel txtrLocator$m02 %s" %getUVoffSet(UDIM_val)[0])
-            lx.eval("item.channel txtrLocator$m12 %s" %getUVoffSet(UDIM_val)[1])                
-            lx.eval("item.channel txtrLocator$tileU reset")
-            lx.eval("item.channel txtrLocator$tileV reset")
+            commands.eval("select.subItem {%s} set" %txtrLoc)
+            commands.eval("item.channel txtrLocator$m02 %s" %getUVoffSet(UDIM_val)[0])
+            commands.eval("item.channel txtrLocator$m12 %s" %getUVoffSet(UDIM_val)[1])                
+            commands.eval("item.channel txtrLocator$tileU reset")
+            commands.eval("item.channel txtrLocator$tileV reset")
             
 
 # Sort selected images top to bottom #
@@ -1279,9 +1112,9 @@ elif args == "createPolySets":
         sceneservice.select('selection', 'mesh')
         selection = sceneservice.queryN('selection')
         if selection:
-            for mesh in selection:
-                lx.eval('select.subItem %s set mesh' %mesh)
-                lx.eval("@UV_tools.py create_selSets")
+            # All meshes are processed in one go
+            import UV_selSets
+            UV_selSets.batch_create_selSets(selection, vmap_selected(vmap_num, layer_index))
         else:
             warning_msg("Please select a least one mesh")    
 
@@ -1293,14 +1126,55 @@ elif args == "fixUVs":
     
     # Proceed with UV_tools.py script
     elif dialog_brake() == True:
-        lx.eval("@UV_tools.py fix_uvs")
+        commands.eval("@UV_tools.py fix_uvs")
+
+# Repack the islands of all UDIMs #
+elif args == "repackUDIMs":
+    # Check if a UV map is selected
+    if vmap_selected(vmap_num, layer_index) == False or not vmap_selected(vmap_num, layer_index):
+        warning_msg("Please select a UV map.")
+
+    # Proceed with UV_tools.py script
+    elif dialog_brake() == True:
+        commands.eval("@UV_tools.py repack_udims")
+
+# Find overlapping uvs in each UDIM #
+elif args == "checkOverlaps":
+    # Check if a UV map is selected
+    if vmap_selected(vmap_num, layer_index) == False or not vmap_selected(vmap_num, layer_index):
+        warning_msg("Please select a UV map.")
+
+    # Proceed with UV_tools.py script
+    elif dialog_brake() == True:
+        commands.eval("@UV_tools.py find_overlaps")
+
+# Texel density and texture memory of texture files before they are imported #
+elif args == "analyzeTextures":
+    sceneservice.select('selection', 'mesh')
+    mesh_items = sceneservice.queryN('selection')
+    
+    # Check if a UV map is selected
+    if vmap_selected(vmap_num, layer_index) == False or not vmap_selected(vmap_num, layer_index):
+        warning_msg("Please select a UV map.")
+    
+    elif not mesh_items:
+        warning_msg("Please Select an appropriate mesh layer.")
+    
+    else:
+        # The files are only probed, nothing is loaded
+        fileTable = probe_table(load_files() or [], filter_clips, fileNameUser)[0]
+        if not fileTable:
+            warning_msg("No textures matching the filename template found.")
+        
+        elif not texture_budget(fileTable, mesh_items, vmap_selected(vmap_num, layer_index)):
+            warning_msg("The textures are over the memory budget. Have a look at the event log for lower resolutions")
         
 elif args == "setShaderEffect":
     setShaderEffect()
 
 elif args == 'createMetaData':
     try:
-        lx.eval('user.value MARI_TOOLS_filename')
+        commands.eval('user.value MARI_TOOLS_filename')
 
     except:
         lx.out('user pressed cancel')
@@ -1314,22 +1188,7 @@ elif args == 'createMetaData':
         
         # Check the selected imageMaps if any Tags are present.
         # If not those are created
-        for imageMap in selection:
-            if imageMap not in imageTags:
-                layerservice.select('texture.N', 'all')
-                for i in xrange(layerservice.query('texture.N')):
-                    layerservice.select('texture.id', str(i))
-                    if layerservice.query('texture.id') == imageMap:
-                        filePath = layerservice.query('texture.clipFile')
-                        lx.eval('select.item %s set' %imageMap)
-                        newTags = create_TagsFromFilename(fileNameUser, get_filename(filePath))
-                        newTags[MTK_TYPE] = 'imageMap'
-                        createTags(newTags)
-                        break
-                    else:
-                        pass
-            else:
-                pass
+        create_missingTags(selection, imageTags)
     
 
 elif args == "testing":
@@ -1337,4 +1196,5 @@ elif args == "testing":
     
 
 
-
+# Commands of this run
+lx.out("MARI ToolKit: %s" %commands.report(args))
@@ -0,0 +1,150 @@
+#python
+
+"""
+MTK_commands
+Author: Bjoern Siegert aka nicelife
+
+Command layer which all commands of a script go through instead of lx.eval.
+It keeps track of the current selection and drops selection commands which
+wouldn't change anything, e.g. a second "select.drop item" or selecting the
+item which is already selected. Issued and dropped commands are counted for
+the report at the end of a script.
+
+The selection is tracked per selection type (item, polygon,...). Commands which
+are known to leave the selection alone keep it, all others may select new items
+(shader.create, clip.addStill,...) and make the selection unknown again.
+MARI_Tools creates the layer with lx.eval and lx.evalN, any function which
+takes a command string can stand in for them.
+
+CommandLayer
+eval, evalN and the counters.
+"""
+
+import re
+
+# Commands which never change the selection
+KEEPS_SELECTION = ('item.tag', 'item.channel', 'item.name', 'item.parent', 'texture.parent', 'texture.setIMap',
+                   'texture.setUV', 'texture.setLocator', 'clip.name', 'clip.setUdimFromFilename', 'mask.setPTag',
+                   'mask.setPTagType', 'shader.setEffect', 'user.value', 'dialog.', 'query ', 'vertMap.list')
+
+TOKENS = re.compile(r"\{[^}]*\}|\S+")
+
+
+def split_command(command):
+    """Split a command into its name and arguments. Braces are removed: 'select.item {a b} set' -> ('select.item', ['a b', 'set'])"""
+    tokens = [token[1:-1] if token.startswith('{') else token for token in TOKENS.findall(command)]
+    if not tokens:
+        return '', []
+
+    return tokens[0], tokens[1:]
+
+
+class CommandLayer(object):
+    """
+    Sends commands to MODO and drops redundant selection commands.
+
+    selections: {selection type:[selected ids] or None if unknown}
+    select_type: current component selection type of select.type or None
+    issued: commands sent to MODO
+    eliminated: commands which were dropped
+    """
+
+    def __init__(self, evaluate, evaluateN=None):
+        self.evaluate = evaluate
+        self.evaluateN = evaluateN or evaluate
+        self.selections = {}
+        self.select_type = None
+        self.issued = 0
+        self.eliminated = 0
+
+    def forget(self):
+        """Make the whole selection unknown, e.g. after a command which may select new items"""
+        self.selections = {}
+        self.select_type = None
+
+    def selected(self, itemIDs, selection_type='item'):
+        """Track a selection which was made without a command, e.g. through the selection API"""
+        self.selections[selection_type] = list(itemIDs)
+
+    def redundant(self, command):
+        """
+        True if the command wouldn't change the selection.
+        Otherwise the tracked selection is updated as if the command was run.
+        """
+        name, args = split_command(command)
+        if '?' in args: # Queries never change anything
+            return False
+
+        if name == 'select.drop' and args:
+            if self.selections.get(args[0]) == []:
+                return True
+            self.selections[args[0]] = []
+            return False
+
+        if name == 'select.type' and args:
+            if self.select_type == args[0]:
+                return True
+            self.select_type = args[0]
+            return False
+
+        if name in ('select.item', 'select.subItem') and args:
+            item = args[0]
+            mode = args[1] if len(args) > 1 else 'set'
+            selected = self.selections.get('item')
+            if mode == 'set':
+                if selected == [item]:
+                    return True
+                self.selections['item'] = [item]
+            elif mode == 'add':
+                if selected is not None and item in selected:
+                    return True
+                if selected is not None:
+                    selected.append(item)
+            elif mode == 'remove' and selected is not None:
+                if item not in selected:
+                    return True
+                selected.remove(item)
+            else:
+                self.selections['item'] = None
+            return False
+
+        if name.startswith('select.'):
+            # Other selection commands (select.useSet,...) may change any selection, so all
+            # tracked selections are forgotten. Only the component type of select.type is kept.
+            self.selections = {}
+            return False
+
+        if not name.startswith(KEEPS_SELECTION):
+            self.forget()
+
+        return False
+
+    def eval(self, command):
+        """lx.eval which drops redundant selection commands"""
+        if self.redundant(command):
+            self.eliminated += 1
+            return None
+
+        self.issued += 1
+        try:
+            return self.evaluate(command)
+        except Exception:
+            self.forget() # A failed command may have changed anything
+            raise
+
+    def evalN(self, command):
+        """lx.evalN, same as eval"""
+        if self.redundant(command):
+            self.eliminated += 1
+            return []
+
+        self.issued += 1
+        try:
+            return self.evaluateN(command)
+        except Exception:
+            self.forget()
+            raise
+
+    def report(self, name):
+        """Text line with the issued and eliminated commands"""
+        return "%s: %s commands issued, %s eliminated" % (name, self.issued, self.eliminated)
@@ -0,0 +1,52 @@
+#python
+
+"""
+MTK_effects
+Author: Bjoern Siegert aka nicelife
+
+Shader effects of the image maps by their $CHANNEL tag.
+The channel names come from the user values MARI_TOOLS_CHAN_*. The user can change
+them at any time, so the table is built once per command (see MARI_Tools.channel_effects).
+effect_table gets the function which reads a user value, MARI_Tools passes one
+which queries user.value through its command layer.
+
+effect_table
+Returns {channel name:shader effect}.
+
+group_by_effect
+Groups image maps by the effect of their channel.
+"""
+
+from MTK_scene import CHANNEL
+
+# User value of the channel name and its shader effect.
+# If two user values have the same name the later one wins.
+CHANNEL_EFFECTS = (("MARI_TOOLS_CHAN_diff", "diffColor"),
+                   ("MARI_TOOLS_CHAN_spec", "specAmount"),
+                   ("MARI_TOOLS_CHAN_refl", "reflAmount"),
+                   ("MARI_TOOLS_CHAN_bump", "bump"),
+                   ("MARI_TOOLS_CHAN_displ", "displace"),
+                   ("MARI_TOOLS_CHAN_normal", "normal"))
+
+
+def effect_table(read_value):
+    """
+    Return the channel to effect table {'DIFFUSE':'diffColor',...}
+    The user values are read with read_value(user value name).
+    """
+    return dict((read_value(name), effect) for name, effect in CHANNEL_EFFECTS)
+
+
+def group_by_effect(images, channel_effects):
+    """
+    Group image maps by the effect of their $CHANNEL tag. Images without a known channel are left out.
+    images: {imageMap.id:{tagType:tag}}
+    Returns {effect:[imageMap.id,...]}
+    """
+    groups = {}
+    for imageID, tags in images.iteritems():
+        effect = channel_effects.get(tags.get(CHANNEL))
+        if effect is not None:
+            groups.setdefault(effect, []).append(imageID)
+
+    return groups
@@ -0,0 +1,181 @@
+#python
+
+"""
+MTK_filename
+Author: Bjoern Siegert aka nicelife
+
+Parses the MARI variables out of texture filenames with the filename template
+of the user, e.g. $ENTITY_$CHANNEL.$UDIM -> {'$ENT':'Mesh', '$CHA':'diffuse', '$UDI':'1001'}
+MARI_Tools writes the tags onto the clips and image maps it creates.
+
+FilenameTemplate
+The template compiled into one regular expression with a named group per variable.
+The values of the variables can't contain the delimiters of the template,
+the UDIM is always four digits.
+If $UDIM is the only variable it is searched between the delimiters anywhere in the filename.
+
+compile_template
+Returns the FilenameTemplate of a template string. Compiled templates are cached for the session.
+
+parse, parse_batch
+Parse one or many filenames (without extension).
+"""
+
+import re
+
+# MARI filename variables. The tags use the first four characters: $ENTITY -> $ENT
+MARI_VARS = ["$ENTITY", "$CHANNEL", "$UDIM", "$LAYER", "$FRAME", "$NUMBER", "$COUNT", "$[METADATA VALUE]"]
+UDIM_VAR = "$UDIM"
+
+
+class TemplateError(ValueError):
+    """The filename template can't be used to parse filenames"""
+
+
+class FilenameError(ValueError):
+    """A filename doesn't match the template"""
+
+
+class FilenameTemplate(object):
+    """
+    Compiled filename template.
+
+    template: the template string of the user
+    parts: the template split into variables and delimiters [('$ENTITY', True), ('_', False),...]
+    keys: tag of each named group {'v0':'$ENT',...}
+    regex: compiled pattern matching a whole filename
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.parts = [(part, part in MARI_VARS) for part in
+                      re.split("(%s)" % "|".join(re.escape(var) for var in MARI_VARS), template) if part]
+
+        variables = [part for part, is_var in self.parts if is_var]
+        if not variables:
+            raise TemplateError("No MARI variable in the filename template '%s'" % template)
+
+        for (part, is_var), (next_part, next_is_var) in zip(self.parts, self.parts[1:]):
+            if is_var and next_is_var:
+                raise TemplateError("%s and %s need a delimiter between them in the filename template '%s'"
+                                    % (part, next_part, template))
+
+        self.delimiters = sorted(set(part for part, is_var in self.parts if not is_var), key=len, reverse=True)
+        self.udim_only = variables == [UDIM_VAR]
+        self.keys = {}
+        self.part_patterns = []
+
+        groups = {}
+        for part, is_var in self.parts:
+            if not is_var:
+                self.part_patterns.append(re.escape(part))
+            elif part in groups: # Same variable again, must have the same value
+                self.part_patterns.append("(?P=%s)" % groups[part])
+            else:
+                groups[part] = "v%s" % len(groups)
+                self.keys[groups[part]] = part[:4]
+                self.part_patterns.append("(?P<%s>%s)" % (groups[part], self.value_pattern(part)))
+
+        if self.udim_only:
+            # Four digits between delimiters or the ends of the filename
+            bounds = "|".join(re.escape(delimiter) for delimiter in self.delimiters)
+            if bounds:
+                pattern = "(?:^|%s)(?P<v0>\\d{4})(?=%s|$)" % (bounds, bounds)
+            else:
+                pattern = "^(?P<v0>\\d{4})$"
+        else:
+            pattern = "^%s$" % "".join(self.part_patterns)
+
+        self.regex = re.compile(pattern)
+
+    def value_pattern(self, var):
+        """Pattern of a variable value: anything up to the next delimiter, the UDIM only four digits"""
+        if var == UDIM_VAR:
+            return "\\d{4}"
+
+        if not self.delimiters:
+            return ".+"
+        if all(len(delimiter) == 1 for delimiter in self.delimiters):
+            return "[^%s]+" % "".join(re.escape(delimiter) for delimiter in self.delimiters)
+
+        return "(?:(?!%s).)+" % "|".join(re.escape(delimiter) for delimiter in self.delimiters)
+
+    def match(self, fileName):
+        """Return the tags of a filename or None if it doesn't match"""
+        found = self.regex.search(fileName) if self.udim_only else self.regex.match(fileName)
+        if found is None:
+            return None
+
+        return dict((self.keys[group], value) for group, value in found.groupdict().iteritems())
+
+    def parse(self, fileName):
+        """
+        Return the tags of a filename (without extension): {'$ENT':'Mesh', '$CHA':'diffuse', '$UDI':'1001'}
+        Raises FilenameError with the reason if it doesn't match the template.
+        """
+        tags = self.match(fileName)
+        if tags is None:
+            raise FilenameError(self.diagnose(fileName))
+
+        return tags
+
+    def parse_batch(self, fileNames):
+        """
+        Parse many filenames in one go.
+        Returns the tags by filename {fileName:tags} and the errors {fileName:reason}
+        """
+        match = self.regex.search if self.udim_only else self.regex.match
+        keys = self.keys.items()
+
+        tags = {}
+        errors = {}
+        for fileName in fileNames:
+            found = match(fileName)
+            if found is None:
+                errors[fileName] = self.diagnose(fileName)
+            else:
+                tags[fileName] = dict((key, found.group(group)) for group, key in keys)
+
+        return tags, errors
+
+    def diagnose(self, fileName):
+        """Return why a filename doesn't match: the first part of the template which fails and where"""
+        if self.udim_only:
+            return "No four digit UDIM found in '%s' (template '%s')" % (fileName, self.template)
+
+        position = 0
+        for i, ((part, is_var), part_pattern) in enumerate(zip(self.parts, self.part_patterns)):
+            # Check the parts one after the other, each one together with the ones before
+            found = re.match("".join(self.part_patterns[:i + 1]), fileName)
+            if found is None:
+                expected = "a four digit UDIM" if part == UDIM_VAR else ("%s" % part if is_var else "'%s'" % part)
+                return "'%s' doesn't match the template '%s': expected %s at '%s'" % (
+                    fileName, self.template, expected, fileName[position:])
+            position = found.end()
+
+        return "'%s' doesn't match the template '%s': unexpected '%s' at the end" % (
+            fileName, self.template, fileName[position:])
+
+
+# Compiled templates of the current MODO session. The module stays loaded between script runs.
+# {template:FilenameTemplate}
+templates = {}
+
+
+def compile_template(template):
+    """Return the compiled FilenameTemplate of a template string. Raises TemplateError."""
+    compiled = templates.get(template)
+    if compiled is None:
+        compiled = templates[template] = FilenameTemplate(template)
+
+    return compiled
+
+
+def parse(template, fileName):
+    """Return the tags of a filename (without extension). Raises TemplateError or FilenameError."""
+    return compile_template(template).parse(fileName)
+
+
+def parse_batch(template, fileNames):
+    """Parse many filenames with the same template. Returns ({fileName:tags}, {fileName:reason})"""
+    return compile_template(template).parse_batch(fileNames)
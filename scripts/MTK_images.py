@@ -0,0 +1,284 @@
+#python
+
+"""
+MTK_images
+Author: Bjoern Siegert aka nicelife
+
+Reads width, height, channels and bit depth from the header of the image
+files MARI exports, without loading the image. Only the first bytes of a
+file are read; TIFF and JPEG follow their offsets to the header entries.
+Each probe_<format> gets the open file and its first HEAD bytes, a new
+format only needs one more probe function and a signature check in probe.
+
+Formats: TIFF, PNG, TGA, EXR, JPEG
+
+probe
+Returns the header info of one file or None if the format is unknown or the file is broken.
+
+probe_files
+Stat, header and filename tags of a whole file list, read by a pool of threads.
+Returns one table with a row per file. Most of the time is spent waiting for
+the file system (network storage), so the threads run side by side.
+
+filter_placeholders
+Splits the probe table into the files to load and the 8x8 placeholder tiles.
+"""
+
+import os
+import struct
+import time
+from multiprocessing.pool import ThreadPool
+
+HEAD = 4096 # Bytes read at the start of each file
+EXR_HEAD_MAX = 1024 * 1024 # EXR headers are read in steps of HEAD up to this size
+PLACEHOLDER_SIZE = 8 # MARI exports empty tiles as 8x8 images
+WORKERS = 16 # Threads of probe_files
+
+
+def info(width, height, channels, bits, image_format):
+    """Header info as dict: {'width':4096, 'height':4096, 'channels':4, 'bits':8, 'format':'png'}"""
+    return {'width':width, 'height':height, 'channels':channels, 'bits':bits, 'format':image_format}
+
+
+def probe_png(image_file, head):
+    """PNG: the IHDR chunk follows the signature"""
+    if head[12:16] != b'IHDR':
+        return None
+
+    width, height, bits, color_type = struct.unpack('>IIBB', head[16:26])
+    channels = {0:1, 2:3, 3:3, 4:2, 6:4}.get(color_type)
+    if color_type == 3: # Palette entries are 8 bit RGB
+        bits = 8
+
+    return info(width, height, channels, bits, 'png')
+
+
+def probe_jpeg(image_file, head):
+    """JPEG: walk the segments until the first start of frame marker"""
+    position = 2
+    while True:
+        image_file.seek(position)
+        marker = image_file.read(4)
+        if len(marker) < 4 or marker[0:1] != b'\xff':
+            return None
+
+        code, length = struct.unpack('>BH', marker[1:4])
+        if code == 0xff: # Fill byte
+            position += 1
+            continue
+
+        # SOF0-SOF15 without DHT (C4), JPG (C8) and DAC (CC)
+        if 0xc0 <= code <= 0xcf and code not in (0xc4, 0xc8, 0xcc):
+            bits, height, width, channels = struct.unpack('>BHHB', image_file.read(6))
+            return info(width, height, channels, bits, 'jpeg')
+
+        position += 2 + length
+
+
+def probe_tiff(image_file, head):
+    """TIFF: read the tags of the first image file directory"""
+    order = '<' if head[:2] == b'II' else '>'
+    if struct.unpack(order + 'H', head[2:4])[0] != 42: # BigTIFF is not supported
+        return None
+
+    image_file.seek(struct.unpack(order + 'I', head[4:8])[0])
+    count = struct.unpack(order + 'H', image_file.read(2))[0]
+    entries = image_file.read(count * 12)
+
+    # Width 256, height 257, BitsPerSample 258, SamplesPerPixel 277
+    values = {}
+    bits_offset = None
+    for i in xrange(count):
+        tag, value_type, value_count = struct.unpack(order + 'HHI', entries[i * 12:i * 12 + 8])
+        value = entries[i * 12 + 8:i * 12 + 12]
+        if tag == 258 and value_count > 2: # One value per channel, stored at an offset
+            bits_offset = struct.unpack(order + 'I', value)[0]
+        elif value_type == 3: # SHORT
+            values[tag] = struct.unpack(order + 'H', value[:2])[0]
+        elif value_type == 4: # LONG
+            values[tag] = struct.unpack(order + 'I', value)[0]
+
+    if 256 not in values or 257 not in values:
+        return None
+
+    if bits_offset is not None:
+        image_file.seek(bits_offset)
+        values[258] = struct.unpack(order + 'H', image_file.read(2))[0]
+
+    return info(values[256], values[257], values.get(277, 1), values.get(258, 1), 'tiff')
+
+
+def probe_tga(image_file, head):
+    """TGA: fixed 18 byte header, no signature"""
+    if len(head) < 18:
+        return None
+
+    image_type = struct.unpack('<B', head[2:3])[0]
+    width, height, depth, descriptor = struct.unpack('<HHBB', head[12:18])
+    if image_type not in (1, 2, 3, 9, 10, 11) or not width or not height:
+        return None
+
+    if image_type in (3, 11): # Grayscale
+        channels = 1
+    elif depth == 32 or (depth == 16 and descriptor & 0x0f):
+        channels = 4
+    else:
+        channels = 3
+
+    return info(width, height, channels, 8, 'tga')
+
+
+def exr_attributes(data):
+    """Return the header attributes {name:value} or None if data ends before the header does"""
+    attributes = {}
+    position = 8 # After magic number and version
+    while True:
+        name_end = data.find(b'\0', position)
+        if name_end == -1:
+            return None
+        if name_end == position: # An empty name ends the header
+            return attributes
+
+        type_end = data.find(b'\0', name_end + 1)
+        if type_end == -1 or len(data) < type_end + 5:
+            return None
+
+        size = struct.unpack('<i', data[type_end + 1:type_end + 5])[0]
+        if len(data) < type_end + 5 + size:
+            return None
+
+        attributes[data[position:name_end]] = data[type_end + 5:type_end + 5 + size]
+        position = type_end + 5 + size
+
+
+def probe_exr(image_file, head):
+    """EXR: dataWindow and channel list of the header"""
+    data = head
+    attributes = exr_attributes(data)
+    while attributes is None:
+        more = image_file.read(HEAD)
+        if not more or len(data) >= EXR_HEAD_MAX:
+            return None
+        data += more
+        attributes = exr_attributes(data)
+
+    if b'dataWindow' not in attributes:
+        return None
+    xmin, ymin, xmax, ymax = struct.unpack('<iiii', attributes[b'dataWindow'][:16])
+
+    # Channel list: name, pixel type, pLinear, reserved, x and y sampling; an empty name ends it
+    # Pixel types: 0 UINT, 1 HALF, 2 FLOAT
+    pixel_types = []
+    chlist = attributes.get(b'channels', b'')
+    position = 0
+    while chlist[position:position + 1] not in (b'\0', b''):
+        name_end = chlist.find(b'\0', position)
+        pixel_types.append(struct.unpack('<i', chlist[name_end + 1:name_end + 5])[0])
+        position = name_end + 17
+
+    bits = max([{1:16}.get(pixel_type, 32) for pixel_type in pixel_types] or [16])
+    return info(xmax - xmin + 1, ymax - ymin + 1, len(pixel_types), bits, 'exr')
+
+
+def probe(path):
+    """
+    Return the header info of an image file or None.
+    {'width':4096, 'height':4096, 'channels':4, 'bits':8, 'format':'tiff'}
+    """
+    try:
+        with open(path, 'rb') as image_file:
+            head = image_file.read(HEAD)
+
+            if head[:8] == b'\x89PNG\r\n\x1a\n':
+                return probe_png(image_file, head)
+            elif head[:2] == b'\xff\xd8':
+                return probe_jpeg(image_file, head)
+            elif head[:2] in (b'II', b'MM'):
+                return probe_tiff(image_file, head)
+            elif head[:4] == b'\x76\x2f\x31\x01':
+                return probe_exr(image_file, head)
+            elif os.path.splitext(path)[1].lower() == '.tga':
+                return probe_tga(image_file, head)
+
+    except (IOError, OSError, struct.error, ValueError):
+        pass
+
+    return None
+
+
+def probe_file(path, parse=None):
+    """
+    Probe one file. Returns a row of the probe table:
+    {'path':..., 'size':bytes, 'mtime':..., 'width':..., 'height':..., 'channels':..., 'bits':...,
+     'format':..., 'tags':{'$UDI':'1001',...}, 'error':None}
+    Values which couldn't be read are None, error holds the reason.
+    parse: function which returns the tags of a file path
+    """
+    row = {'path':path, 'size':None, 'mtime':None, 'width':None, 'height':None, 'channels':None,
+           'bits':None, 'format':None, 'tags':None, 'error':None}
+    try:
+        stat = os.stat(path)
+    except OSError as error:
+        row['error'] = str(error)
+        return row
+
+    row['size'] = stat.st_size
+    row['mtime'] = stat.st_mtime
+
+    image_info = probe(path)
+    if image_info is not None:
+        row.update(image_info)
+
+    if parse is not None:
+        try:
+            row['tags'] = parse(path)
+        except Exception as error: # Any problem with the filename only drops this file
+            row['error'] = "Filename: %s" % error
+
+    return row
+
+
+def probe_files(fileList, parse=None, workers=WORKERS):
+    """
+    Probe all files with a pool of threads.
+    Returns the rows of probe_file in the order of fileList and the time it took in seconds.
+    """
+    t1 = time.time()
+    fileList = list(fileList)
+    if workers < 2 or len(fileList) < 2:
+        rows = [probe_file(path, parse) for path in fileList]
+    else:
+        pool = ThreadPool(min(workers, len(fileList)))
+        try:
+            rows = pool.map(lambda path: probe_file(path, parse), fileList)
+        finally:
+            pool.close()
+            pool.join()
+
+    return rows, time.time() - t1
+
+
+def is_placeholder(image_info, size=PLACEHOLDER_SIZE):
+    """True if the header info or probe row is the one of a placeholder tile"""
+    return image_info is not None and image_info['width'] == size and image_info['height'] == size
+
+
+def filter_placeholders(rows, size=PLACEHOLDER_SIZE):
+    """
+    Split the probe rows into the ones to load, the placeholder tiles and the
+    files whose header couldn't be read. The order of the rows is kept.
+    Returns (rows, placeholders, unknown)
+    """
+    files = []
+    placeholders = []
+    unknown = []
+    for row in rows:
+        if is_placeholder(row, size):
+            placeholders.append(row)
+            continue
+
+        if row['width'] is None:
+            unknown.append(row)
+        files.append(row)
+
+    return files, placeholders, unknown
@@ -0,0 +1,135 @@
+#python
+
+"""
+MTK_planner
+Author: Bjoern Siegert aka nicelife
+
+Plans the import of MARI textures into image folders (modo 801 UDIM import).
+The plan is computed from the probed file table (see MTK_images.probe_files) and a
+snapshot of the image folders and ENTITY masks of the scene. The plan is plain
+data, MARI_Tools.execute_importPlan turns it into commands.
+
+Per file a clip is added and moved into the image folder of its entity and channel.
+Folders which are already in the scene are reused. Each new folder gets one
+image map with automatic UDIMs. With entity masks the new image maps are moved
+into the ENTITY mask of their entity, missing masks are created first.
+
+plan_import
+Returns the ImportPlan of a file table.
+"""
+
+from MTK_scene import MTK_TYPE, ENTITY, CHANNEL, UDIM, FolderRegistry
+
+DEFAULT_FOLDER = 'MTK IMPORT' # Folder name if neither entity nor channel is in the filename
+
+
+def normalize(tags):
+    """Tags with four character keys: {'$ENTITY':'Mesh'} -> {'$ENT':'Mesh'}"""
+    return dict((key[:4], value) for key, value in tags.iteritems())
+
+
+folder_key = FolderRegistry.key # Key of the image folder of a clip: (('$CHA', 'diffuse'), ('$ENT', 'Mesh'))
+
+
+def folder_name(tags):
+    """Name of an image folder: $ENTITY_$CHANNEL, only one of them or 'MTK IMPORT'"""
+    tags = normalize(tags)
+    if CHANNEL in tags and ENTITY in tags:
+        return tags[ENTITY] + '_' + tags[CHANNEL]
+
+    return tags.get(CHANNEL) or tags.get(ENTITY) or DEFAULT_FOLDER
+
+
+class ImportPlan(object):
+    """
+    All steps of one import. Folders are referred to by their folder_key.
+
+    clips: [(path, tags)] clips to add in file order, tags of the clip
+    registry: MTK_scene.FolderRegistry of the existing folders
+    folders: {key:folder.id} existing folders which are reused
+    entity_masks: {entity:mask.id} existing ENTITY masks or None without entity masks
+    new_folders: [(key, name, tags)] folders to create in order of their first clip
+    clip_parents: [(path, key)] clips to move into their folder
+    image_maps: [(key, tags)] image maps to create, one per new folder
+    masks: [entity] ENTITY masks to create
+    map_parents: [(key, entity)] new image maps to move into their ENTITY mask
+    """
+
+    def __init__(self, rows, registry, entity_masks):
+        self.rows = rows
+        self.registry = registry
+        self.entity_masks = entity_masks
+        self.clips = []
+        self.folders = {}
+        self.new_folders = []
+        self.clip_parents = []
+        self.image_maps = []
+        self.masks = []
+        self.map_parents = []
+
+    def without(self, paths):
+        """Return the plan without the files of paths, e.g. clips which were deleted after loading"""
+        paths = set(paths)
+        return plan_import([row for row in self.rows if row['path'] not in paths], self.registry, self.entity_masks)
+
+    def summary(self):
+        """Number of items of each step"""
+        return {'clips':len(self.clips), 'reused folders':len(self.folders), 'new folders':len(self.new_folders),
+                'clip moves':len(self.clip_parents), 'image maps':len(self.image_maps),
+                'masks':len(self.masks), 'image map moves':len(self.map_parents)}
+
+
+def plan_import(rows, folders=None, entity_masks=None):
+    """
+    Plan the import of the probed files.
+
+    rows: [{'path':..., 'tags':{'$ENT':'Mesh', '$CHA':'diffuse', '$UDI':'1001'}},...] in import order
+    folders: MTK_scene.FolderRegistry of the image folders of the scene. It is copied,
+             so the registry can be updated while the plan is executed.
+    entity_masks: snapshot of the ENTITY masks {entity:mask.id}.
+                  None if the images are not sorted into ENTITY masks.
+
+    Returns an ImportPlan.
+    """
+    existing = folders.copy() if folders is not None else FolderRegistry()
+    plan = ImportPlan(rows, existing, entity_masks)
+
+    planned = set()
+    for row in rows:
+        tags = normalize(row['tags'])
+        key = folder_key(tags)
+
+        clip_tags = dict(tags)
+        clip_tags[MTK_TYPE] = 'imageMap'
+        plan.clips.append((row['path'], clip_tags))
+        plan.clip_parents.append((row['path'], key))
+
+        if key in planned:
+            continue
+        planned.add(key)
+
+        if key in existing:
+            plan.folders[key] = existing.folders[key]
+            continue
+
+        folder_tags = dict(key)
+        folder_tags[MTK_TYPE] = 'imageFolder'
+        plan.new_folders.append((key, folder_name(folder_tags), folder_tags))
+
+        map_tags = dict(key)
+        map_tags[MTK_TYPE] = 'imageMap'
+        plan.image_maps.append((key, map_tags))
+
+    # ENTITY masks for the new image maps
+    if entity_masks is not None:
+        new_masks = set()
+        for key, tags in plan.image_maps:
+            entity = tags.get(ENTITY)
+            if entity is None:
+                continue
+            if entity not in entity_masks and entity not in new_masks:
+                new_masks.add(entity)
+                plan.masks.append(entity)
+            plan.map_parents.append((key, entity))
+
+    return plan
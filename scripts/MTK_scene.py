@@ -0,0 +1,388 @@
+#python
+
+"""
+MTK_scene
+Author: Bjoern Siegert aka nicelife
+
+Indices of the scene which are built in one pass and then queried
+for the rest of a command, instead of scanning the scene again for every lookup.
+The sceneservice is passed in, so the indices can also be filled by hand without MODO.
+
+SceneIndex
+Item types and the tags of all items created by the MARI ToolKit ($MTK tag).
+
+MaskIndex
+ENTITY and UDIM masks by entity and udim. Part of the SceneIndex.
+
+FolderRegistry
+Image folders by their tags, looked up with one hash per clip. Part of the SceneIndex.
+
+TextureTable
+Texture locator, clip file and shader tree parent of each texture.
+
+ShadeGraphIndex
+Clips, image folders and texture locators of the image maps from one walk over
+the shade-loc graph. shadeGraph_links reads the graph and is the only part which needs MODO.
+"""
+
+MTK_TYPE = '$MTK' # Tag type which marks the items of the toolkit
+ENTITY = '$ENT'
+UDIM = '$UDI'
+CHANNEL = '$CHA'
+
+
+class MaskIndex(object):
+    """
+    ENTITY_mask and UDIM_mask items by their tags.
+
+    entities: {entity:mask.id}
+    udims: {(entity, udim):mask.id} entity is None for UDIM masks without entity
+    udim_IDs: {udim:[mask.id,...]} all UDIM masks of a udim
+    """
+
+    def __init__(self):
+        self.entities = {}
+        self.udims = {}
+        self.udim_IDs = {}
+
+    @classmethod
+    def from_items(cls, masks):
+        """Build the index from the tags of mask items {mask.id:{tagType:tag}}"""
+        index = cls()
+        for maskID, tags in masks.iteritems():
+            index.add(maskID, tags)
+        return index
+
+    def add(self, maskID, tags):
+        """Add a mask with its tags. Masks which are no ENTITY or UDIM mask are ignored."""
+        mask_type = tags.get(MTK_TYPE)
+        if mask_type == 'ENTITY_mask' and ENTITY in tags:
+            self.entities[tags[ENTITY]] = maskID
+
+        elif mask_type == 'UDIM_mask' and UDIM in tags:
+            self.udims[(tags.get(ENTITY), tags[UDIM])] = maskID
+            masks = self.udim_IDs.setdefault(tags[UDIM], [])
+            if maskID not in masks:
+                masks.append(maskID)
+
+    def entity(self, entity):
+        """Return the ENTITY mask of an entity or None"""
+        return self.entities.get(entity)
+
+    def udim(self, entity, udim):
+        """Return the UDIM mask of a udim underneath an entity or None. Use entity None for masks without entity."""
+        return self.udims.get((entity, udim))
+
+    def udim_masks(self, udim):
+        """Return all UDIM masks of a udim"""
+        return self.udim_IDs.get(udim, [])
+
+    def entity_udims(self, entity):
+        """Return the udims which have a mask for an entity"""
+        return [udim for mask_entity, udim in self.udims if mask_entity == entity]
+
+    def entity_targets(self, images):
+        """
+        Join image maps with the ENTITY mask of their entity. Images without a mask are left out.
+        images: {imageMap.id:{tagType:tag}}
+        Returns {mask.id:[imageMap.id,...]}
+        """
+        targets = {}
+        for imageID, tags in images.iteritems():
+            maskID = self.entity(tags.get(ENTITY))
+            if maskID is not None:
+                targets.setdefault(maskID, []).append(imageID)
+
+        return targets
+
+    def udim_targets(self, images):
+        """
+        Join image maps with their UDIM mask on (entity, udim).
+        Images without an entity go to the UDIM mask without entity or else to the
+        first UDIM mask of their udim. Images without a mask are left out.
+        images: {imageMap.id:{tagType:tag}}
+        Returns {mask.id:[imageMap.id,...]}
+        """
+        targets = {}
+        for imageID, tags in images.iteritems():
+            udim = tags.get(UDIM)
+            if ENTITY in tags:
+                maskID = self.udim(tags[ENTITY], udim)
+            else:
+                maskID = self.udim(None, udim) or (self.udim_masks(udim) or [None])[0]
+
+            if maskID is not None:
+                targets.setdefault(maskID, []).append(imageID)
+
+        return targets
+
+
+class FolderRegistry(object):
+    """
+    Image folders by the tags of their clips.
+
+    folders: {key:folder.id} key see FolderRegistry.key
+    keys: {folder.id:key}
+    """
+
+    def __init__(self):
+        self.folders = {}
+        self.keys = {}
+
+    @staticmethod
+    def key(tags):
+        """
+        Canonical key of a clip or folder: the sorted (tag type, value) pairs without UDIM and $MTK.
+        Folders of older imports are tagged $MTK imageMap, so the type is not part of the key.
+        (('$CHA', 'diffuse'), ('$ENT', 'Mesh'))
+        """
+        return tuple(sorted((tagType[:4], value) for tagType, value in tags.iteritems()
+                            if tagType[:4] not in (UDIM, MTK_TYPE)))
+
+    def add(self, folderID, tags):
+        """Add a folder or change its tags, e.g. after clip.newFolder. The first folder of a key is kept."""
+        old_key = self.keys.get(folderID)
+        if old_key is not None and self.folders.get(old_key) == folderID:
+            del self.folders[old_key]
+
+        key = self.key(tags)
+        self.keys[folderID] = key
+        self.folders.setdefault(key, folderID)
+
+    def find(self, tags):
+        """Return the folder for the tags of a clip or None"""
+        return self.folders.get(self.key(tags))
+
+    def copy(self):
+        registry = FolderRegistry()
+        registry.folders = dict(self.folders)
+        registry.keys = dict(self.keys)
+        return registry
+
+    def __contains__(self, key):
+        return key in self.folders
+
+    def __len__(self):
+        return len(self.folders)
+
+
+class SceneIndex(object):
+    """
+    Tags of the toolkit items of a scene.
+
+    types: {item type:[item.id,...]} all items of the scene
+    tags: {item.id:{tagType:tag,...}} only items with a $MTK tag
+    inverted: {(tagType, tag):set([item.id,...])}
+    masks: MaskIndex of the mask items
+    folders: FolderRegistry of the image folders
+    """
+
+    def __init__(self):
+        self.types = {}
+        self.item_types = {}
+        self.tags = {}
+        self.inverted = {}
+        self.masks = MaskIndex()
+        self.folders = FolderRegistry()
+
+    @classmethod
+    def scan(cls, sceneservice):
+        """Build the index in one pass over all items of the scene"""
+        index = cls()
+
+        sceneservice.select('item.N', 'all')
+        for num in xrange(sceneservice.query('item.N')):
+            sceneservice.select('item.id', str(num))
+            itemID = sceneservice.query('item.id')
+            item_type = sceneservice.query('item.type')
+
+            try:
+                tags = dict(zip(sceneservice.queryN('item.tagTypes'), sceneservice.queryN('item.tags')))
+            except RuntimeError: # Item without tags
+                tags = {}
+
+            index.add(itemID, item_type, tags)
+
+        return index
+
+    def add(self, itemID, item_type, tags=None):
+        """Add an item to the index, e.g. after it was created. Tags without $MTK are not stored."""
+        if itemID not in self.item_types:
+            self.types.setdefault(item_type, []).append(itemID)
+            self.item_types[itemID] = item_type
+
+        if tags:
+            self.set_tags(itemID, tags)
+
+    def set_tags(self, itemID, tags):
+        """Add or change tags of an item which is already in the index"""
+        new_tags = dict(self.tags.get(itemID, {}))
+        new_tags.update(tags)
+        if MTK_TYPE not in new_tags:
+            return
+
+        # Remove the old values from the inverted map
+        for key in self.tags.get(itemID, {}).iteritems():
+            self.inverted.get(key, set()).discard(itemID)
+
+        self.tags[itemID] = new_tags
+        for key in new_tags.iteritems():
+            self.inverted.setdefault(key, set()).add(itemID)
+
+        if self.item_types.get(itemID) == 'mask':
+            self.masks.add(itemID, new_tags)
+        elif self.item_types.get(itemID) == 'imageFolder':
+            self.folders.add(itemID, new_tags)
+
+    def items(self, item_type='all', selection=None):
+        """
+        Return the tags of the toolkit items, optionally only of one type or of the given IDs.
+        Works like the old getItemTags: {item.id:{tagType:tag,}}
+        """
+        if selection is not None:
+            if isinstance(selection, basestring):
+                selection = [selection]
+            itemIDs = selection
+        elif item_type == 'all':
+            itemIDs = self.tags
+        else:
+            itemIDs = self.types.get(item_type, [])
+
+        return dict((itemID, dict(self.tags[itemID])) for itemID in itemIDs if itemID in self.tags)
+
+    def lookup(self, *tags):
+        """
+        Return the IDs of the items which have all given tags.
+        tags: (tagType, tag) pairs, e.g. lookup(('$MTK', 'UDIM_mask'), ('$UDI', '1001'))
+        """
+        if not tags:
+            return set()
+
+        found = set(self.inverted.get(tags[0], ()))
+        for key in tags[1:]:
+            found &= self.inverted.get(key, set())
+
+        return found
+
+
+class TextureTable(object):
+    """
+    Texture layers of the shader tree.
+
+    textures: {texture.id:(locator.id, clip file, parent.id)}
+    numbers: {texture.id:texture number of the layerservice}
+    The clip file is None for textures without an image.
+    """
+
+    def __init__(self):
+        self.textures = {}
+        self.numbers = {}
+
+    @classmethod
+    def scan(cls, layerservice, sceneservice):
+        """Build the table in one pass over all textures"""
+        table = cls()
+
+        layerservice.select('texture.N', 'all')
+        for num in xrange(layerservice.query('texture.N')):
+            layerservice.select('texture.id', str(num))
+            textureID = layerservice.query('texture.id')
+            locator = layerservice.query('texture.locator')
+            try:
+                clipFile = layerservice.query('texture.clipFile')
+            except RuntimeError: # Texture without an image
+                clipFile = None
+
+            sceneservice.select('item', textureID)
+            table.add(textureID, locator, clipFile, sceneservice.query('item.parent'))
+            table.numbers[textureID] = num
+
+        return table
+
+    def add(self, textureID, locator, clipFile=None, parent=None):
+        """Add or replace a texture"""
+        self.textures[textureID] = (locator, clipFile, parent)
+
+    def __contains__(self, textureID):
+        return textureID in self.textures
+
+    def locator(self, textureID):
+        """Return the texture locator of a texture or None"""
+        return self.textures.get(textureID, (None, None, None))[0]
+
+    def clip_file(self, textureID):
+        """Return the image file of a texture or None"""
+        return self.textures.get(textureID, (None, None, None))[1]
+
+    def parent(self, textureID):
+        """Return the shader tree parent of a texture or None"""
+        return self.textures.get(textureID, (None, None, None))[2]
+
+
+class ShadeGraphIndex(object):
+    """
+    Links between image maps and their clips, image folders and texture locators.
+
+    clip_maps: {clip.id:[imageMap.id,...]}
+    folder_maps: {imageFolder.id:[imageMap.id,...]}
+    map_clips: {imageMap.id:clip.id or imageFolder.id}
+    map_locators: {imageMap.id:txtrLocator.id}
+    """
+
+    def __init__(self):
+        self.clip_maps = {}
+        self.folder_maps = {}
+        self.map_clips = {}
+        self.map_locators = {}
+
+    @classmethod
+    def scan(cls, links):
+        """Build the index from the links of the graph: [(imageMap.id, item.id, item type),...]"""
+        index = cls()
+        for imageMapID, itemID, item_type in links:
+            index.add(imageMapID, itemID, item_type)
+
+        return index
+
+    def add(self, imageMapID, itemID, item_type):
+        """Add a link of an image map. Links to other item types are ignored."""
+        if item_type == 'videoStill':
+            self.clip_maps.setdefault(itemID, []).append(imageMapID)
+            self.map_clips[imageMapID] = itemID
+        elif item_type == 'imageFolder':
+            self.folder_maps.setdefault(itemID, []).append(imageMapID)
+            self.map_clips[imageMapID] = itemID
+        elif item_type == 'txtrLocator':
+            self.map_locators[imageMapID] = itemID
+
+    def image_maps(self, itemID):
+        """Return the image maps which use a clip or image folder"""
+        return self.clip_maps.get(itemID) or self.folder_maps.get(itemID) or []
+
+    def clip(self, imageMapID):
+        """Return the clip or image folder of an image map or None"""
+        return self.map_clips.get(imageMapID)
+
+    def locator(self, imageMapID):
+        """Return the texture locator of an image map or None"""
+        return self.map_locators.get(imageMapID)
+
+
+def shadeGraph_links():
+    """
+    Walk the shade-loc graph of the current scene once.
+    Yields the forward links of all image maps: (imageMap.id, item.id, item type)
+    """
+    import lx
+    import lxu.select
+
+    scn_svc = lx.service.Scene()
+    image_type = scn_svc.ItemTypeLookup(lx.symbol.sITYPE_IMAGEMAP)
+    scene = lxu.select.SceneSelection().current()
+    graph = lx.object.ItemGraph(scene.GraphLookup(lx.symbol.sGRAPH_SHADELOC))
+
+    for i in xrange(scene.ItemCount(image_type)):
+        image = scene.ItemByIndex(image_type, i)
+        for j in xrange(graph.FwdCount(image)):
+            linked = graph.FwdByIndex(image, j)
+            yield image.Ident(), linked.Ident(), scn_svc.ItemTypeName(linked.Type())
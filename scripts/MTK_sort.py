@@ -0,0 +1,105 @@
+#python
+
+"""
+MTK_sort
+Author: Bjoern Siegert aka nicelife
+
+Sorting of shader tree items with as few moves as possible.
+MARI_Tools reads the child order of each parent and sends the moves as texture.parent commands.
+
+natural_key
+Sort key which compares numbers by value: Mesh_diffuse.1002 < Mesh_diffuse.1010,
+text is compared case-insensitive.
+
+target_order
+The child order of a parent after the given items are sorted into the places they occupy.
+
+minimal_moves
+The moves from the current to the target order. Items of the longest increasing
+subsequence are already in order and are not moved.
+"""
+
+import bisect
+import re
+
+TOKENS = re.compile(r"(\d+)")
+
+
+def natural_key(name):
+    """
+    Sort key of a name: numbers (UDIMs, versions) by value, text without case.
+    Names which only differ in case or leading zeros are ordered by the name itself.
+    """
+    return ([(0, int(token)) if token.isdigit() else (1, token.lower()) for token in TOKENS.split(name) if token],
+            name)
+
+
+def target_order(children, items, key):
+    """
+    Return the child order after sorting items into the places they take up in children.
+    The other children keep their places. The items are placed in descending order of key
+    along the children, so they read in ascending order from the top of the shader tree.
+    children: current child order of the parent
+    items: children to sort
+    key: sort key of an item
+    """
+    items = set(items)
+    slots = [index for index, child in enumerate(children) if child in items]
+    order = sorted(items, key=key, reverse=True)
+
+    target = list(children)
+    for slot, item in zip(slots, order):
+        target[slot] = item
+
+    return target
+
+
+def longest_increasing(sequence):
+    """Return the indices of one longest strictly increasing subsequence (patience sorting)"""
+    tails = [] # Smallest last value of an increasing subsequence of each length
+    tail_indices = []
+    previous = [None] * len(sequence)
+    for index, value in enumerate(sequence):
+        length = bisect.bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_indices.append(index)
+        else:
+            tails[length] = value
+            tail_indices[length] = index
+        previous[index] = tail_indices[length - 1] if length else None
+
+    indices = []
+    index = tail_indices[-1] if tail_indices else None
+    while index is not None:
+        indices.append(index)
+        index = previous[index]
+
+    return indices[::-1]
+
+
+def minimal_moves(current, target):
+    """
+    Return the moves which turn the current child order into the target order: [(item, index),...]
+    Each move puts the item at index of the child order as it is after the moves before.
+    Both lists must hold the same items.
+    """
+    position = dict((item, index) for index, item in enumerate(target))
+    sequence = [position[item] for item in current]
+    placed = set(current[index] for index in longest_increasing(sequence))
+
+    # Each item which is not in order is put right after its predecessor of the target order.
+    # Going through the target order the predecessor is always in place already.
+    order = list(current)
+    moves = []
+    for index, item in enumerate(target):
+        if item in placed:
+            continue
+
+        order.remove(item)
+        new_index = order.index(target[index - 1]) + 1 if index else 0
+        order.insert(new_index, item)
+        moves.append((item, new_index))
+        placed.add(item)
+
+    return moves
@@ -1,23 +1,43 @@
 #python
 
+import sys
 import modo
 import lx
 
+# Make the other kit scripts importable
+kit_scripts = lx.eval("query platformservice alias ? {kit_MARIToolKit:scripts}")
+if kit_scripts not in sys.path:
+	sys.path.append(kit_scripts)
+
+import MTK_scene
+
 scene = modo.scene.current()
-shaderGraph = lx.object.ItemGraph(scene.GraphLookup(lx.symbol.sGRAPH_SHADELOC))
+shadeGraph = None # MTK_scene.ShadeGraphIndex, built on the first lookup
+
+def shade_graph():
+	'''Return the shade graph index. The shade-loc graph is walked only once per run.'''
+	global shadeGraph
+	if shadeGraph is None:
+		shadeGraph = MTK_scene.ShadeGraphIndex.scan(MTK_scene.shadeGraph_links())
+	return shadeGraph
+
 
 def get_clip(imageMap):
-	'''Get clipItem of an imageMap'''
+	'''Get clipItem (or imageFolder) of an imageMap'''
 
 	if imageMap.type == 'imageMap':
-		return shaderGraph.FwdByIndex(imageMap, 1)
+		clip = shade_graph().clip(imageMap.id)
+		if clip:
+			return modo.Item(clip)
 
 
 def get_txtLocator(imageMap):
 	'''Get txtLocator of an imageMap'''
 	
 	if imageMap.type == 'imageMap':
-		return shaderGraph.FwdByIndex(imageMap, 0)
+		locator = shade_graph().locator(imageMap.id)
+		if locator:
+			return modo.Item(locator)
 
 
 def get_shaderTree_pos(item):
@@ -30,7 +50,7 @@ def get_shaderTree_pos(item):
 	# imageFolders are special. They are not part of the shader tree so we need to
 	# get it assosiating imageMap item
 	if item.type == 'imageFolder':
-		item_id = modo.Item(shaderGraph.RevByIndex(item, 0)).id
+		item_id = shade_graph().image_maps(item.id)[0]
 	else:
 		item_id = item.id
 	
@@ -60,13 +80,13 @@ def unpack_imageFolder(imageFolder):
 			lx.eval('texture.new clip:{%s}' % image.id)
 			lx.eval('texture.parent %s 0' % mask.id)
 
-		lx.eval('shader.setVisible %s false' % shaderGraph.RevByIndex(imageFolder, 0).Ident())
+		lx.eval('shader.setVisible %s false' % shade_graph().image_maps(imageFolder.id)[0])
 		
 
 def set_bakeRegion(imageMap, renderItem):
 	'''Set the bake region of renderItem to the UDIM values of an imageMap'''
 	
-	videoStill = modo.Item(shaderGraph.FwdByIndex(imageMap, 1))
+	videoStill = get_clip(imageMap)
 	udim = videoStill.channel('udim').get()
 	
 	bake_right = int(str(udim)[3])
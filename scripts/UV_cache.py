@@ -0,0 +1,120 @@
+#python
+
+"""
+UV_cache
+Author: Bjoern Siegert aka nicelife
+
+Keeps the UDIMMap which was last written to the UDIM selection sets of each
+mesh and uv map in a small file on disk, so it survives closing and reopening a scene.
+The file is only written after the sets were written (see UV_selSets.create_selSets),
+so it always describes the state of the sets.
+It holds the hash of the uv data the sets were made from and the hash of the map.
+If the uvs didn't change the stored map is memory-mapped instead of sorting the
+polygons again. If they did, the map hash tells if the polygons still sit in the
+same sets without reading the sets.
+
+File layout: sha1 of the uv data (20 bytes), sha1 of the map (20 bytes), 8 bytes padding, UDIMMap.tobytes()
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+import numpy as np
+
+import UV_udim
+
+FOLDER = ".mtk_cache" # Cache folder next to the scene file
+HEADER = 48 # Bytes in front of the map
+DIGEST = 20 # Bytes of a sha1 digest
+
+
+def cache_dir(scene_file=None):
+    """
+    Return the cache folder of a scene: .mtk_cache next to the scene file.
+    Unsaved scenes use a folder in the temp directory.
+    """
+    if scene_file:
+        return os.path.join(os.path.dirname(scene_file), FOLDER)
+
+    return os.path.join(tempfile.gettempdir(), "MARIToolKit_cache")
+
+
+def cache_file(directory, mesh_id, uvmap_name):
+    """Return the path of the cache file of a mesh and uv map"""
+    name = re.sub(r"[^\w.-]", "_", "%s_%s" % (mesh_id, uvmap_name))
+    return os.path.join(directory, name + ".udim")
+
+
+def uv_hash(uv_data):
+    """Return the sha1 digest of the polygon offsets and uvs of a UV_mesh.PolyUVs"""
+    digest = hashlib.sha1()
+    # The arrays are hashed in place, no copy is made if they are already little-endian
+    digest.update(np.ascontiguousarray(uv_data.offsets, dtype="<i4"))
+    digest.update(np.ascontiguousarray(uv_data.uvs, dtype="<f8"))
+    return digest.digest()
+
+
+def map_hash(udim_map):
+    """Return the sha1 digest of a UDIMMap. Maps with the same polys in the same UDIMs have the same digest."""
+    return hashlib.sha1(udim_map.tobytes()).digest()
+
+
+def digests(directory, mesh_id, uvmap_name):
+    """
+    Return the uv digest and map digest of the cache file: (uv digest, map digest)
+    Returns None if there is no cache file.
+    """
+    try:
+        with open(cache_file(directory, mesh_id, uvmap_name), "rb") as cache:
+            header = cache.read(DIGEST * 2)
+    except (IOError, OSError):
+        return None
+
+    if len(header) != DIGEST * 2:
+        return None
+
+    return header[:DIGEST], header[DIGEST:]
+
+
+def load(directory, mesh_id, uvmap_name, digest):
+    """
+    Return the cached UDIMMap, memory-mapped.
+    Returns None if there is no cache file or the uv data changed.
+    """
+    path = cache_file(directory, mesh_id, uvmap_name)
+    try:
+        with open(path, "rb") as cache:
+            if cache.read(len(digest)) != digest:
+                return None
+
+        return UV_udim.UDIMMap.read(path, mmap=True, offset=HEADER)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def store(directory, mesh_id, uvmap_name, digest, udim_map):
+    """
+    Write the UDIMMap of the selection sets to the cache. Only call it after
+    the sets were written. The file is replaced in one go, so a half written file is never read.
+    Returns False if the cache could not be written.
+    """
+    path = cache_file(directory, mesh_id, uvmap_name)
+    temp_path = path + ".tmp"
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with open(temp_path, "wb") as cache:
+            cache.write((digest + map_hash(udim_map)).ljust(HEADER, "\0"))
+            cache.write(udim_map.tobytes())
+
+        # os.rename doesn't replace existing files on Windows
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        return False
+
+    return True
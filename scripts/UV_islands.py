@@ -0,0 +1,199 @@
+#python
+
+"""
+UV_islands
+Author: Bjoern Siegert aka nicelife
+
+Finds the uv islands of a mesh with union-find over shared uv vertices.
+Two polygons are in the same island if they share a point with the same uv value.
+Works on the flat arrays of UV_mesh.PolyUVs. The shifted uvs are written
+back by UV_tools through UV_mesh.MeshSource.set_uvs.
+
+Islands
+Island of each polygon, bounding boxes, islands which straddle a UDIM border,
+the polys grouped by the main UDIM of their island
+and the shift which moves an island into the UDIM holding most of its area.
+"""
+
+import numpy as np
+
+import UV_udim
+
+
+def uv_vertices(verts, uvs):
+    """
+    Return the uv vertex id of each corner.
+    Corners share a uv vertex if point index, u and v are the same.
+    """
+    verts = np.asarray(verts)
+    uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+
+    order = np.lexsort((uvs[:, 1], uvs[:, 0], verts))
+    new_vertex = np.ones(len(order), dtype=bool)
+    new_vertex[1:] = (np.diff(verts[order]) != 0) | (np.diff(uvs[order], axis=0) != 0).any(axis=1)
+
+    ids = np.empty(len(order), dtype=np.int32)
+    ids[order] = np.cumsum(new_vertex) - 1
+
+    return ids
+
+
+def union_find(count, links_a, links_b):
+    """
+    Connected components of count nodes which are linked by links_a[i] - links_b[i].
+    Union-find with path halving, near linear in the number of links.
+    Returns the component of each node, numbered from 0.
+    """
+    parent = range(count)
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for a, b in zip(links_a.tolist(), links_b.tolist()):
+        root_a = find(a)
+        root_b = find(b)
+        if root_a != root_b:
+            if root_a < root_b:
+                parent[root_b] = root_a
+            else:
+                parent[root_a] = root_b
+
+    roots = np.array([find(node) for node in xrange(count)], dtype=np.int32)
+    return np.unique(roots, return_inverse=True)[1].astype(np.int32)
+
+
+def poly_areas(offsets, uvs):
+    """Return the uv area of each polygon (shoelace formula)"""
+    uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+    starts = offsets[:-1]
+
+    # Index of the next corner, the last corner wraps around to the first one
+    following = np.arange(1, len(uvs) + 1)
+    following[offsets[1:] - 1] = starts
+
+    cross = uvs[:, 0] * uvs[following, 1] - uvs[following, 0] * uvs[:, 1]
+    if not len(starts):
+        return np.zeros(0)
+
+    return 0.5 * np.abs(np.add.reduceat(cross, starts))
+
+
+class Islands(object):
+    """
+    UV islands of one uv map.
+
+    labels: island index of each polygon
+    count: number of islands
+    bbox: float array (islands, 4) with umin, vmin, umax, vmax
+    """
+
+    def __init__(self, offsets, verts, uvs):
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self.uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+
+        poly_count = len(self.offsets) - 1
+        self.corner_polys = np.repeat(np.arange(poly_count, dtype=np.int32), np.diff(self.offsets))
+
+        # Polygons are linked if corners use the same uv vertex.
+        # After sorting by uv vertex these corners are neighbours.
+        uv_ids = uv_vertices(verts, self.uvs)
+        order = np.argsort(uv_ids, kind="mergesort")
+        shared = uv_ids[order][1:] == uv_ids[order][:-1]
+        links_a = self.corner_polys[order][:-1][shared]
+        links_b = self.corner_polys[order][1:][shared]
+
+        # Neighbour polygons share more than one uv vertex, each link is only needed once
+        links = np.unique(np.minimum(links_a, links_b).astype(np.int64) * poly_count + np.maximum(links_a, links_b))
+        links_a, links_b = links // max(poly_count, 1), links % max(poly_count, 1)
+
+        self.labels = union_find(poly_count, links_a, links_b)
+        self.count = int(self.labels.max()) + 1 if poly_count else 0
+
+        # Bounding box of each island
+        corner_islands = self.labels[self.corner_polys]
+        self.bbox = np.empty((self.count, 4))
+        self.bbox[:, :2] = np.inf
+        self.bbox[:, 2:] = -np.inf
+        np.minimum.at(self.bbox[:, 0], corner_islands, self.uvs[:, 0])
+        np.minimum.at(self.bbox[:, 1], corner_islands, self.uvs[:, 1])
+        np.maximum.at(self.bbox[:, 2], corner_islands, self.uvs[:, 0])
+        np.maximum.at(self.bbox[:, 3], corner_islands, self.uvs[:, 1])
+
+    def polys(self, islands):
+        """Return the polygon indices of the given islands"""
+        return np.flatnonzero(np.in1d(self.labels, islands)).astype(np.int32)
+
+    def bbox_udims(self):
+        """
+        Return the UDIM of the lower left and the upper right corner of each island bbox.
+        A uv exactly on the upper/right border still belongs to the tile below/left.
+        """
+        low = UV_udim.udim_numbers(self.bbox[:, 0], self.bbox[:, 1])
+        high = UV_udim.udim_numbers(np.ceil(self.bbox[:, 2]) - 1, np.ceil(self.bbox[:, 3]) - 1)
+        return low, high
+
+    def straddling(self):
+        """Return the indices of the islands which spread over more than one UDIM"""
+        low, high = self.bbox_udims()
+        return np.flatnonzero(low != high)
+
+    def main_udims(self):
+        """Return the UDIM which holds most of the area of each island"""
+        areas = poly_areas(self.offsets, self.uvs)
+        counts = np.maximum(np.diff(self.offsets), 1).astype(np.float64)
+        centers_u = np.bincount(self.corner_polys, weights=self.uvs[:, 0], minlength=len(areas)) / counts
+        centers_v = np.bincount(self.corner_polys, weights=self.uvs[:, 1], minlength=len(areas)) / counts
+        poly_udims = UV_udim.udim_numbers(centers_u, centers_v)
+
+        # Sum the area per island and UDIM, the largest sum of each island wins.
+        # The polys are sorted by island and UDIM, each run of equal pairs is summed.
+        # UDIMs below 1001 (negative u or v) are fine, nothing is packed into one number.
+        order = np.lexsort((poly_udims, self.labels))
+        labels = self.labels[order]
+        udims = poly_udims[order]
+        new_pair = np.ones(len(order), dtype=bool)
+        new_pair[1:] = (labels[1:] != labels[:-1]) | (udims[1:] != udims[:-1])
+        pair_areas = np.bincount(np.cumsum(new_pair) - 1, weights=areas[order])
+        pair_islands = labels[new_pair]
+        pair_udims = udims[new_pair]
+
+        order = np.lexsort((-pair_areas, pair_islands))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = pair_islands[order][1:] != pair_islands[order][:-1]
+
+        main = np.empty(self.count, dtype=np.int32)
+        main[pair_islands[order][first]] = pair_udims[order][first]
+        return main
+
+    def udim_map(self):
+        """Return the polys grouped by the main UDIM of their island as UV_udim.UDIMMap"""
+        poly_index = np.arange(len(self.labels), dtype=np.int32)
+        return UV_udim.group_by_udim(poly_index, self.main_udims()[self.labels])
+
+    def shift_to_main_udim(self, islands):
+        """
+        Compute the shift of whole islands into the UDIM holding most of their area.
+        Islands larger than a UDIM are centered in it.
+
+        Returns the indices of the moved corners and their new uv values (corners, 2).
+        """
+        islands = np.asarray(islands, dtype=np.int32)
+        main = self.main_udims()[islands]
+        tiles = np.column_stack(((main - 1001) % 10, (main - 1001) // 10)).astype(np.float64)
+
+        # Smallest move which puts the bbox inside of the tile
+        low = tiles - self.bbox[islands, :2]
+        high = tiles + 1.0 - self.bbox[islands, 2:]
+        shift = np.minimum(np.maximum(0.0, low), high)
+        too_big = low > high
+        shift[too_big] = ((low + high) / 2.0)[too_big]
+
+        island_shift = np.zeros((self.count, 2))
+        island_shift[islands] = shift
+
+        corners = np.flatnonzero(np.in1d(self.labels[self.corner_polys], islands))
+        new_uvs = self.uvs[corners] + island_shift[self.labels[self.corner_polys[corners]]]
+        return corners, new_uvs
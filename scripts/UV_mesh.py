@@ -0,0 +1,374 @@
+#python
+
+"""
+UV_mesh
+Author: Bjoern Siegert aka nicelife
+
+Bulk access to the polygons and uvs of a mesh.
+Instead of one layerservice select/query per polygon all polygons are read
+in one sweep through the Mesh SDK and returned as compact arrays.
+
+MeshSource
+Reads a mesh layer through lx.object.Mesh. Only works inside of MODO.
+With edit=True polygon selection sets and uvs can be written in one mesh edit.
+
+ArraySource
+Stand-in with the same interface which is filled with python lists.
+Used to run and time the UV tools outside of MODO.
+"""
+
+import numpy as np
+
+
+class PolyUVs(object):
+    """
+    Polygon vertex lists and uv values of one uv map.
+    Polygon i owns the corners offsets[i]:offsets[i+1].
+
+    offsets: int32 array, number of polygons + 1
+    verts: int32 array, point index of each corner
+    uvs: float64 array (corners, 2), u and v of each corner
+    """
+
+    def __init__(self, offsets, verts, uvs):
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self.verts = np.asarray(verts, dtype=np.int32)
+        self.uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+
+    @property
+    def poly_count(self):
+        return len(self.offsets) - 1
+
+    def poly_index(self):
+        """Return the polygon indices as int32 array"""
+        return np.arange(self.poly_count, dtype=np.int32)
+
+    def vertex_counts(self):
+        """Return the number of corners of each polygon"""
+        return np.diff(self.offsets)
+
+    def corner_polys(self):
+        """Return the polygon index of each corner"""
+        return np.repeat(self.poly_index(), self.vertex_counts())
+
+    def first_uvs(self):
+        """Return the uv of the first corner of each polygon. Enough to find its UDIM."""
+        return self.uvs[self.offsets[:-1]]
+
+    def poly_uvs(self, poly):
+        """Return the uvs of one polygon as list of (u,v) tuples"""
+        return [tuple(uv) for uv in self.uvs[self.offsets[poly]:self.offsets[poly + 1]]]
+
+    def poly_verts(self, poly):
+        """Return the point indices of one polygon"""
+        return list(self.verts[self.offsets[poly]:self.offsets[poly + 1]])
+
+
+def pack(polygons, uvs):
+    """
+    Build PolyUVs from nested lists.
+    polygons: [[point_index,...],...]
+    uvs: [[(u,v),...],...] one (u,v) per polygon corner
+    """
+    counts = [len(poly) for poly in polygons]
+    offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+
+    verts = [point for poly in polygons for point in poly]
+    corner_uvs = [uv for poly in uvs for uv in poly]
+
+    if len(corner_uvs) != len(verts):
+        raise ValueError("Number of uvs does not match the polygon corners")
+
+    return PolyUVs(offsets, verts, corner_uvs)
+
+
+class ArraySource(object):
+    """
+    Stand-in for MeshSource which needs no MODO.
+    polygons: [[point_index,...],...]
+    uvmaps: {uvmap_name:[[(u,v),...],...]}
+    sel_sets: {set_name:[poly_index,...]} optional
+    positions: [(x,y,z),...] one per point, optional
+    """
+
+    def __init__(self, polygons, uvmaps, sel_sets=None, positions=None):
+        self.polygons = polygons
+        self.uvmaps = uvmaps
+        self.sel_sets = sel_sets or {}
+        self._positions = positions if positions is not None else []
+
+    def selSet_names(self, prefix=""):
+        """Return the names of the polygon selection sets starting with prefix"""
+        return set(name for name in self.sel_sets if name.startswith(prefix))
+
+    def uvmap_names(self):
+        """Return the names of all uv maps"""
+        return sorted(self.uvmaps.keys())
+
+    def read(self, uvmap_name, verts=True):
+        """Return PolyUVs for the given uv map. With verts=False the point indices are left empty."""
+        if uvmap_name not in self.uvmaps:
+            raise LookupError("No uv map named %s" % uvmap_name)
+
+        poly_uvs = pack(self.polygons, self.uvmaps[uvmap_name])
+        if not verts:
+            poly_uvs.verts = np.zeros(0, dtype=np.int32)
+
+        return poly_uvs
+
+    def positions(self):
+        """Return the position of each point as float64 array (points, 3)"""
+        return np.asarray(self._positions, dtype=np.float64).reshape(-1, 3)
+
+    def set_selSets(self, sets, prefix, polys=None):
+        """
+        Same as MeshSource.set_selSets on the sel_sets of the stand-in.
+        Returns the number of polygons whose set changed.
+        """
+        poly_sets = {}
+        for set_name, members in sets.iteritems():
+            for poly in members:
+                poly_sets[int(poly)] = set_name
+
+        if polys is None:
+            polys = xrange(len(self.polygons))
+        polys = set(int(poly) for poly in polys)
+
+        # Take the polys out of their old sets
+        old_sets = {}
+        for set_name, members in self.sel_sets.items():
+            if not set_name.startswith(prefix):
+                continue
+            for poly in members:
+                if int(poly) in polys:
+                    old_sets[int(poly)] = set_name
+            members = [poly for poly in members if int(poly) not in polys]
+            if members:
+                self.sel_sets[set_name] = members
+            else:
+                del self.sel_sets[set_name]
+
+        edited = 0
+        for poly in sorted(polys):
+            set_name = poly_sets.get(poly)
+            if set_name is not None:
+                self.sel_sets.setdefault(set_name, []).append(poly)
+            if old_sets.get(poly) != set_name:
+                edited += 1
+
+        return edited
+
+
+class MeshSource(object):
+    """
+    Reads polygons and uvs through lx.object.Mesh.
+    Without a mesh_id the primary mesh layer is used.
+    With edit=True the mesh is opened for editing. Changes are applied with apply().
+    """
+
+    def __init__(self, mesh_id=None, edit=False):
+        import lx
+        self.lx = lx
+
+        flags = lx.symbol.f_LAYERSCAN_PRIMARY
+        if edit:
+            flags |= lx.symbol.f_LAYERSCAN_EDIT
+
+        layer_svc = lx.service.Layer()
+        if mesh_id is None:
+            scan = layer_svc.ScanAllocate(flags)
+        else:
+            import lxu.select
+            scene = lxu.select.SceneSelection().current()
+            scan = layer_svc.ScanAllocateItem(scene.ItemLookup(mesh_id), flags)
+
+        self.scan = lx.object.LayerScan(scan)
+        if not self.scan.test() or self.scan.Count() == 0:
+            raise LookupError("No mesh layer found")
+
+        if edit:
+            self.mesh = lx.object.Mesh(self.scan.MeshEdit(0))
+        else:
+            self.mesh = lx.object.Mesh(self.scan.MeshBase(0))
+
+    def apply(self, change):
+        """Apply the edits to the mesh. change are the f_MESHEDIT flags of what was edited."""
+        self.scan.SetMeshChange(0, change)
+        self.scan.Apply()
+
+    def _meshmap(self):
+        return self.lx.object.MeshMap(self.mesh.MeshMapAccessor())
+
+    def uvmap_names(self):
+        """Return the names of all uv maps"""
+        meshmap = self._meshmap()
+        meshmap.FilterByType(self.lx.symbol.i_VMAP_TEXTUREUV)
+        names = []
+        for i in xrange(meshmap.Count()):
+            meshmap.SelectByIndex(i)
+            names.append(meshmap.Name())
+        meshmap.FilterByType(0)
+
+        return names
+
+    def selSet_names(self, prefix=""):
+        """Return the names of the polygon selection sets starting with prefix"""
+        pick = self.lx.symbol.i_PTAG_PICK
+        names = set()
+        for i in xrange(self.mesh.PTagCount(pick)):
+            for name in self.mesh.PTagByIndex(pick, i).split(";"):
+                if name and name.startswith(prefix):
+                    names.add(name)
+
+        return names
+
+    def map_id(self, uvmap_name):
+        """Return the map ID of the uv map. Raises LookupError if it doesn't exist."""
+        meshmap = self._meshmap()
+        meshmap.SelectByName(self.lx.symbol.i_VMAP_TEXTUREUV, uvmap_name)
+        return meshmap.ID()
+
+    def read(self, uvmap_name, verts=True):
+        """
+        Return PolyUVs for the given uv map. All polygons are read in one sweep.
+        With verts=False the point indices are not queried and left empty,
+        which saves two SDK calls per corner when only the uvs are needed (UDIMs, fingerprints).
+        """
+        lx = self.lx
+        map_id = self.map_id(uvmap_name)
+
+        polygon = lx.object.Polygon(self.mesh.PolygonAccessor())
+        point = lx.object.Point(self.mesh.PointAccessor())
+        value = lx.object.storage()
+        value.setType('f')
+        value.setSize(2)
+
+        poly_num = self.mesh.PolygonCount()
+        offsets = np.zeros(poly_num + 1, dtype=np.int32)
+        read_verts = verts
+        verts = []
+        uvs = []
+
+        for i in xrange(poly_num):
+            polygon.SelectByIndex(i)
+            vert_num = polygon.VertexCount()
+            offsets[i + 1] = offsets[i] + vert_num
+
+            for v in xrange(vert_num):
+                point_id = polygon.VertexByIndex(v)
+                if read_verts:
+                    point.Select(point_id)
+                    verts.append(point.Index())
+
+                # Unmapped points get 0,0 like in the UV editor
+                if polygon.MapEvaluate(map_id, point_id, value):
+                    uvs.extend(value.get())
+                else:
+                    uvs.extend((0.0, 0.0))
+
+        return PolyUVs(offsets, verts, uvs)
+
+    def positions(self):
+        """Return the position of each point as float64 array (points, 3)"""
+        point = self.lx.object.Point(self.mesh.PointAccessor())
+        positions = np.empty((self.mesh.PointCount(), 3))
+        for i in xrange(len(positions)):
+            point.SelectByIndex(i)
+            positions[i] = point.Pos()
+
+        return positions
+
+    def set_selSets(self, sets, prefix, polys=None):
+        """
+        Write polygon selection sets in one mesh edit. No commands are needed.
+        Selection sets are stored in the PICK tag of a polygon, separated by ";".
+        All sets of the polygons starting with prefix are replaced by the new ones.
+        If polys is given only these polygons are edited, otherwise all.
+        
+        sets: {set_name:[poly_index,...]}
+        Returns the number of edited polygons.
+        """
+        lx = self.lx
+
+        # Name of the new set for each polygon
+        poly_sets = {}
+        for set_name, members in sets.iteritems():
+            for poly in members:
+                poly_sets[int(poly)] = set_name
+
+        polygon = lx.object.Polygon(self.mesh.PolygonAccessor())
+        edited = 0
+
+        if polys is None:
+            polys = xrange(self.mesh.PolygonCount())
+
+        for i in polys:
+            i = int(i)
+            polygon.SelectByIndex(i)
+            try:
+                old_tag = polygon.GetTag(lx.symbol.i_PTAG_PICK) or ""
+            except LookupError:
+                old_tag = ""
+
+            names = [name for name in old_tag.split(";") if name and not name.startswith(prefix)]
+            if i in poly_sets:
+                names.append(poly_sets[i])
+
+            new_tag = ";".join(names)
+            if new_tag != old_tag:
+                polygon.SetTag(lx.symbol.i_PTAG_PICK, new_tag or None)
+                edited += 1
+
+        self.apply(lx.symbol.f_MESHEDIT_POL_TAGS)
+
+        return edited
+
+    def set_uvs(self, uvmap_name, uv_data, corners, values):
+        """
+        Write new uv values for some corners in one mesh edit.
+        Points whose corners all end up with the same uv keep a continuous uv,
+        all others get a discontinuous value for the polygon.
+        
+        uv_data: PolyUVs read from the same mesh
+        corners: corner indices into uv_data
+        values: new uvs of the corners (corners, 2)
+        """
+        lx = self.lx
+        map_id = self.map_id(uvmap_name)
+
+        corners = np.asarray(corners)
+        values = np.asarray(values, dtype=np.float64).reshape(-1, 2)
+
+        new_uvs = uv_data.uvs.copy()
+        new_uvs[corners] = values
+        corner_polys = uv_data.corner_polys()
+
+        # A point is continuous if all its corners share the same old and the same new uv
+        points = uv_data.verts[corners]
+        touched = np.flatnonzero(np.in1d(uv_data.verts, points))
+        touched = touched[np.argsort(uv_data.verts[touched], kind="mergesort")]
+        keys, starts = np.unique(uv_data.verts[touched], return_index=True)
+
+        same = np.ones(len(keys), dtype=bool)
+        for uvs in (uv_data.uvs[touched], new_uvs[touched]):
+            same &= (np.maximum.reduceat(uvs, starts) == np.minimum.reduceat(uvs, starts)).all(axis=1)
+        continuous = set(keys[same].tolist())
+
+        polygon = lx.object.Polygon(self.mesh.PolygonAccessor())
+        point = lx.object.Point(self.mesh.PointAccessor())
+        value = lx.object.storage()
+        value.setType('f')
+        value.setSize(2)
+
+        for corner, point_index, uv in zip(corners, points, values):
+            point.SelectByIndex(int(point_index))
+            value.set((float(uv[0]), float(uv[1])))
+
+            if int(point_index) in continuous:
+                point.SetMapValue(map_id, value)
+            else:
+                polygon.SelectByIndex(int(corner_polys[corner]))
+                polygon.SetMapValue(point.ID(), map_id, value)
+
+        self.apply(lx.symbol.f_MESHEDIT_MAP_UV | lx.symbol.f_MESHEDIT_MAP_CONTINUITY)
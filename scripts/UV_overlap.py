@@ -0,0 +1,321 @@
+#python
+
+"""
+UV_overlap
+Author: Bjoern Siegert aka nicelife
+
+Finds overlapping uv polygons inside of each UDIM.
+The polygons are split into convex pieces: triangles and convex quads stay
+whole, other polygons are triangulated. So a quad mesh is searched with half
+as many pieces as triangles, and one exact test covers two triangles each.
+The pieces of each UDIM are rasterized conservatively into occupancy grids:
+a piece is put into every cell its bounding box touches, so even pieces
+smaller than a cell are binned. Only pieces whose bounding boxes overlap
+are tested exactly against each other with the separating axis test, which
+rejects the false candidates of the bounding boxes.
+Polygons which only touch at an edge or a point don't count as overlapping.
+
+The grids form levels, each four times coarser than the one before. The finest
+cell is about as large as a typical piece. Each piece belongs to the
+finest level where its box is at most two cells wide, so large pieces don't
+fill the fine grid and small ones don't crowd the coarse cells.
+
+triangulate
+Fan triangulation of the polygons as corner indices.
+
+convex_pieces
+The convex pieces of the polygons as four corner indices each.
+
+find_overlaps
+Returns the overlapping polygons of each UDIM as UV_udim.UDIMMap.
+"""
+
+import numpy as np
+
+import UV_udim
+
+
+def triangulate(offsets):
+    """
+    Fan triangulation of all polygons.
+    Returns the polygon of each triangle and the corner indices (triangles, 3).
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    tri_counts = np.maximum(np.diff(offsets) - 2, 0)
+
+    tri_polys = np.repeat(np.arange(len(tri_counts), dtype=np.int32), tri_counts)
+    tri_starts = np.cumsum(tri_counts) - tri_counts
+    local = np.arange(len(tri_polys)) - np.repeat(tri_starts, tri_counts)
+
+    first = offsets[:-1][tri_polys]
+    corners = np.column_stack((first, first + local + 1, first + local + 2))
+
+    return tri_polys, corners
+
+
+def convex_pieces(offsets, uvs):
+    """
+    Split the polygons into convex pieces of four corners.
+    Triangles and convex quads are one piece, a triangle repeats its last corner.
+    All other polygons are fan triangulated into pieces.
+    Returns the polygon of each piece and the corner indices (pieces, 4).
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    whole = counts == 3
+
+    # A quad is convex if it turns the same way at every corner
+    quads = np.flatnonzero(counts == 4)
+    quad_uvs = uvs[offsets[quads][:, None] + np.arange(4)]
+    edges = np.roll(quad_uvs, -1, axis=1) - quad_uvs
+    following = np.roll(edges, -1, axis=1)
+    turns = edges[:, :, 0] * following[:, :, 1] - edges[:, :, 1] * following[:, :, 0]
+    whole[quads] = (turns >= 0).all(axis=1) | (turns <= 0).all(axis=1)
+
+    whole_polys = np.flatnonzero(whole).astype(np.int32)
+    whole_corners = offsets[whole_polys][:, None] + np.minimum(np.arange(4), counts[whole_polys][:, None] - 1)
+
+    tri_polys, tri_corners = triangulate(offsets)
+    split = ~whole[tri_polys]
+    tri_polys, tri_corners = tri_polys[split], tri_corners[split]
+
+    return (np.concatenate((whole_polys, tri_polys)),
+            np.concatenate((whole_corners, tri_corners[:, [0, 1, 2, 2]])))
+
+
+MAX_GRID = 8192 # Cells per UDIM side of the finest level
+LEVEL_RATIO = 4 # Cells per side of a level in one cell of the next coarser level
+
+
+def corner_range(values):
+    """Lowest and highest value of the corners of each piece (pieces, corners)"""
+    low = high = values[:, 0]
+    for corner in xrange(1, values.shape[1]):
+        low = np.minimum(low, values[:, corner])
+        high = np.maximum(high, values[:, corner])
+    return low, high
+
+
+def piece_bounds(piece_uvs):
+    """Bounding box of each piece or triangle: lowest and highest uv (pieces, 2)"""
+    low_u, high_u = corner_range(piece_uvs[:, :, 0])
+    low_v, high_v = corner_range(piece_uvs[:, :, 1])
+    return np.column_stack((low_u, low_v)), np.column_stack((high_u, high_v))
+
+
+def cell_spans(bounds, size):
+    """
+    Return the first cell and the number of cells in u and v of each bounding box.
+    bounds: piece_bounds of the pieces of one UDIM moved to 0-1
+    A box which ends on a cell border doesn't reach into the next cell, touching can't overlap.
+    """
+    low = np.clip(np.floor(bounds[0] * size), 0, size - 1).astype(np.int64)
+    high = np.clip(np.ceil(bounds[1] * size) - 1, 0, size - 1).astype(np.int64)
+    return low, np.maximum(high - low, 0) + 1
+
+
+def grid_levels(bounds):
+    """
+    Return the cells per side of each grid level, finest first, and the level of each piece.
+    The finest cell is the power of two at most as large as the median box.
+    A piece belongs to the finest level whose cells are at least half as large as its box.
+    """
+    extent = (bounds[1] - bounds[0]).max(axis=1)
+    typical = np.median(extent) if len(extent) else 1.0
+    size = MAX_GRID if typical <= 0 else int(2 ** np.clip(np.ceil(-np.log2(typical)), 0, np.log2(MAX_GRID)))
+
+    sizes = [size]
+    while sizes[-1] > 1:
+        sizes.append(max(sizes[-1] // LEVEL_RATIO, 1))
+
+    scaled = np.maximum(extent * size / 2.0, 1.0)
+    levels = np.ceil(np.log(scaled) / np.log(LEVEL_RATIO) - 1e-9).astype(np.int64)
+    return sizes, np.clip(levels, 0, len(sizes) - 1)
+
+
+def rasterize(bounds, size, chunk=200000):
+    """
+    Return the cell and the piece of every cell touched by the bounding box of a piece.
+    bounds: piece_bounds of the pieces of one UDIM moved to 0-1
+    size: cells per side of the grid
+    """
+    cells = []
+    pieces = []
+    # Chunks keep the temporary arrays small
+    for start in xrange(0, len(bounds[0]), chunk):
+        low, span = cell_spans((bounds[0][start:start + chunk], bounds[1][start:start + chunk]), size)
+        counts = span[:, 0] * span[:, 1]
+
+        entry_pieces = np.repeat(np.arange(len(low)), counts)
+        local = np.arange(len(entry_pieces)) - np.repeat(np.cumsum(counts) - counts, counts)
+        x = low[entry_pieces, 0] + local % span[entry_pieces, 0]
+        y = low[entry_pieces, 1] + local // span[entry_pieces, 0]
+
+        cells.append(y * size + x)
+        pieces.append(entry_pieces + start)
+
+    if not cells:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    return np.concatenate(cells), np.concatenate(pieces)
+
+
+def cell_pairs(cells, pieces, owned, chunk=4000000):
+    """
+    Yield the pairs of pieces sharing a cell where the first one is owned, and the cell of each pair.
+    cells, pieces and owned are the cell, the piece and if the piece belongs to the level of each grid entry.
+    Two owned pieces are paired once, the lower piece first.
+    The pairs are yielded in chunks of about chunk pairs.
+    """
+    order = np.argsort(cells)
+    cells = cells[order]
+    pieces = pieces[order]
+    owned = owned[order]
+
+    starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+    counts = np.diff(np.append(starts, len(cells)))
+    cell_index = np.repeat(np.arange(len(starts)), counts)
+
+    # Each owned entry is paired with all entries of its cell
+    owned_entries = np.flatnonzero(owned)
+    pair_counts = counts[cell_index[owned_entries]]
+    splits = np.searchsorted(np.cumsum(pair_counts), np.arange(chunk, pair_counts.sum(), chunk))
+    for first, pair_counts in zip(np.split(owned_entries, splits), np.split(pair_counts, splits)):
+        local = np.arange(pair_counts.sum()) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+        second = np.repeat(starts[cell_index[first]], pair_counts) + local
+        first = np.repeat(first, pair_counts)
+
+        keep = np.flatnonzero((pieces[first] != pieces[second]) & (~owned[second] | (pieces[first] < pieces[second])))
+        first, second = first[keep], second[keep]
+
+        yield pieces[first], pieces[second], cells[first]
+
+
+def pieces_overlap(piece_a, piece_b, epsilon=1e-9):
+    """
+    Separating axis test for pairs of convex pieces (pairs, corners, 2).
+    Pieces overlap if no axis separates them by more than -epsilon,
+    so pieces sharing an edge or a point don't overlap.
+    The bounding boxes (u and v axis) are tested first, then the edge normals.
+    A repeated corner has no edge and can't separate.
+    Pairs which are separated are dropped after each axis.
+    """
+    pairs = np.arange(len(piece_a))
+    corners = piece_a.shape[1]
+
+    for axis in (0, 1):
+        low_a, high_a = corner_range(piece_a[pairs, :, axis])
+        low_b, high_b = corner_range(piece_b[pairs, :, axis])
+        pairs = pairs[np.minimum(high_a, high_b) - np.maximum(low_a, low_b) > epsilon]
+
+    for second in (False, True):
+        for i in xrange(corners):
+            a = piece_a[pairs]
+            b = piece_b[pairs]
+            piece = b if second else a
+            edge = piece[:, (i + 1) % corners] - piece[:, i]
+            length = np.sqrt((edge ** 2).sum(axis=1))
+            no_edge = length == 0
+            length[no_edge] = 1.0
+            normal_u = (-edge[:, 1] / length)[:, None]
+            normal_v = (edge[:, 0] / length)[:, None]
+
+            low_a, high_a = corner_range(a[:, :, 0] * normal_u + a[:, :, 1] * normal_v)
+            low_b, high_b = corner_range(b[:, :, 0] * normal_u + b[:, :, 1] * normal_v)
+            pairs = pairs[(np.minimum(high_a, high_b) - np.maximum(low_a, low_b) > epsilon) | no_edge]
+
+    overlap = np.zeros(len(piece_a), dtype=bool)
+    overlap[pairs] = True
+    return overlap
+
+
+def candidates(bounds, epsilon=1e-9):
+    """
+    Return the pairs of pieces of one UDIM whose bounding boxes overlap.
+    bounds: piece_bounds of the pieces of one UDIM moved to 0-1
+
+    Each pair is found on the level of its coarser piece, the finer one is
+    rasterized on that level too. It is returned once: only in the first cell
+    which both boxes touch.
+    """
+    sizes, levels = grid_levels(bounds)
+    low_u, low_v = np.ascontiguousarray(bounds[0][:, 0]), np.ascontiguousarray(bounds[0][:, 1])
+    high_u, high_v = np.ascontiguousarray(bounds[1][:, 0]), np.ascontiguousarray(bounds[1][:, 1])
+
+    pairs_a = []
+    pairs_b = []
+    for level, size in enumerate(sizes):
+        if not (levels == level).any():
+            continue
+
+        members = np.flatnonzero(levels <= level)
+        cells, entries = rasterize((bounds[0][members], bounds[1][members]), size)
+        pieces = members[entries]
+
+        first_cells = cell_spans(bounds, size)[0]
+        first_x, first_y = np.ascontiguousarray(first_cells[:, 0]), np.ascontiguousarray(first_cells[:, 1])
+
+        for pieces_a, pieces_b, pair_cells in cell_pairs(cells, pieces, levels[pieces] == level):
+            keep = np.flatnonzero(np.maximum(first_y[pieces_a], first_y[pieces_b]) * size +
+                                  np.maximum(first_x[pieces_a], first_x[pieces_b]) == pair_cells)
+            pieces_a, pieces_b = pieces_a[keep], pieces_b[keep]
+
+            # Boxes which share a cell may still lie side by side
+            for low, high in ((low_u, high_u), (low_v, high_v)):
+                keep = np.flatnonzero(np.minimum(high[pieces_a], high[pieces_b]) - np.maximum(low[pieces_a], low[pieces_b]) > epsilon)
+                pieces_a, pieces_b = pieces_a[keep], pieces_b[keep]
+
+            pairs_a.append(pieces_a)
+            pairs_b.append(pieces_b)
+
+    if not pairs_a:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    return np.concatenate(pairs_a), np.concatenate(pairs_b)
+
+
+def find_overlaps(uv_data, udim_map, epsilon=1e-9, chunk=1000000):
+    """
+    Find the polygons which overlap other polygons of the same UDIM.
+    uv_data: UV_mesh.PolyUVs
+    udim_map: UV_udim.UDIMMap of uv_data, e.g. from UV_selSets.uv_list
+
+    Returns a UV_udim.UDIMMap with the overlapping polys of each UDIM
+    and the number of exact piece tests.
+    """
+    piece_polys, corners = convex_pieces(uv_data.offsets, uv_data.uvs)
+    piece_uvs = uv_data.uvs[corners]
+
+    # UDIM of each piece
+    poly_udims = np.zeros(uv_data.poly_count, dtype=np.int32)
+    poly_udims[udim_map.polys] = np.repeat(udim_map.keys_array, np.diff(udim_map.offsets))
+    piece_udims = poly_udims[piece_polys]
+
+    order = np.argsort(piece_udims, kind="mergesort")
+    keys, starts = np.unique(piece_udims[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+
+    polys = []
+    tests = 0
+    for UDIM, start, end in zip(keys, starts, ends):
+        pieces = order[start:end]
+        origin = np.array(((UDIM - 1001) % 10, (UDIM - 1001) // 10), dtype=np.float64)
+        bounds = piece_bounds(piece_uvs[pieces] - origin)
+        pieces_a, pieces_b = candidates(bounds, epsilon)
+        pieces_a, pieces_b = pieces[pieces_a], pieces[pieces_b]
+
+        # Pieces of the same polygon don't count
+        other_poly = piece_polys[pieces_a] != piece_polys[pieces_b]
+        pieces_a, pieces_b = pieces_a[other_poly], pieces_b[other_poly]
+        tests += len(pieces_a)
+
+        # Chunks keep the piece copies small
+        for first in xrange(0, len(pieces_a), chunk):
+            chunk_a, chunk_b = pieces_a[first:first + chunk], pieces_b[first:first + chunk]
+            hit = pieces_overlap(piece_uvs[chunk_a], piece_uvs[chunk_b], epsilon)
+            polys.append(piece_polys[chunk_a[hit]])
+            polys.append(piece_polys[chunk_b[hit]])
+
+    polys = np.unique(np.concatenate(polys)) if polys else np.zeros(0, dtype=np.int32)
+
+    return UV_udim.group_by_udim(polys, poly_udims[polys]), tests
@@ -0,0 +1,243 @@
+#python
+
+"""
+UV_selSets
+Author: Bjoern Siegert aka nicelife
+
+Creates the UDIM selection sets ($UDIM:1001, $UDIM:1002,...) of mesh items.
+Runs in-process, so any number of meshes is handled in one session without
+running UV_tools.py again for each mesh or changing the item selection.
+
+create_selSets
+Creates or updates the sets of one mesh item.
+
+batch_create_selSets
+Creates the sets for a list of mesh items and reports the time per mesh.
+
+stale_meshes
+Returns the mesh items whose sets are missing or don't match their uvs.
+
+The UDIMs written to the sets of each mesh are cached on disk (see UV_cache).
+If the uvs didn't change since the sets were written no polygon is sorted or edited.
+Only create_selSets writes the cache, the other functions just read it.
+"""
+
+import time
+
+import lx
+
+import UV_cache
+import UV_mesh
+import UV_udim
+
+PREFIX = "$UDIM:" # Prefix of the UDIM selection sets
+
+
+def uv_list(uv_data):
+    """
+    Here we fill the uv_dict with the poly indices
+    We only need the first uv values of the polygon. This is
+    enough to identify uv sector.
+
+    Input: UV_mesh.PolyUVs
+
+    Returns a UV_udim.UDIMMap. The key is the UDIM, the value is an array
+    of the poly indices in this UDIM
+    {UDIM:array([poly_index,...])}
+    """
+    # For the UDIM we need to get the first u and v value.
+    # All other uvs of the poly must lie in the same uv space
+    # so we don't bother with the remaining ones.
+    first_uvs = uv_data.first_uvs()
+
+    # The UDIMs and the grouping are done in one go for all polys
+    return UV_udim.bucket_polys(uv_data.poly_index(), first_uvs[:, 0], first_uvs[:, 1])
+
+
+def cache_dir():
+    """Return the UDIM cache folder of the current scene"""
+    return UV_cache.cache_dir(lx.eval("query sceneservice scene.file ? current"))
+
+
+def cached_map(mesh_id, uvmap_name, uv_data, directory):
+    """
+    Return the UDIMMap of the uv data from the cache or sort the polys.
+    Nothing is stored, the cache holds the state of the selection sets.
+    Returns the map and True if it came from the cache.
+    """
+    udim_map = UV_cache.load(directory, mesh_id, uvmap_name, UV_cache.uv_hash(uv_data))
+    if udim_map is not None:
+        return udim_map, True
+
+    return uv_list(uv_data), False
+
+
+def sets_match(mesh_id, uvmap_name, uv_data, directory, source):
+    """
+    True if the UDIM selection sets of the mesh hold the UDIMs of the uv data.
+    The sets must have been written by create_selSets: either from the same uvs
+    or from uvs which put every poly into the same UDIM. Nothing is stored.
+    """
+    cached = UV_cache.digests(directory, mesh_id, uvmap_name)
+    if cached is None:
+        return False
+
+    uv_digest, map_digest = cached
+    if uv_digest == UV_cache.uv_hash(uv_data):
+        mesh_map = UV_cache.load(directory, mesh_id, uvmap_name, uv_digest)
+    else:
+        mesh_map = uv_list(uv_data)
+        if UV_cache.map_hash(mesh_map) != map_digest:
+            return False
+
+    return mesh_map is not None and set(set_names(mesh_map)) == source.selSet_names(PREFIX)
+
+
+def udim_map(mesh_id, uvmap_name, directory=None):
+    """
+    Return the UV_udim.UDIMMap of a mesh item without touching its selection sets or the cache.
+    Raises LookupError if the mesh has no uv map with this name.
+    """
+    uv_data = UV_mesh.MeshSource(mesh_id).read(uvmap_name, verts=False)
+    return cached_map(mesh_id, uvmap_name, uv_data, directory or cache_dir())[0]
+
+
+def set_names(uv_dict):
+    """Convert {UDIM:polys} to {set name:polys}. The name follows the UDIM: $UDIM:1011"""
+    sel_sets = {}
+    for UDIM, value in uv_dict.iteritems():
+        sel_sets["%s%s" %(PREFIX, UDIM)] = value
+
+    return sel_sets
+
+
+def create_selSets(mesh_id, uvmap_name, directory=None):
+    """
+    Create or update the UDIM selection sets of a mesh item.
+    If the sets already hold the UDIMs of the uvs (see sets_match) nothing is edited.
+    If the sets were created in this session before only the polys
+    with changed uvs are updated. The stored UDIMs must match the sets of the mesh.
+    Raises LookupError if the mesh has no uv map with this name.
+
+    On an update the fingerprint diff, the new UDIMs and the tag edits of the
+    moved polys take well under a second on 3M polys. Reading the uvs still
+    visits every corner through the Mesh SDK, which has no bulk access in Python.
+
+    Returns the UV_udim.UDIMMap of the mesh and the number of edited polygons.
+    """
+    source = UV_mesh.MeshSource(mesh_id)
+    uv_data = source.read(uvmap_name, verts=False)
+    key = (mesh_id, uvmap_name)
+
+    digest = UV_cache.uv_hash(uv_data)
+    directory = directory or cache_dir()
+    if sets_match(mesh_id, uvmap_name, uv_data, directory, source):
+        # The sets hold the UDIMs of these uvs. Keep the assignment for later incremental updates.
+        UV_udim.assignments[key] = UV_udim.UDIMAssignment(uv_data.offsets, uv_data.uvs)
+        cached = UV_cache.load(directory, mesh_id, uvmap_name, digest)
+        if cached is None:
+            # Same UDIMs from changed uvs, the sets stay as they are
+            cached = uv_list(uv_data)
+            UV_cache.store(directory, mesh_id, uvmap_name, digest, cached)
+        lx.out("Selection sets up to date: %s" %mesh_id)
+        return cached, 0
+
+    assignment = UV_udim.assignments.get(key)
+    changed = None
+    if assignment is not None and assignment.set_names(PREFIX) == source.selSet_names(PREFIX):
+        try:
+            changed, old_udims = assignment.update(uv_data.offsets, uv_data.uvs)
+        except ValueError:
+            changed = None
+
+    if changed is not None:
+        # Only polys which changed their UDIM are written
+        new_udims = assignment.udims[changed]
+        moved = old_udims != new_udims
+
+        edited = 0
+        if moved.any():
+            sel_sets = set_names(UV_udim.group_by_udim(changed[moved], new_udims[moved]))
+            edited = UV_mesh.MeshSource(mesh_id, edit=True).set_selSets(sel_sets, PREFIX, polys=changed[moved])
+
+        # Logging
+        for UDIM in sorted(set(old_udims[moved]) | set(new_udims[moved])):
+            lx.out("Selection set updated: %s%s" %(PREFIX, UDIM))
+
+        uv_dict = assignment.udim_map()
+        UV_cache.store(directory, mesh_id, uvmap_name, digest, uv_dict)
+        return uv_dict, edited
+
+    # The polys of each UDIM are written to their selection set
+    # in one mesh edit. Old UDIM sets are removed at the same time.
+    uv_dict = uv_list(uv_data)
+    edited = UV_mesh.MeshSource(mesh_id, edit=True).set_selSets(set_names(uv_dict), PREFIX)
+    UV_udim.assignments[key] = UV_udim.UDIMAssignment(uv_data.offsets, uv_data.uvs)
+    UV_cache.store(directory, mesh_id, uvmap_name, digest, uv_dict)
+
+    # Logging
+    for UDIM in sorted(uv_dict):
+        lx.out("New selection set created: %s%s" %(PREFIX, UDIM))
+
+    return uv_dict, edited
+
+
+def stale_meshes(mesh_ids, uvmap_name):
+    """
+    Return the mesh items whose UDIM selection sets are missing or don't match the UDIMs of their uvs.
+    Sets which weren't written by create_selSets count as stale, their polys are unknown.
+    Meshes without the uv map are skipped. The cache is not written.
+    """
+    directory = cache_dir()
+    stale = []
+    for mesh_id in mesh_ids:
+        source = UV_mesh.MeshSource(mesh_id)
+        try:
+            uv_data = source.read(uvmap_name, verts=False)
+        except LookupError:
+            continue
+
+        if not sets_match(mesh_id, uvmap_name, uv_data, directory, source):
+            stale.append(mesh_id)
+
+    return stale
+
+
+def batch_create_selSets(mesh_ids, uvmap_name):
+    """
+    Create the UDIM selection sets for all given mesh items in one go.
+    Meshes without the uv map are skipped.
+
+    Returns a list with the time per mesh: [(mesh_id, seconds),...]
+    and the UV_udim.UDIMMap of all meshes. The poly indices of each mesh
+    follow the ones of the mesh before.
+    """
+    progressbar = lx.Monitor()
+    progressbar.init(len(mesh_ids))
+
+    timings = []
+    maps = []
+    directory = cache_dir()
+    t1 = time.time()
+    for mesh_id in mesh_ids:
+        t_mesh = time.time()
+        try:
+            mesh_map, edited = create_selSets(mesh_id, uvmap_name, directory)
+        except LookupError:
+            lx.out("MARI ToolKit: %s has no uv map %s. Skipped." %(mesh_id, uvmap_name))
+        else:
+            timings.append((mesh_id, time.time() - t_mesh))
+            maps.append(mesh_map)
+            lx.out("%s: %s selection sets, %s polygons edited, %s sec" %(mesh_id, len(mesh_map), edited, timings[-1][1]))
+
+        progressbar.step(1)
+
+    bases = [0]
+    for mesh_map in maps[:-1]:
+        bases.append(bases[-1] + len(mesh_map.polys))
+    scene_map = UV_udim.UDIMMap.merge(maps, bases)
+
+    lx.out("Selection Sets Creation: %s meshes, %s sec" %(len(timings), time.time() - t1))
+    lx.out("UDIMs in use: %s" %", ".join(str(UDIM) for UDIM in scene_map))
+
+    return timings, scene_map
@@ -0,0 +1,232 @@
+#python
+
+"""
+UV_texel
+Author: Bjoern Siegert aka nicelife
+
+Texel density and texture memory per UDIM.
+The mesh data comes from UV_mesh, the tile sizes from the file headers (MTK_images).
+
+UDIMDensity
+UV coverage, world area and texel ratio of each UDIM of a mesh.
+The texel density of a tile is resolution * ratio (pixels per world unit).
+
+analyze
+Combines the densities with the resolutions of the texture tiles: memory per
+entity and channel and a lower resolution for tiles which are sharper than needed.
+
+report
+Text lines for the event log with the memory against a budget.
+"""
+
+import numpy as np
+
+import UV_islands
+import UV_overlap
+
+
+def poly_world_areas(offsets, verts, positions):
+    """Return the world space area of each polygon (fan triangulation)"""
+    offsets = np.asarray(offsets)
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    tri_polys, corners = UV_overlap.triangulate(offsets)
+
+    points = positions[np.asarray(verts)[corners]]
+    cross = np.cross(points[:, 1] - points[:, 0], points[:, 2] - points[:, 0])
+    tri_areas = 0.5 * np.sqrt((cross ** 2).sum(axis=1))
+
+    return np.bincount(tri_polys, weights=tri_areas, minlength=len(offsets) - 1)
+
+
+class UDIMDensity(object):
+    """
+    UV and world area of each UDIM of one mesh.
+
+    keys_array: sorted UDIMs
+    uv_areas: uv area in the UDIM, 1.0 is the whole tile
+    world_areas: world area of the polys in the UDIM
+    """
+
+    def __init__(self, keys, uv_areas, world_areas):
+        self.keys_array = np.asarray(keys, dtype=np.int32)
+        self.uv_areas = np.asarray(uv_areas, dtype=np.float64)
+        self.world_areas = np.asarray(world_areas, dtype=np.float64)
+
+    @classmethod
+    def from_mesh(cls, uv_data, positions, udim_map):
+        """
+        uv_data: UV_mesh.PolyUVs
+        positions: point positions (points, 3)
+        udim_map: UV_udim.UDIMMap of uv_data
+        """
+        uv_areas = UV_islands.poly_areas(uv_data.offsets, uv_data.uvs)
+        world_areas = poly_world_areas(uv_data.offsets, uv_data.verts, positions)
+
+        # Sum the areas per UDIM in one go
+        udim_index = np.repeat(np.arange(len(udim_map)), np.diff(udim_map.offsets))
+        uv_sums = np.bincount(udim_index, weights=uv_areas[udim_map.polys], minlength=len(udim_map))
+        world_sums = np.bincount(udim_index, weights=world_areas[udim_map.polys], minlength=len(udim_map))
+
+        return cls(udim_map.keys_array, uv_sums, world_sums)
+
+    @classmethod
+    def merge(cls, densities):
+        """Sum the areas of several meshes per UDIM"""
+        if not densities:
+            return cls([], [], [])
+
+        keys = np.concatenate([density.keys_array for density in densities])
+        unique, index = np.unique(keys, return_inverse=True)
+        uv_areas = np.bincount(index, weights=np.concatenate([density.uv_areas for density in densities]))
+        world_areas = np.bincount(index, weights=np.concatenate([density.world_areas for density in densities]))
+
+        return cls(unique, uv_areas, world_areas)
+
+    def _lookup(self, udims):
+        """Return the index of each UDIM and if it was found"""
+        udims = np.asarray(udims, dtype=np.int32)
+        if not len(self.keys_array):
+            return np.zeros(len(udims), dtype=np.int64), np.zeros(len(udims), dtype=bool)
+
+        index = np.minimum(np.searchsorted(self.keys_array, udims), len(self.keys_array) - 1)
+        return index, self.keys_array[index] == udims
+
+    def ratios(self, udims):
+        """
+        Return the texel ratio of each UDIM: texels per world unit for a resolution of 1.
+        UDIMs without polys get 0.
+        """
+        index, found = self._lookup(udims)
+        world = self.world_areas[index[found]]
+
+        ratios = np.zeros(len(found))
+        ratios[found] = np.sqrt(self.uv_areas[index[found]] / np.where(world > 0, world, np.inf))
+        return ratios
+
+    def coverages(self, udims):
+        """Return the part of each UDIM covered by uvs, 0-1"""
+        index, found = self._lookup(udims)
+
+        coverages = np.zeros(len(found))
+        coverages[found] = np.minimum(self.uv_areas[index[found]], 1.0)
+        return coverages
+
+
+def tile_memory(widths, heights, channels=4, bits=8):
+    """Return the uncompressed memory of each tile in bytes"""
+    widths = np.asarray(widths, dtype=np.int64)
+    heights = np.asarray(heights, dtype=np.int64)
+    return widths * heights * np.asarray(channels, dtype=np.int64) * np.asarray(bits, dtype=np.int64) // 8
+
+
+def recommend(resolutions, densities, targets, minimum=256):
+    """
+    Return the smallest power of two resolution which still reaches the target density.
+    Never higher than the current resolution, never lower than minimum.
+    """
+    resolutions = np.asarray(resolutions, dtype=np.float64)
+    needed = resolutions * np.asarray(targets, dtype=np.float64) / np.where(densities > 0, densities, np.inf)
+    power = 2.0 ** np.ceil(np.log2(np.maximum(needed, minimum)))
+
+    return np.minimum(power, resolutions).astype(np.int64)
+
+
+def analyze(tiles, density, target_density=0.0):
+    """
+    Texture memory and texel density of a list of tiles.
+
+    tiles: [{'entity':..., 'channel':..., 'udim':1001, 'width':4096, 'height':4096,
+             'channels':4, 'bits':8},...]
+    density: UDIMDensity or {entity:UDIMDensity}. Entities which are not in
+             the dict use the entry None if there is one.
+    target_density: texels per world unit. 0 uses the median density of each
+                    entity and channel, so only tiles sharper than the rest are lowered.
+
+    Returns the tiles with density, coverage, memory, recommended resolution and
+    saved memory added and the memory per (entity, channel).
+    """
+    if not tiles:
+        return [], {}
+
+    widths = np.array([tile['width'] for tile in tiles], dtype=np.int64)
+    heights = np.array([tile['height'] for tile in tiles], dtype=np.int64)
+    udims = np.array([int(tile['udim']) for tile in tiles], dtype=np.int32)
+    channels = np.array([tile.get('channels', 4) for tile in tiles], dtype=np.int64)
+    bits = np.array([tile.get('bits', 8) for tile in tiles], dtype=np.int64)
+    groups = [(tile.get('entity'), tile.get('channel')) for tile in tiles]
+
+    # Texel ratio per tile, looked up per entity
+    ratios = np.zeros(len(tiles))
+    coverages = np.zeros(len(tiles))
+    if isinstance(density, dict):
+        entities = np.array([str(entity) for entity, channel in groups])
+        for entity in set(entity for entity, channel in groups):
+            entity_density = density.get(entity, density.get(None))
+            if entity_density is None:
+                continue
+            rows = np.flatnonzero(entities == str(entity))
+            ratios[rows] = entity_density.ratios(udims[rows])
+            coverages[rows] = entity_density.coverages(udims[rows])
+    else:
+        ratios = density.ratios(udims)
+        coverages = density.coverages(udims)
+
+    resolutions = np.maximum(widths, heights)
+    densities = resolutions * ratios
+    memory = tile_memory(widths, heights, channels, bits)
+
+    # Target density per tile
+    targets = np.zeros(len(tiles))
+    if target_density:
+        targets[:] = target_density
+    else:
+        group_index = np.unique(["%s|%s" % group for group in groups], return_inverse=True)[1]
+        for group in xrange(group_index.max() + 1):
+            rows = np.flatnonzero((group_index == group) & (densities > 0))
+            if len(rows):
+                targets[rows] = np.median(densities[rows])
+
+    recommended = np.where(densities > 0, recommend(resolutions, densities, targets), resolutions)
+    scale = recommended.astype(np.float64) / resolutions
+    saved = memory - tile_memory(np.round(widths * scale), np.round(heights * scale), channels, bits)
+
+    rows = []
+    for i, tile in enumerate(tiles):
+        row = dict(tile)
+        row.update({'density':float(densities[i]), 'coverage':float(coverages[i]),
+                    'memory':int(memory[i]), 'recommended':int(recommended[i]), 'saved':int(saved[i])})
+        rows.append(row)
+
+    totals = {}
+    for group, size in zip(groups, memory.tolist()):
+        totals[group] = totals.get(group, 0) + size
+
+    return rows, totals
+
+
+def report(rows, totals, budget):
+    """
+    Return the analysis as list of text lines for the event log.
+    budget: texture memory budget in bytes
+    """
+    mb = 1024.0 * 1024.0
+    lines = []
+    for (entity, channel), size in sorted(totals.items()):
+        lines.append("%s %s: %.1f MB" % (entity or "-", channel or "-", size / mb))
+
+    total = sum(totals.values())
+    saved = sum(row['saved'] for row in rows)
+    lines.append("Total: %.1f MB of %.1f MB budget (%.0f%%)" % (total / mb, budget / mb, 100.0 * total / max(budget, 1)))
+
+    for row in rows:
+        if row['recommended'] < max(row['width'], row['height']):
+            lines.append("%s %s %s: %sx%s, %.0f texels/unit, %.0f%% uv coverage -> %s" % (
+                row.get('entity') or "-", row.get('channel') or "-", row['udim'], row['width'], row['height'],
+                row['density'], 100.0 * row['coverage'], row['recommended']))
+
+    if saved:
+        lines.append("Recommended resolutions save %.1f MB (%.1f MB total)" % (saved / mb, (total - saved) / mb))
+    if total > budget:
+        lines.append("Over budget by %.1f MB" % ((total - budget) / mb))
+
+    return lines
@@ -6,159 +6,134 @@ Author: Bjoern Siegert aka nicelife
 
 Last edit: 2014-01-21
 
-UV_tools.py createselSets|fix_uvs
+UV_tools.py createselSets|fix_uvs|repack_udims|find_overlaps
 
 create_selSets
 Creates poly selection sets based on the UV offset values. Each sector containing polys will get a selection set.
 The name follows the UDIM scheme of MARI. E.g.: If u and v are between 0-1 the space 0-1 gets a selection set with the name $UDIM:1001,
 1-2: $UDIM:1002. If v = 1-2 -> $UDIM:1011, $UDIM:1012,...
+All sets are written in one mesh edit, no select commands are needed per polygon.
+The UDIM of each polygon is kept for the session. When the sets are created again
+only polygons whose uvs changed are updated. The work is done by UV_selSets.py.
 
 fix_uvs
 -Moves uv points slightly which lie directly on a U or V border (e.g. 0 or 1) so they fit in one UDIM.
--Selects polys which are in two or more UDIMs
+ The points are moved towards the center of their polygon. All points are written back in one mesh edit.
+ How close a point must be to count as on the border is set with the user value MARI_TOOLS_uv_epsilon.
+-Selects the uv islands which are in two or more UDIMs (selection set MTK_straddling) and
+ reports their bounding boxes. With MARI_TOOLS_shift_islands these islands are moved into
+ the UDIM which holds most of their area.
 
-Problems:
-- Slow with big models
+repack_udims
+Repacks the uv islands of all UDIMs. The islands are grouped by the UDIM which holds most
+of their area in one pass. The polys of each UDIM are written to a temporary selection set
+(MTK_pack:1001,...) in one mesh edit and then packed with one uv.pack per UDIM.
+The time spent in each UDIM is printed to the event log.
+
+find_overlaps
+Finds uv polygons which overlap other polygons of the same UDIM (see UV_overlap.py).
+The UDIMs come from the same numbering as the selection sets. The overlapping polys
+are selected (selection set MTK_overlapping) and their number per UDIM is printed.
+
+UDIM numbers and the grouping of the polys are computed with NumPy (see UV_udim.py).
 """
 
+import sys
 import time
 
+import numpy as np
+
+# Make the other kit scripts importable
+kit_scripts = lx.eval("query platformservice alias ? {kit_MARIToolKit:scripts}")
+if kit_scripts not in sys.path:
+    sys.path.append(kit_scripts)
+
+import MTK_commands
+import UV_islands
+import UV_mesh
+import UV_overlap
+import UV_selSets
+import UV_udim
+
 def repack_selected():
     '''repacks selected uvs in their udim'''
 
-    lx.eval('tool.set util.udim on')
-    lx.eval('udim.fit')
-    udim = lx.eval('tool.attr util.udim number ?')
-    lx.eval('uv.pack true true true auto 0.2 false false udim %s' % udim)
-    lx.eval('tool.set util.udim off')    
+    evaluate('tool.set util.udim on')
+    evaluate('udim.fit')
+    udim = evaluate('tool.attr util.udim number ?')
+    pack_udim(udim)
+    evaluate('tool.set util.udim off')    
 
 
-def selected_uvmap():
-    """
-    Return the index of the current selected uv map
-    """
-    # Get the name of selected uv map
-    selected_uv_map = lx.eval("vertMap.list type:txuv ?")
-    
-    # Get the index of the selected uv map
-    if selected_uv_map != "_____n_o_n_e_____":
-        # Select the vmap and store all the vmap names
-        layer.select("vmaps", "all")
-        vmap_list = layer.query("vmap.name")
-        
-        for vmap in xrange(len(vmap_list)):
-            layer.select("vmap.index", str(vmap))
-            
-            # Compare vmap name with the selected uv map. If it matches we have the index we need.
-            if layer.query("vmap.name") == selected_uv_map:
-                vmap_index = vmap
-                return vmap_index
-            
-    else:
-        lx.out("Hey mate, you didn't select a proper UV map. So all I did was printing this stupid message.")
-        # Warning dialog!
+def pack_udim(udim):
+    """Pack the selected polys into the given UDIM"""
+    evaluate('uv.pack true true true auto 0.2 false false udim %s' % udim)
 
 
-def check_selSets():
+def repack_udims(uvmap_name):
     """
-    Check if there are already some UDIM selection set in the scene.
-    If yes these will be deleted to give it a fresh start
+    Repack the islands of every occupied UDIM.
+    Returns a list with the time per UDIM: [(UDIM, seconds),...]
     """
-    
-    lx.eval("select.type polygon") # Type polygon because we want to look up poly selection sets
-    layer.select("polsets")
-    num_polySet = layer.query("polsets")
+    uv_data = mesh.read(uvmap_name)
+    islands = UV_islands.Islands(uv_data.offsets, uv_data.verts, uv_data.uvs)
+    tiles = islands.udim_map()
 
-    if num_polySet:
-        
-        # List to store the sets to delete
-        delete_sets = []
-        
-        for i in num_polySet:
-            # Select the poly set
-            layer.select("polset.index", str(i))
-            poly_set_name = layer.query("polset.name")
-            
-            # Find a UDIM selection set and delete it
-            if "$UDIM:" in poly_set_name:
-                delete_sets.append(poly_set_name)
-                
-            else:
-                pass
-        
-        # Delete Sets
-        layer.select("layer.index", str(layer_index))
-        lx.out(layer.query('layer.name'))
-        for sets in delete_sets:
-            lx.eval("select.deleteSet {%s}" %sets)
-            lx.out("Deleted Selection Set: ", sets)
+    # One temporary selection set per UDIM, all written in one mesh edit
+    pack_sets = {}
+    for UDIM, polys in tiles.iteritems():
+        pack_sets["%s%s" %(PACK_PREFIX, UDIM)] = polys
+    UV_mesh.MeshSource(edit=True).set_selSets(pack_sets, PACK_PREFIX)
+
+    progressbar.init(len(tiles))
+    evaluate("select.type polygon")
+
+    timings = []
+    for UDIM in tiles:
+        t1 = time.time()
+        evaluate("select.drop polygon")
+        evaluate("select.useSet %s%s select" %(PACK_PREFIX, UDIM))
+        pack_udim(UDIM)
+        timings.append((UDIM, time.time() - t1))
+        lx.out("UDIM %s: %s polys packed in %s sec" %(UDIM, len(tiles[UDIM]), timings[-1][1]))
+        progressbar.step(1)
+
+    # Clean up
+    evaluate("select.drop polygon")
+    UV_mesh.MeshSource(edit=True).set_selSets({}, PACK_PREFIX)
 
+    return timings
 
-def uv_list(poly_list):
+
+def selected_uvmap():
     """
-    Here we fill the uv_dict with the poly indices
-    We only need the first uv values of the polygon. This is 
-    enough to identify uv sector.
-    
-    Returns a dictionary. The key is the UDIM, the value is a nested list starting with
-    the poly index followed by its uv values
-    {UDIM:[poly_index,[(u,v),(u,v)]]}
+    Return the name of the current selected uv map
     """
-    # Select the current uv map
-    layer.select("vmap.index", str(selected_uvmap()))
-    
-    uv_dict = {} # dict to store our results
+    # Get the name of selected uv map
+    selected_uv_map = evaluate("vertMap.list type:txuv ?")
     
-    for poly in poly_list:
-        layer.select("poly.index", str(poly))
-        vmap_value = layer.query("poly.vmapValue")
-        
-        # For the UDIM we need to get the first u and v value.
-        # All other uvs of the poly must lie in the same uv space
-        # so we don't bother with the remaining ones.
-        # Since we are only interessted in full numbers we convert
-        # u and v to integer. int() always rounds down! E.g. '0.99' -> '0'
-        u = int(vmap_value[0])
-        v = int(vmap_value[1])
-        
-        # Here we fill the final dict with the UDIM key and poly index values
-        # If the key is not found in the dict it is created via the exception
-        # The result: # {UDIM:[poly_id,...]}
-        try:
-            uv_dict[1001 + (v * 10) + u ].append(poly)
+    # Check if the mesh really has the uv map
+    if selected_uv_map != "_____n_o_n_e_____" and selected_uv_map in mesh.uvmap_names():
+        return selected_uv_map
             
-        except KeyError:
-            uv_dict[1001 + (v * 10) + u ] = [poly]  
-        
-    return uv_dict
+    else:
+        lx.out("Hey mate, you didn't select a proper UV map. So all I did was printing this stupid message.")
+        # Warning dialog!
 
 
-def tuple_group(old_list):
-    """
-    Group a list into tuple pairs.
-    [1,2,3,4,5,6,7,8] -> [(1,2),(3,4),(5,6),(7,8)]
-    
-    Input: list
-    """
-    
-    new_list = []
-    
-    for index in xrange(0, len(old_list), 2):
-        value = old_list[index:index+2]
-        if len(value) == 2:
-            new_list.append(tuple(value))
-    
-    return new_list
+def evaluate(command):
+    """lx.eval through the command layer, which counts the commands and drops redundant selections"""
+    return commands.eval(command)
 
 
 def warning_msg(name):
     """A modal warning dialog. Message text can be set through name var."""
     try:
-        lx.eval("dialog.setup warning")
-        lx.eval("dialog.title {Error}")
-        lx.eval("dialog.msg {Ooopsy. %s.}" %name)
-        lx.eval("dialog.result ok")
-        lx.eval("dialog.open")
+        evaluate("dialog.setup warning")
+        evaluate("dialog.title {Error}")
+        evaluate("dialog.msg {Ooopsy. %s.}" %name)
+        evaluate("dialog.result ok")
+        evaluate("dialog.open")
         
     except RuntimeError:
         pass
@@ -166,7 +141,10 @@ def warning_msg(name):
 
 # LX SERVICE #
 layer = lx.Service("layerservice")
+mesh = UV_mesh.MeshSource() # Polygons and uvs of the main layer
 progressbar = lx.Monitor()
+commands = MTK_commands.CommandLayer(lx.eval) # Commands issued with evaluate()
+PACK_PREFIX = "MTK_pack:" # Temporary selection sets of repack_udims
 
 # ARGS #
 args = lx.args()[0] # Arguments. Only the first argument is passed.
@@ -174,6 +152,7 @@ args = lx.args()[0] # Arguments. Only the first argument is passed.
 # Select layer and get the index
 layer.select("layers", "main")
 layer_index = layer.query("layer.index")
+layer_id = layer.query("layer.id")
 
 # Lets start the magic #
 
@@ -183,136 +162,107 @@ layer_index = layer.query("layer.index")
 if args == "create_selSets":
     lx.out("create selection sets for UDIMs")
     
-    # timer start
-    t1 = time.time()
+    # The sets are created in-process (see UV_selSets.py)
+    UV_selSets.batch_create_selSets([layer_id], selected_uvmap())
+    lx.out(commands.report(args))
+    
 
-    # select polygons 
-    layer.select("polys", "all")
-    poly_list = layer.query("polys")
+# The uv tools below need the selected uv map
+elif args in ("fix_uvs", "repack_udims", "find_overlaps") and selected_uvmap() is None:
+    warning_msg("You didn't select a UV map. Please select one in the UV map list")
 
-    check_selSets() # Delete existing selection sets
-    uv_dict = uv_list(poly_list) # create the uv_dict    
-    
-    progressbar.init(len(uv_dict)) # Initialize the progress bar
-    
-    # Here we select the polys which were stored in the uv_dict
-    # and assign them to their UDIM selection set
-    #
-    # iteritems() is faster and gives access to key and
-    # value at the same time.
-    for UDIM,value in uv_dict.iteritems():
-        
-        # Clear selection
-        lx.eval("select.drop polygon")
-        
-        # Select poly form the uv_dict.
-        for poly_index in value:
-            lx.eval("select.element %s polygon add %s" %(layer_index, poly_index))
-            
-        # Create a new selection set with the UDIM as name: $UDIM:1011
-        lx.eval("select.editSet {$UDIM:%s} add" %UDIM)
-        
-        # Logging
-        lx.out("New selection set created: $UDIM:",UDIM)
-        
-        # Clear selection
-        lx.eval("select.drop polygon")
-        
-        # Progressbar step
-        progressbar.step(1)
-        
-    # timer stop
-    t2 = time.time()
-    sets_creation = t2 - t1
-    lx.out("Selection Sets Creation: %s sec" %sets_creation)
-    
 
 # FIX UVs #
 elif args == "fix_uvs":
 
-    #Check if all polys are in a UDIM sector.
-    #If a poly is overlapping select it and give warning!
+    #Check if all uv islands are in a UDIM sector.
+    #If an island is overlapping select it and give warning!
     
     # Logging
     lx.out("fixing uvs so all points are in one UDIM")
     
-    # Selecting
-    layer.select("polys", "all")
-    poly_list = layer.query("polys")
-    layer.select("vmap.index", str(selected_uvmap()))
+    # Read all polygons and their uvs at once
+    uvmap_name = selected_uvmap()
+    uv_data = mesh.read(uvmap_name)
     
     # Variables
-    bad_polys = []
     trans_value = 0.0001 # translation value for the uv points
+    epsilon = evaluate("user.value MARI_TOOLS_uv_epsilon ?") # uvs closer to a border count as on the border
+    shift_islands = evaluate("user.value MARI_TOOLS_shift_islands ?") # move straddling islands into one UDIM
+    
+    # Find the uv islands which spread over more than one UDIM
+    islands = UV_islands.Islands(uv_data.offsets, uv_data.verts, uv_data.uvs)
+    straddling = islands.straddling()
     
-    progressbar.init(len(poly_list)) # Initialize the progress bar
+    # Shift these islands into the UDIM which holds most of their area
+    if shift_islands == True and len(straddling):
+        corners, new_uvs = islands.shift_to_main_udim(straddling)
+        UV_mesh.MeshSource(edit=True).set_uvs(uvmap_name, uv_data, corners, new_uvs)
+        uv_data.uvs[corners] = new_uvs
+        lx.out("Moved %s islands into one UDIM" %len(straddling))
     
     # Lets fix some UVs
-    for poly_index in poly_list:
-        layer.select("poly.index", str(poly_index))
-        uv_pos = tuple_group(layer.query("poly.vmapValue"))
-        vert_list = layer.query("poly.vertList")
-        
-        lx.eval("select.type vertex")
-        
-        # View type to UV editor
-        lx.eval("tool.viewType uv")
-        
-        for uv in uv_pos:
-            
-            if uv[0] == round(uv[0]):
-                
-                # Check if u on the left or right side
-                if uv[0] != 0 and uv[0] / round(uv[0]) == 1:
-                    trans_value = -abs(trans_value)
-                else:
-                    trans_value = abs(trans_value) # always positiv
-                    
-                lx.out("move vert %s poly %s" %(vert_list[uv_pos.index(uv)], poly_index))
-                lx.eval("select.element %s vertex set %s 0 %s" %(layer_index, vert_list[uv_pos.index(uv)], poly_index))
-                lx.eval("tool.set TransformMove on")
-                lx.eval("tool.reset xfrm.transform")
-                lx.eval("tool.setAttr xfrm.transform U %s" %(trans_value))
-                lx.eval("tool.doApply")
-                lx.eval("tool.set TransformMove off")
-                
-            elif uv[1] == round(uv[1]):
-                
-                # Check if v on the left or right side
-                if uv[1] != 0 and uv[1] / round(uv[1]) == 1:
-                    trans_value = -abs(trans_value)
-                else:
-                    trans_value = abs(trans_value)
-                
-                lx.out("move vert %s poly %s" %(vert_list[uv_pos.index(uv)], poly_index))
-                lx.eval("select.element %s vertex set %s 0 %s" %(layer_index, vert_list[uv_pos.index(uv)], poly_index))
-                lx.eval("tool.set TransformMove on")
-                lx.eval("tool.reset xfrm.transform")
-                lx.eval("tool.setAttr xfrm.transform V %s" %(trans_value))
-                lx.eval("tool.doApply")
-                lx.eval("tool.set TransformMove off")
-        
-        # Clear selection
-        lx.eval("select.drop vertex")
-            
-        # Here we save all polys which are in two or more UDIMs
-        uv_pos = tuple_group(layer.query("poly.vmapValue"))
-        for uv in uv_pos:
-            if map(int, uv) != map(int, uv_pos[0]) and poly_index not in bad_polys:
-                bad_polys.append(poly_index)
-                
-        # Progressbar step
-        progressbar.step(1)
+    # All uvs on a border are found in one go and written back in one mesh edit
+    corners, new_uvs = UV_udim.snap_borders(uv_data.uvs, uv_data.corner_polys(), epsilon, trans_value)
+    if len(corners):
+        UV_mesh.MeshSource(edit=True).set_uvs(uvmap_name, uv_data, corners, new_uvs)
+        uv_data.uvs[corners] = new_uvs
+    lx.out("Moved %s uvs from a UDIM border" %len(corners))
     
-    # View type back to 3D view
-    lx.eval("tool.viewType xyz")
+    # Check again after moving the uvs
+    islands = UV_islands.Islands(uv_data.offsets, uv_data.verts, uv_data.uvs)
+    straddling = islands.straddling()
     
-    # Select the bad polygons and prompt a message for the user.
-    if bad_polys:
-        lx.eval("select.type polygon")
-        lx.eval("select.drop polygon")
-        for poly_index in bad_polys:
-            lx.eval("select.element %s polygon add %s" %(layer_index, poly_index))
+    # Select the polys of the bad islands and prompt a message for the user.
+    if len(straddling):
+        low, high = islands.bbox_udims()
+        island_polys = np.bincount(islands.labels)
+        for island in straddling:
+            lx.out("Island %s: %s polys, UDIM %s-%s, bbox u %.4f-%.4f v %.4f-%.4f" %(
+                island, island_polys[island], low[island], high[island],
+                islands.bbox[island, 0], islands.bbox[island, 2], islands.bbox[island, 1], islands.bbox[island, 3]))
+        
+        # The polys are stored in one selection set which is then selected
+        UV_mesh.MeshSource(edit=True).set_selSets({"MTK_straddling": islands.polys(straddling)}, "MTK_straddling")
+        evaluate("select.type polygon")
+        evaluate("select.drop polygon")
+        evaluate("select.useSet MTK_straddling select")
         
         # Warning dialog
-        warning_msg("I've found some UVs which spread over more than one UDIM.\nPlease have a look. I've selected them for you")
\ No newline at end of file
+        warning_msg("I've found %s UV islands which spread over more than one UDIM.\nPlease have a look. I've selected them for you" %len(straddling))
+    
+    lx.out(commands.report(args))
+
+
+# REPACK UDIMs #
+elif args == "repack_udims":
+    lx.out("repacking the uv islands of all UDIMs")
+
+    t1 = time.time()
+    timings = repack_udims(selected_uvmap())
+    lx.out("Repacked %s UDIMs in %s sec" %(len(timings), time.time() - t1))
+    lx.out(commands.report(args))
+
+
+# FIND OVERLAPS #
+elif args == "find_overlaps":
+    lx.out("looking for overlapping uvs in each UDIM")
+
+    t1 = time.time()
+    uv_data = mesh.read(selected_uvmap())
+    overlaps, tests = UV_overlap.find_overlaps(uv_data, UV_selSets.uv_list(uv_data))
+
+    for UDIM, polys in overlaps.iteritems():
+        lx.out("UDIM %s: %s overlapping polys" %(UDIM, len(polys)))
+    lx.out("%s exact overlap tests, %s sec" %(tests, time.time() - t1))
+
+    # Select the polys and prompt a message for the user
+    UV_mesh.MeshSource(edit=True).set_selSets({"MTK_overlapping": overlaps.polys}, "MTK_overlapping")
+    if len(overlaps):
+        evaluate("select.type polygon")
+        evaluate("select.drop polygon")
+        evaluate("select.useSet MTK_overlapping select")
+
+        warning_msg("I've found %s overlapping polygons in %s UDIMs.\nPlease have a look. I've selected them for you" %(len(overlaps.polys), len(overlaps)))
+
+    lx.out(commands.report(args))
@@ -0,0 +1,297 @@
+#python
+
+"""
+UV_udim
+Author: Bjoern Siegert aka nicelife
+
+UDIM helpers which work on flat NumPy arrays instead of layerservice queries.
+The arrays come from UV_mesh in MODO or from synthetic meshes in the tests and benchmarks.
+
+udim_numbers
+Converts u and v coordinates to their UDIM: 1001 + 10 * floor(v) + floor(u)
+
+UDIMMap
+Compact polygon to UDIM map: sorted UDIMs with offsets into one int32 poly array.
+
+bucket_polys
+Groups polygon indices by the UDIM of their first uv value.
+
+snap_borders
+Finds uvs lying on a U or V border and computes their nudged values.
+
+UDIMAssignment
+UDIM and uv fingerprint of each polygon, used to only update changed polygons.
+"""
+
+import numpy as np
+
+
+def udim_numbers(u, v):
+    """
+    Return the UDIM for each u, v pair as int32 array.
+    0-1 -> 1001, 1-2 -> 1002, v = 1-2 -> 1011, 1012,...
+    """
+    u = np.floor(np.asarray(u, dtype=np.float64)).astype(np.int32)
+    v = np.floor(np.asarray(v, dtype=np.float64)).astype(np.int32)
+
+    return 1001 + v * 10 + u
+
+
+class UDIMMap(object):
+    """
+    Compact polygon to UDIM map.
+    Sorted UDIM keys and offsets into one int32 array with the poly indices.
+    The polys of keys[i] are polys[offsets[i]:offsets[i+1]].
+
+    Behaves like the old {UDIM:[poly_index,...]} dict:
+    len(), iteration over the UDIMs, iteritems(), udim in udim_map, udim_map[udim]
+    """
+
+    MAGIC = 0x554B544D # "MTKU" file signature
+    VERSION = 1
+
+    def __init__(self, keys, offsets, polys):
+        self.keys_array = np.asarray(keys, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self.polys = np.asarray(polys, dtype=np.int32)
+        self._poly_udims = None
+
+        if len(self.offsets) != len(self.keys_array) + 1:
+            raise ValueError("UDIMMap needs one offset more than keys")
+
+    @classmethod
+    def from_udims(cls, poly_index, udims):
+        """Build the map from the poly indices and the UDIM of each poly"""
+        poly_index = np.asarray(poly_index, dtype=np.int32)
+        udims = np.asarray(udims, dtype=np.int32)
+
+        if len(poly_index) != len(udims):
+            raise ValueError("poly_index and uv arrays differ in length")
+
+        # A stable sort keeps the poly order inside of each UDIM
+        order = np.argsort(udims, kind="mergesort")
+        keys, starts = np.unique(udims[order], return_index=True)
+        offsets = np.append(starts, len(order))
+
+        return cls(keys, offsets, poly_index[order])
+
+    @classmethod
+    def merge(cls, maps, bases=None):
+        """
+        Merge the maps of several meshes into one.
+        bases are added to the poly indices of each map to keep them apart,
+        e.g. the number of polygons of all meshes before.
+        """
+        if bases is None:
+            bases = [0] * len(maps)
+
+        polys = [udim_map.polys + base for udim_map, base in zip(maps, bases)]
+        udims = [np.repeat(udim_map.keys_array, np.diff(udim_map.offsets)) for udim_map in maps]
+
+        if not polys:
+            return cls([], [0], [])
+
+        return cls.from_udims(np.concatenate(polys), np.concatenate(udims))
+
+    def __len__(self):
+        return len(self.keys_array)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, udim):
+        i = np.searchsorted(self.keys_array, udim)
+        return i < len(self.keys_array) and self.keys_array[i] == udim
+
+    def __getitem__(self, udim):
+        i = np.searchsorted(self.keys_array, udim)
+        if i >= len(self.keys_array) or self.keys_array[i] != udim:
+            raise KeyError(udim)
+
+        return self.polys[self.offsets[i]:self.offsets[i + 1]]
+
+    def keys(self):
+        """Return the UDIMs as list of ints"""
+        return self.keys_array.tolist()
+
+    def iteritems(self):
+        """Iterate over (UDIM, poly indices). The poly indices are views, nothing is copied."""
+        for i, key in enumerate(self.keys_array):
+            yield int(key), self.polys[self.offsets[i]:self.offsets[i + 1]]
+
+    def udim_of(self, poly):
+        """Return the UDIM of a poly or None if the poly is not in the map"""
+        if self._poly_udims is None:
+            # Dense poly -> UDIM lookup, built on first use. 0 marks polys which are not in the map.
+            size = int(self.polys.max()) + 1 if len(self.polys) else 0
+            self._poly_udims = np.zeros(size, dtype=np.int32)
+            self._poly_udims[self.polys] = np.repeat(self.keys_array, np.diff(self.offsets))
+
+        if poly < 0 or poly >= len(self._poly_udims) or not self._poly_udims[poly]:
+            return None
+
+        return int(self._poly_udims[poly])
+
+    def tobytes(self):
+        """Serialize the map: a header with signature, version and sizes followed by the three arrays"""
+        header = [self.MAGIC, self.VERSION, len(self.keys_array), len(self.polys)]
+        data = np.concatenate((header, self.keys_array, self.offsets, self.polys)).astype("<i4")
+        return data.tostring()
+
+    @classmethod
+    def fromarray(cls, data):
+        """Read the map from the int32 array of tobytes(). The arrays are views into data."""
+        if len(data) < 4 or data[0] != cls.MAGIC or data[1] != cls.VERSION:
+            raise ValueError("Not a UDIM map")
+
+        key_num, poly_num = int(data[2]), int(data[3])
+        if len(data) != 4 + key_num * 2 + 1 + poly_num:
+            raise ValueError("UDIM map is truncated")
+
+        keys = data[4:4 + key_num]
+        offsets = data[4 + key_num:5 + key_num * 2]
+        polys = data[5 + key_num * 2:]
+        return cls(keys, offsets, polys)
+
+    @classmethod
+    def frombytes(cls, data):
+        return cls.fromarray(np.frombuffer(data, dtype="<i4"))
+
+    def write(self, path):
+        """Write the map to a file"""
+        with open(path, "wb") as map_file:
+            map_file.write(self.tobytes())
+
+    @classmethod
+    def read(cls, path, mmap=False, offset=0):
+        """
+        Read a map from a file, starting offset bytes into it.
+        With mmap=True the file is memory-mapped instead of loaded.
+        """
+        if mmap:
+            return cls.fromarray(np.memmap(path, dtype="<i4", mode="r", offset=offset))
+
+        with open(path, "rb") as map_file:
+            map_file.seek(offset)
+            return cls.fromarray(np.fromfile(map_file, dtype="<i4"))
+
+
+def group_by_udim(poly_index, udims):
+    """
+    Group the polygon indices by their UDIM.
+    Returns a UDIMMap {UDIM:array([poly_index,...])}
+    """
+    return UDIMMap.from_udims(poly_index, udims)
+
+
+def bucket_polys(poly_index, u, v):
+    """
+    Group the polygon indices by UDIM in one pass.
+    u and v are the first uv values of each polygon, all three arrays have the same length.
+
+    Returns a UDIMMap. The key is the UDIM, the value is an int32 array with the poly indices
+    {UDIM:array([poly_index,...])}
+    """
+    return group_by_udim(poly_index, udim_numbers(u, v))
+
+
+def snap_borders(uvs, corner_polys, epsilon=0.000001, offset=0.0001):
+    """
+    Find all uvs which lie on a U or V border (e.g. 0 or 1) and move them slightly inwards,
+    so every polygon fits in one UDIM. A uv counts as on the border if it is closer than epsilon.
+    The uvs are moved by offset towards the center of their polygon.
+    
+    uvs: float array (corners, 2)
+    corner_polys: polygon index of each corner
+    
+    Returns the indices of the moved corners and their new uv values (corners, 2).
+    """
+    uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+    corner_polys = np.asarray(corner_polys)
+
+    # Center of each polygon in uv space
+    counts = np.bincount(corner_polys).astype(np.float64)
+    counts[counts == 0] = 1.0
+    centers = np.empty((len(counts), 2))
+    for axis in (0, 1):
+        centers[:, axis] = np.bincount(corner_polys, weights=uvs[:, axis], minlength=len(counts)) / counts
+
+    borders = np.round(uvs)
+    on_border = np.abs(uvs - borders) <= epsilon
+    corners = np.flatnonzero(on_border.any(axis=1))
+
+    # Move towards the polygon center. If the center is on the border as well
+    # uvs on 0 are moved right/up, uvs on all other borders left/down.
+    direction = np.sign(centers[corner_polys[corners]] - borders[corners])
+    fallback = np.where(borders[corners] == 0, 1.0, -1.0)
+    direction = np.where(direction == 0, fallback, direction)
+
+    new_uvs = uvs[corners].copy()
+    moved = on_border[corners]
+    new_uvs[moved] = (borders[corners] + direction * offset)[moved]
+
+    return corners, new_uvs
+
+
+def poly_fingerprints(offsets, uvs):
+    """
+    Cheap fingerprint of the uvs of each polygon. It changes if any uv of the polygon changes.
+    The bits of u and v are mixed and summed per polygon, overflows simply wrap around.
+    """
+    offsets = np.asarray(offsets)
+    if len(offsets) < 2:
+        return np.zeros(0, dtype=np.uint64)
+
+    bits = np.ascontiguousarray(uvs, dtype=np.float64).reshape(-1, 2).view(np.uint64)
+    mixed = (bits[:, 0] * np.uint64(0x9E3779B97F4A7C15)) ^ (bits[:, 1] * np.uint64(0xC2B2AE3D27D4EB4F))
+
+    return np.add.reduceat(mixed, offsets[:-1])
+
+
+class UDIMAssignment(object):
+    """
+    UDIM and uv fingerprint of each polygon of one mesh and uv map.
+    Kept between runs so only polygons whose uvs changed have to be updated.
+    """
+
+    def __init__(self, offsets, uvs):
+        uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+        first_uvs = uvs[np.asarray(offsets)[:-1]]
+
+        self.fingerprints = poly_fingerprints(offsets, uvs)
+        self.udims = udim_numbers(first_uvs[:, 0], first_uvs[:, 1])
+
+    def udim_map(self):
+        """Return the UDIMs of all polygons as UDIMMap"""
+        return UDIMMap.from_udims(np.arange(len(self.udims), dtype=np.int32), self.udims)
+
+    def set_names(self, prefix="$UDIM:"):
+        """Return the names of the selection sets of all occupied UDIMs"""
+        return set("%s%s" % (prefix, udim) for udim in np.unique(self.udims))
+
+    def update(self, offsets, uvs):
+        """
+        Compare the new uvs with the stored fingerprints and update the UDIMs of the changed polygons.
+        Raises ValueError if the number of polygons changed.
+
+        Returns the changed polygons and their old UDIMs.
+        """
+        uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+        fingerprints = poly_fingerprints(offsets, uvs)
+        if len(fingerprints) != len(self.fingerprints):
+            raise ValueError("Number of polygons changed")
+
+        changed = np.flatnonzero(fingerprints != self.fingerprints).astype(np.int32)
+        old_udims = self.udims[changed]
+
+        first_uvs = uvs[np.asarray(offsets)[changed]]
+        self.udims[changed] = udim_numbers(first_uvs[:, 0], first_uvs[:, 1])
+        self.fingerprints = fingerprints
+
+        return changed, old_udims
+
+
+# UDIM assignments of the meshes for the current MODO session.
+# The module stays loaded between script runs.
+# {(mesh_id, uvmap_name):UDIMAssignment}
+assignments = {}
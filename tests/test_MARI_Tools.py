@@ -0,0 +1,35 @@
+"""
+Checks of MARI_Tools.py which don't need MODO. The script itself only runs inside of MODO.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import ast
+import os
+import unittest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts", "MARI_Tools.py")
+
+# Modules which import NumPy
+NUMPY_MODULES = ("UV_cache", "UV_islands", "UV_mesh", "UV_overlap", "UV_selSets", "UV_texel", "UV_udim")
+
+
+class ImportTest(unittest.TestCase):
+
+    def test_no_numpy_module_at_load(self):
+        """All tools but the UV tools must run without NumPy"""
+        with open(SCRIPT) as script:
+            tree = ast.parse(script.read())
+
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                self.assertNotIn(name, NUMPY_MODULES + ("numpy",))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Tests of MTK_commands. MODO is a list which records the commands it gets.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import MTK_commands
+
+
+class CommandLayerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.commands = MTK_commands.CommandLayer(self.evaluate)
+
+    def evaluate(self, command):
+        self.sent.append(command)
+        if command.startswith("fail"):
+            raise RuntimeError(command)
+        return "value"
+
+    def run_all(self, *commands):
+        for command in commands:
+            self.commands.eval(command)
+
+    def test_split_command(self):
+        self.assertEqual(MTK_commands.split_command("select.item {Mesh 1} set"), ("select.item", ["Mesh 1", "set"]))
+        self.assertEqual(MTK_commands.split_command(""), ("", []))
+
+    def test_select_set(self):
+        self.run_all("select.item mesh1 set", "select.item mesh1 set", "select.item mesh2", "select.item mesh2 set")
+
+        self.assertEqual(self.sent, ["select.item mesh1 set", "select.item mesh2"])
+        self.assertEqual(self.commands.eliminated, 2)
+        self.assertEqual(self.commands.issued, 2)
+
+    def test_select_add_remove(self):
+        self.run_all("select.item mesh1 set", "select.item mesh2 add", "select.item mesh1 add",
+                     "select.item mesh1 remove", "select.item mesh1 remove", "select.item mesh2 set")
+
+        self.assertEqual(self.sent, ["select.item mesh1 set", "select.item mesh2 add", "select.item mesh1 remove"])
+        self.assertEqual(self.commands.selections["item"], ["mesh2"])
+
+    def test_add_to_unknown_selection(self):
+        # Without a known selection add and remove are always sent
+        self.run_all("select.item mesh1 add", "select.item mesh1 add", "select.item mesh1 remove")
+
+        self.assertEqual(len(self.sent), 3)
+        self.assertEqual(self.commands.selections.get("item"), None)
+
+    def test_other_mode_makes_selection_unknown(self):
+        self.run_all("select.item mesh1 set", "select.item mesh1 toggle", "select.item mesh1 set")
+
+        self.assertEqual(len(self.sent), 3)
+
+    def test_drop(self):
+        # The first drop after an unknown selection is sent, the second one not
+        self.run_all("select.drop item", "select.drop item", "select.drop polygon")
+
+        self.assertEqual(self.sent, ["select.drop item", "select.drop polygon"])
+
+    def test_select_type(self):
+        self.run_all("select.type polygon", "select.type polygon", "select.useSet {$UDIM:1001} select",
+                     "select.type polygon", "select.type item")
+
+        # select.useSet keeps the component type
+        self.assertEqual(self.sent, ["select.type polygon", "select.useSet {$UDIM:1001} select", "select.type item"])
+
+    def test_other_selection_command_forgets_selections(self):
+        self.run_all("select.item mesh1 set", "select.drop polygon", "select.useSet {$UDIM:1001} select",
+                     "select.item mesh1 set", "select.drop polygon")
+
+        self.assertEqual(len(self.sent), 5)
+
+    def test_keeping_command(self):
+        self.run_all("select.item mesh1 set", "item.tag string $MTK imageMap", "item.name Mesh mask",
+                     "select.item mesh1 set")
+
+        self.assertEqual(len(self.sent), 3)
+
+    def test_forget_after_other_command(self):
+        self.run_all("select.item mesh1 set", "select.type polygon", "shader.create mask",
+                     "select.item mesh1 set", "select.type polygon")
+
+        self.assertEqual(len(self.sent), 5)
+        self.assertEqual(self.commands.select_type, "polygon")
+
+    def test_query_is_sent(self):
+        self.assertEqual(self.commands.eval("user.value MARI_TOOLS_CHAN_diff ?"), "value")
+        self.assertEqual(self.commands.eval("select.item ?"), "value")
+        self.assertEqual(len(self.sent), 2)
+
+    def test_forget_after_exception(self):
+        self.run_all("select.item mesh1 set")
+
+        self.assertRaises(RuntimeError, self.commands.eval, "fail.item.tag")
+        self.assertEqual(self.commands.selections, {})
+        self.run_all("select.item mesh1 set")
+        self.assertEqual(len(self.sent), 3)
+
+    def test_selected(self):
+        self.commands.selected(["img1", "img2"])
+        self.run_all("select.item img2 add", "select.item img3 remove", "select.item img1 remove")
+
+        self.assertEqual(self.sent, ["select.item img1 remove"])
+        self.assertEqual(self.commands.selections["item"], ["img2"])
+
+    def test_evalN(self):
+        self.commands.selected([])
+        self.commands.selected([], "polygon")
+
+        self.assertEqual(self.commands.evalN("select.drop polygon"), [])
+        self.assertEqual(self.commands.evalN("query sceneservice selection ? mask"), "value")
+        self.assertEqual(self.commands.report("test"), "test: 1 commands issued, 1 eliminated")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Tests of MTK_effects.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import MTK_effects
+
+
+class EffectTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.values = {"MARI_TOOLS_CHAN_diff":"diffuse", "MARI_TOOLS_CHAN_spec":"spec",
+                       "MARI_TOOLS_CHAN_refl":"refl", "MARI_TOOLS_CHAN_bump":"bump",
+                       "MARI_TOOLS_CHAN_displ":"displ", "MARI_TOOLS_CHAN_normal":"normal"}
+
+    def test_table(self):
+        table = MTK_effects.effect_table(self.values.get)
+
+        self.assertEqual(table["diffuse"], "diffColor")
+        self.assertEqual(table["displ"], "displace")
+        self.assertEqual(len(table), 6)
+
+    def test_changed_user_value(self):
+        MTK_effects.effect_table(self.values.get)
+        self.values["MARI_TOOLS_CHAN_diff"] = "color"
+        table = MTK_effects.effect_table(self.values.get)
+
+        self.assertEqual(table["color"], "diffColor")
+        self.assertNotIn("diffuse", table)
+
+    def test_same_name_later_wins(self):
+        self.values["MARI_TOOLS_CHAN_bump"] = "height"
+        self.values["MARI_TOOLS_CHAN_displ"] = "height"
+
+        self.assertEqual(MTK_effects.effect_table(self.values.get)["height"], "displace")
+
+
+class GroupByEffectTest(unittest.TestCase):
+
+    def test_groups(self):
+        images = {"img1":{"$CHA":"diffuse"}, "img2":{"$CHA":"spec"}, "img3":{"$CHA":"diffuse"},
+                  "img4":{"$CHA":"dirt"}, "img5":{}}
+        groups = MTK_effects.group_by_effect(images, {"diffuse":"diffColor", "spec":"specAmount"})
+
+        self.assertEqual(sorted(groups), ["diffColor", "specAmount"])
+        self.assertEqual(sorted(groups["diffColor"]), ["img1", "img3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests of MTK_filename.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import MTK_filename
+
+
+class ParseTest(unittest.TestCase):
+
+    def test_parse(self):
+        tags = MTK_filename.parse("$ENTITY_$CHANNEL.$UDIM", "Mesh_diffuse.1002")
+
+        self.assertEqual(tags, {"$ENT":"Mesh", "$CHA":"diffuse", "$UDI":"1002"})
+
+    def test_long_delimiter(self):
+        tags = MTK_filename.parse("$ENTITY--$CHANNEL.$UDIM", "Mesh-a--diffuse.1001")
+
+        self.assertEqual(tags, {"$ENT":"Mesh-a", "$CHA":"diffuse", "$UDI":"1001"})
+
+    def test_udim_only(self):
+        self.assertEqual(MTK_filename.parse("$UDIM", "1003"), {"$UDI":"1003"})
+        self.assertEqual(MTK_filename.parse("_$UDIM", "Head_color_1012_v2"), {"$UDI":"1012"})
+        self.assertRaises(MTK_filename.FilenameError, MTK_filename.parse, "_$UDIM", "Head_color_10120")
+
+    def test_parse_batch(self):
+        tags, errors = MTK_filename.parse_batch("$ENTITY_$CHANNEL.$UDIM",
+                                                ["Mesh_diffuse.1001", "Mesh_spec.1002", "Mesh.1001"])
+
+        self.assertEqual(tags, {"Mesh_diffuse.1001":{"$ENT":"Mesh", "$CHA":"diffuse", "$UDI":"1001"},
+                                "Mesh_spec.1002":{"$ENT":"Mesh", "$CHA":"spec", "$UDI":"1002"}})
+        self.assertEqual(list(errors), ["Mesh.1001"])
+
+    def test_templates_are_cached(self):
+        template = MTK_filename.compile_template("$CHANNEL.$UDIM")
+
+        self.assertIs(MTK_filename.compile_template("$CHANNEL.$UDIM"), template)
+
+
+class ErrorTest(unittest.TestCase):
+
+    def test_template_without_variables(self):
+        self.assertRaises(MTK_filename.TemplateError, MTK_filename.compile_template, "texture")
+
+    def test_variables_without_delimiter(self):
+        self.assertRaises(MTK_filename.TemplateError, MTK_filename.compile_template, "$ENTITY$CHANNEL.$UDIM")
+
+    def test_wrong_udim(self):
+        with self.assertRaises(MTK_filename.FilenameError) as context:
+            MTK_filename.parse("$ENTITY_$CHANNEL.$UDIM", "Mesh_diffuse.10a2")
+
+        self.assertIn("expected a four digit UDIM at '10a2'", str(context.exception))
+
+    def test_missing_delimiter(self):
+        with self.assertRaises(MTK_filename.FilenameError) as context:
+            MTK_filename.parse("$ENTITY_$CHANNEL.$UDIM", "Mesh.1001")
+
+        self.assertIn("expected '_' at '.1001'", str(context.exception))
+
+    def test_unexpected_end(self):
+        with self.assertRaises(MTK_filename.FilenameError) as context:
+            MTK_filename.parse("$CHANNEL.$UDIM", "diffuse.1001.v2")
+
+        self.assertIn("unexpected '.v2' at the end", str(context.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+Tests of MTK_images. The headers are built with struct, the image data after them is left out.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import MTK_images
+
+
+def png(width, height, bits=8, color_type=6):
+    ihdr = struct.pack(">IIBBBBB", width, height, bits, color_type, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr + b"\0\0\0\0"
+
+
+def jpeg(width, height, channels=3):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0" + b"\0" * 9
+    sof0 = b"\xff\xc0" + struct.pack(">HBHHB", 17, 8, height, width, channels) + b"\0" * 9
+    return b"\xff\xd8" + app0 + b"\xff" + sof0
+
+
+def tiff(width, height, channels, bits, order="<"):
+    """TIFF with the bits per channel at an offset if there is more than one channel"""
+    entry_num = 4
+    ifd_end = 8 + 2 + entry_num * 12 + 4
+    if channels > 2:
+        bits_entry = struct.pack(order + "HHII", 258, 3, channels, ifd_end)
+    else:
+        bits_entry = struct.pack(order + "HHIHH", 258, 3, 1, bits, 0)
+
+    entries = (struct.pack(order + "HHIHH", 256, 3, 1, width, 0) +
+               struct.pack(order + "HHII", 257, 4, 1, height) +
+               bits_entry +
+               struct.pack(order + "HHIHH", 277, 3, 1, channels, 0))
+    header = (b"II" if order == "<" else b"MM") + struct.pack(order + "HI", 42, 8)
+    return header + struct.pack(order + "H", entry_num) + entries + b"\0\0\0\0" + \
+        struct.pack(order + "H" * channels, *([bits] * channels))
+
+
+def tga(width, height, depth=32, image_type=2):
+    return struct.pack("<BBBHHBHHHHBB", 0, 0, image_type, 0, 0, 0, 0, 0, width, height, depth, 8)
+
+
+def exr_attribute(name, attribute_type, value):
+    return name + b"\0" + attribute_type + b"\0" + struct.pack("<i", len(value)) + value
+
+
+def exr(width, height, pixel_types=(1, 1, 1, 1), padding=0):
+    """EXR header, padding adds a long comment in front of the data window"""
+    chlist = b"".join(name + b"\0" + struct.pack("<iB3xii", pixel_type, 0, 1, 1)
+                      for name, pixel_type in zip([b"A", b"B", b"G", b"R"], pixel_types)) + b"\0"
+    attributes = exr_attribute(b"channels", b"chlist", chlist)
+    if padding:
+        attributes += exr_attribute(b"comments", b"string", b"x" * padding)
+    attributes += exr_attribute(b"dataWindow", b"box2i", struct.pack("<iiii", 0, 0, width - 1, height - 1))
+    return b"\x76\x2f\x31\x01" + struct.pack("<I", 2) + attributes + b"\0"
+
+
+class ProbeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as image_file:
+            image_file.write(data)
+        return path
+
+    def probe(self, name, data):
+        return MTK_images.probe(self.write(name, data))
+
+    def test_png(self):
+        self.assertEqual(self.probe("a.png", png(4096, 2048, 16, 2)),
+                         MTK_images.info(4096, 2048, 3, 16, "png"))
+        # Palette images are 8 bit RGB
+        self.assertEqual(self.probe("b.png", png(8, 8, 4, 3)), MTK_images.info(8, 8, 3, 8, "png"))
+
+    def test_jpeg(self):
+        self.assertEqual(self.probe("a.jpg", jpeg(1024, 512)), MTK_images.info(1024, 512, 3, 8, "jpeg"))
+
+    def test_tiff_both_byte_orders(self):
+        for order in "<>":
+            self.assertEqual(self.probe("a.tif", tiff(4096, 4096, 4, 16, order)),
+                             MTK_images.info(4096, 4096, 4, 16, "tiff"))
+            self.assertEqual(self.probe("b.tif", tiff(8, 8, 1, 8, order)), MTK_images.info(8, 8, 1, 8, "tiff"))
+
+    def test_tga(self):
+        self.assertEqual(self.probe("a.tga", tga(2048, 2048)), MTK_images.info(2048, 2048, 4, 8, "tga"))
+        self.assertEqual(self.probe("b.tga", tga(8, 8, 8, 3)), MTK_images.info(8, 8, 1, 8, "tga"))
+        # Without the extension the header isn't recognized
+        self.assertEqual(self.probe("c.img", tga(8, 8)), None)
+
+    def test_exr(self):
+        self.assertEqual(self.probe("a.exr", exr(4096, 4096)), MTK_images.info(4096, 4096, 4, 16, "exr"))
+        self.assertEqual(self.probe("b.exr", exr(16, 8, (2, 2, 2, 1))), MTK_images.info(16, 8, 4, 32, "exr"))
+
+    def test_exr_header_larger_than_head(self):
+        data = exr(1024, 1024, padding=MTK_images.HEAD * 2)
+
+        self.assertEqual(self.probe("a.exr", data), MTK_images.info(1024, 1024, 4, 16, "exr"))
+
+    def test_truncated_exr(self):
+        data = exr(1024, 1024)
+
+        self.assertEqual(self.probe("a.exr", data[:len(data) - 10]), None)
+        self.assertEqual(self.probe("b.exr", exr(1024, 1024, padding=MTK_images.HEAD * 2)[:MTK_images.HEAD + 100]),
+                         None)
+
+    def test_broken_files(self):
+        self.assertEqual(self.probe("a.png", png(8, 8)[:14]), None)
+        self.assertEqual(self.probe("a.jpg", jpeg(8, 8)[:10]), None)
+        self.assertEqual(self.probe("a.tif", tiff(8, 8, 1, 8)[:20]), None)
+        self.assertEqual(self.probe("a.bmp", b"BM" + b"\0" * 50), None)
+        self.assertEqual(MTK_images.probe(os.path.join(self.directory, "missing.png")), None)
+
+    def test_probe_files(self):
+        paths = [self.write("Mesh_diffuse.%s.png" % udim, png(8 * (udim - 1000), 8)) for udim in range(1001, 1011)]
+        paths.append(os.path.join(self.directory, "missing.png"))
+        rows, seconds = MTK_images.probe_files(paths, lambda path: {"$UDI":path[-8:-4]}, workers=4)
+
+        self.assertEqual([row['path'] for row in rows], paths)
+        self.assertEqual([row['width'] for row in rows[:3]], [8, 16, 24])
+        self.assertEqual(rows[2]['tags'], {"$UDI":"1003"})
+        self.assertTrue(rows[-1]['error'])
+        self.assertEqual(rows[-1]['width'], None)
+
+    def test_probe_file_filename_error(self):
+        def parse(path):
+            raise ValueError("no UDIM")
+        row = MTK_images.probe_file(self.write("a.png", png(8, 8)), parse)
+
+        self.assertEqual(row['width'], 8)
+        self.assertEqual(row['error'], "Filename: no UDIM")
+
+
+class PlaceholderTest(unittest.TestCase):
+
+    def test_filter_placeholders(self):
+        rows = [{'path':"a", 'width':8, 'height':8}, {'path':"b", 'width':8, 'height':16},
+                {'path':"c", 'width':None, 'height':None}, {'path':"d", 'width':4096, 'height':4096}]
+        files, placeholders, unknown = MTK_images.filter_placeholders(rows)
+
+        self.assertEqual([row['path'] for row in files], ["b", "c", "d"])
+        self.assertEqual([row['path'] for row in placeholders], ["a"])
+        self.assertEqual([row['path'] for row in unknown], ["c"])
+
+    def test_placeholder_size(self):
+        rows = [{'path':"a", 'width':8, 'height':8}, {'path':"b", 'width':16, 'height':16}]
+
+        self.assertEqual([row['path'] for row in MTK_images.filter_placeholders(rows, 16)[1]], ["b"])
+        self.assertFalse(MTK_images.is_placeholder(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tests of MTK_planner.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import MTK_planner
+from MTK_scene import FolderRegistry
+
+
+def row(entity, channel, udim):
+    path = "/textures/%s_%s.%s.tif" % (entity, channel, udim)
+    return {'path':path, 'tags':{'$ENTITY':entity, '$CHANNEL':channel, '$UDIM':str(udim)}}
+
+
+class PlanImportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = [row("Head", "diffuse", 1001), row("Head", "diffuse", 1002),
+                     row("Head", "spec", 1001), row("Body", "diffuse", 1001)]
+        self.registry = FolderRegistry()
+        # Folder of an earlier import, tagged as imageMap with a UDIM
+        self.registry.add("folder1", {'$ENT':"Head", '$CHA':"diffuse", '$UDI':"1001", '$MTK':"imageMap"})
+
+    def test_clips(self):
+        plan = MTK_planner.plan_import(self.rows)
+
+        self.assertEqual([path for path, tags in plan.clips], [r['path'] for r in self.rows])
+        self.assertEqual(plan.clips[0][1], {'$ENT':"Head", '$CHA':"diffuse", '$UDI':"1001", '$MTK':"imageMap"})
+        self.assertEqual(plan.clip_parents[3], (self.rows[3]['path'], (('$CHA', "diffuse"), ('$ENT', "Body"))))
+
+    def test_new_folders(self):
+        plan = MTK_planner.plan_import(self.rows)
+
+        self.assertEqual([name for key, name, tags in plan.new_folders], ["Head_diffuse", "Head_spec", "Body_diffuse"])
+        self.assertEqual(plan.new_folders[0][2], {'$ENT':"Head", '$CHA':"diffuse", '$MTK':"imageFolder"})
+        self.assertEqual([key for key, tags in plan.image_maps], [key for key, name, tags in plan.new_folders])
+        self.assertEqual(plan.masks, [])
+        self.assertEqual(plan.map_parents, [])
+
+    def test_reuse_existing_folders(self):
+        plan = MTK_planner.plan_import(self.rows, self.registry)
+
+        self.assertEqual(plan.folders, {(('$CHA', "diffuse"), ('$ENT', "Head")):"folder1"})
+        self.assertEqual([name for key, name, tags in plan.new_folders], ["Head_spec", "Body_diffuse"])
+        self.assertEqual(len(plan.image_maps), 2)
+
+    def test_registry_is_copied(self):
+        plan = MTK_planner.plan_import(self.rows, self.registry)
+        plan.registry.add("folder2", {'$ENT':"Body", '$CHA':"diffuse"})
+
+        self.assertEqual(len(self.registry), 1)
+
+    def test_folder_names(self):
+        rows = [{'path':"a.1001.tif", 'tags':{'$UDIM':"1001"}}, {'path':"b.1001.tif", 'tags':{'$CHANNEL':"bump"}}]
+        plan = MTK_planner.plan_import(rows)
+
+        self.assertEqual([name for key, name, tags in plan.new_folders], [MTK_planner.DEFAULT_FOLDER, "bump"])
+
+    def test_masks(self):
+        plan = MTK_planner.plan_import(self.rows, self.registry, entity_masks={"Head":"mask1"})
+
+        # Head has a mask, only the one of Body is created
+        self.assertEqual(plan.masks, ["Body"])
+        self.assertEqual(plan.map_parents, [((('$CHA', "spec"), ('$ENT', "Head")), "Head"),
+                                            ((('$CHA', "diffuse"), ('$ENT', "Body")), "Body")])
+
+    def test_masks_only_for_new_image_maps(self):
+        plan = MTK_planner.plan_import(self.rows[:2], self.registry, entity_masks={})
+
+        self.assertEqual(plan.masks, [])
+        self.assertEqual(plan.map_parents, [])
+
+    def test_without(self):
+        plan = MTK_planner.plan_import(self.rows, self.registry, entity_masks={})
+        smaller = plan.without([self.rows[3]['path'], self.rows[0]['path']])
+
+        self.assertEqual([path for path, tags in smaller.clips], [self.rows[1]['path'], self.rows[2]['path']])
+        self.assertEqual([name for key, name, tags in smaller.new_folders], ["Head_spec"])
+        self.assertEqual(len(smaller.folders), 1)
+        self.assertEqual(smaller.masks, ["Head"])
+        self.assertEqual(len(plan.clips), 4)
+
+    def test_summary(self):
+        summary = MTK_planner.plan_import(self.rows, self.registry, entity_masks={}).summary()
+
+        self.assertEqual(summary, {'clips':4, 'reused folders':1, 'new folders':2, 'clip moves':4,
+                                   'image maps':2, 'masks':2, 'image map moves':2})
+
+
+if __name__ == "__main__":
+    unittest.main()
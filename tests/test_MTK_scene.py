@@ -0,0 +1,239 @@
+"""
+Tests of MTK_scene. The indices are filled with synthetic items and tags.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import MTK_scene
+
+
+def udim_mask(udim, entity=None):
+    tags = {'$MTK':'UDIM_mask', '$UDI':udim}
+    if entity is not None:
+        tags['$ENT'] = entity
+    return tags
+
+
+class SceneService(object):
+    """
+    Mock of the sceneservice over a list of items [(item.id, item type, {tagType:tag}, parent.id)].
+    Items without tags raise RuntimeError on the tag queries like in MODO.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.current = None
+
+    def select(self, attribute, value):
+        if attribute == 'item.id':
+            self.current = self.items[int(value)]
+        elif attribute == 'item':
+            self.current = [item for item in self.items if item[0] == value][0]
+
+    def query(self, attribute):
+        if attribute == 'item.N':
+            return len(self.items)
+        return {'item.id':self.current[0], 'item.type':self.current[1], 'item.parent':self.current[3]}[attribute]
+
+    def queryN(self, attribute):
+        tags = self.current[2]
+        if not tags:
+            raise RuntimeError("No tags")
+        return {'item.tagTypes':tags.keys(), 'item.tags':tags.values()}[attribute]
+
+
+class LayerService(object):
+    """Mock of the layerservice textures [(texture.id, locator.id, clip file or None)]"""
+
+    def __init__(self, textures):
+        self.textures = textures
+        self.current = None
+
+    def select(self, attribute, value):
+        if attribute == 'texture.id':
+            self.current = self.textures[int(value)]
+
+    def query(self, attribute):
+        if attribute == 'texture.N':
+            return len(self.textures)
+        if attribute == 'texture.clipFile' and self.current[2] is None:
+            raise RuntimeError("No image")
+        return {'texture.id':self.current[0], 'texture.locator':self.current[1],
+                'texture.clipFile':self.current[2]}[attribute]
+
+
+class SceneIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = MTK_scene.SceneIndex.scan(SceneService([
+            ('mesh1', 'mesh', {}, None),
+            ('img1', 'imageMap', {'$MTK':'imageMap', '$ENT':'Head', '$CHA':'diffuse', '$UDI':'1001'}, 'mask1'),
+            ('img2', 'imageMap', {'$MTK':'imageMap', '$ENT':'Head', '$CHA':'spec', '$UDI':'1001'}, 'mask1'),
+            ('img3', 'imageMap', {}, None),
+            ('mask1', 'mask', {'$MTK':'ENTITY_mask', '$ENT':'Head'}, None),
+            ('mask2', 'mask', {'$MTK':'UDIM_mask', '$ENT':'Head', '$UDI':'1001'}, 'mask1'),
+            ('mask3', 'mask', {'$ENT':'Body'}, None),
+            ('folder1', 'imageFolder', {'$MTK':'imageMap', '$ENT':'Head', '$CHA':'diffuse', '$UDI':'1001'}, None)]))
+
+    def test_types(self):
+        self.assertEqual(self.index.types['imageMap'], ['img1', 'img2', 'img3'])
+        self.assertEqual(self.index.types['mask'], ['mask1', 'mask2', 'mask3'])
+
+    def test_only_toolkit_tags(self):
+        self.assertEqual(sorted(self.index.items()), ['folder1', 'img1', 'img2', 'mask1', 'mask2'])
+        self.assertEqual(sorted(self.index.items('mask')), ['mask1', 'mask2'])
+        self.assertEqual(self.index.items(selection='img1'), {'img1':self.index.tags['img1']})
+        self.assertEqual(self.index.items(selection=['img3', 'mask3']), {})
+
+    def test_inverted(self):
+        self.assertEqual(self.index.inverted[('$UDI', '1001')], set(['img1', 'img2', 'mask2', 'folder1']))
+        self.assertEqual(self.index.lookup(('$MTK', 'imageMap'), ('$CHA', 'diffuse')), set(['img1', 'folder1']))
+        self.assertEqual(self.index.lookup(('$MTK', 'UDIM_mask'), ('$UDI', '1002')), set())
+        self.assertEqual(self.index.lookup(), set())
+
+    def test_masks_and_folders(self):
+        self.assertEqual(self.index.masks.entity('Head'), 'mask1')
+        self.assertEqual(self.index.masks.udim('Head', '1001'), 'mask2')
+        self.assertEqual(self.index.folders.find({'$ENT':'Head', '$CHA':'diffuse', '$UDI':'1002'}), 'folder1')
+
+    def test_add_after_creation(self):
+        # The way index_item of MARI_Tools adds an item after shader.create / clip.newFolder
+        self.index.add('mask4', 'mask', {'$MTK':'UDIM_mask', '$ENT':'Head', '$UDI':'1002'})
+        self.index.add('folder2', 'imageFolder', {'$MTK':'imageFolder', '$ENT':'Head', '$CHA':'spec'})
+
+        self.assertEqual(self.index.types['mask'][-1], 'mask4')
+        self.assertEqual(self.index.lookup(('$MTK', 'UDIM_mask'), ('$UDI', '1002')), set(['mask4']))
+        self.assertEqual(self.index.masks.udim('Head', '1002'), 'mask4')
+        self.assertEqual(self.index.folders.find({'$ENT':'Head', '$CHA':'spec'}), 'folder2')
+
+    def test_set_tags(self):
+        self.index.set_tags('img1', {'$UDI':'1002'})
+
+        self.assertEqual(self.index.tags['img1']['$UDI'], '1002')
+        self.assertEqual(self.index.lookup(('$UDI', '1001'), ('$CHA', 'diffuse')), set(['folder1']))
+        self.assertEqual(self.index.lookup(('$UDI', '1002')), set(['img1']))
+
+    def test_tags_without_mtk_are_not_stored(self):
+        self.index.set_tags('img3', {'$ENT':'Head'})
+        self.index.add('img3', 'imageMap', {'$CHA':'bump'})
+
+        self.assertNotIn('img3', self.index.tags)
+        self.assertEqual(self.index.types['imageMap'].count('img3'), 1)
+        self.index.set_tags('img3', {'$MTK':'imageMap'})
+        self.assertEqual(self.index.tags['img3'], {'$MTK':'imageMap'})
+
+
+class FolderRegistryTest(unittest.TestCase):
+
+    def test_key_without_udim_and_type(self):
+        key = MTK_scene.FolderRegistry.key({'$MTK':'imageMap', '$ENTITY':'Head', '$CHA':'diffuse', '$UDI':'1001'})
+
+        self.assertEqual(key, (('$CHA', 'diffuse'), ('$ENT', 'Head')))
+        self.assertEqual(MTK_scene.FolderRegistry.key({'$MTK':'imageFolder', '$CHA':'diffuse', '$ENT':'Head'}), key)
+
+    def test_first_folder_is_kept(self):
+        registry = MTK_scene.FolderRegistry()
+        registry.add('folder1', {'$ENT':'Head', '$CHA':'diffuse'})
+        registry.add('folder2', {'$ENT':'Head', '$CHA':'diffuse'})
+
+        self.assertEqual(registry.find({'$ENT':'Head', '$CHA':'diffuse', '$UDI':'1001'}), 'folder1')
+        self.assertEqual(len(registry), 1)
+
+    def test_retag(self):
+        registry = MTK_scene.FolderRegistry()
+        registry.add('folder1', {'$ENT':'Head'})
+        registry.add('folder1', {'$ENT':'Body'})
+
+        self.assertEqual(registry.find({'$ENT':'Head'}), None)
+        self.assertEqual(registry.find({'$ENT':'Body'}), 'folder1')
+
+    def test_copy(self):
+        registry = MTK_scene.FolderRegistry()
+        registry.add('folder1', {'$ENT':'Head'})
+        copy = registry.copy()
+        copy.add('folder2', {'$ENT':'Body'})
+
+        self.assertEqual(len(registry), 1)
+        self.assertIn((('$ENT', 'Body'),), copy)
+
+
+class TextureTableTest(unittest.TestCase):
+
+    def test_scan(self):
+        sceneservice = SceneService([('tex1', 'imageMap', {}, 'mask1'), ('tex2', 'constant', {}, 'mat1')])
+        layerservice = LayerService([('tex1', 'loc1', '/textures/Head_diffuse.1001.tif'), ('tex2', 'loc2', None)])
+        table = MTK_scene.TextureTable.scan(layerservice, sceneservice)
+
+        self.assertEqual(table.locator('tex1'), 'loc1')
+        self.assertEqual(table.clip_file('tex1'), '/textures/Head_diffuse.1001.tif')
+        self.assertEqual(table.clip_file('tex2'), None)
+        self.assertEqual(table.parent('tex2'), 'mat1')
+        self.assertEqual(table.numbers, {'tex1':0, 'tex2':1})
+        self.assertEqual(table.locator('tex3'), None)
+        self.assertNotIn('tex3', table)
+
+
+class ShadeGraphIndexTest(unittest.TestCase):
+
+    def test_scan(self):
+        index = MTK_scene.ShadeGraphIndex.scan([
+            ('img1', 'clip1', 'videoStill'), ('img1', 'loc1', 'txtrLocator'),
+            ('img2', 'clip1', 'videoStill'), ('img3', 'folder1', 'imageFolder'), ('img3', 'mat1', 'advancedMaterial')])
+
+        self.assertEqual(index.image_maps('clip1'), ['img1', 'img2'])
+        self.assertEqual(index.image_maps('folder1'), ['img3'])
+        self.assertEqual(index.image_maps('clip2'), [])
+        self.assertEqual(index.clip('img3'), 'folder1')
+        self.assertEqual(index.locator('img1'), 'loc1')
+        self.assertEqual(index.locator('img2'), None)
+
+
+class MaskJoinTest(unittest.TestCase):
+
+    def setUp(self):
+        self.masks = MTK_scene.MaskIndex.from_items({
+            'entity1':{'$MTK':'ENTITY_mask', '$ENT':'Head'},
+            'head1001':udim_mask('1001', 'Head'), 'head1002':udim_mask('1002', 'Head'),
+            'body1001':udim_mask('1001', 'Body'), 'free1001':udim_mask('1001'),
+            'body1003':udim_mask('1003', 'Body'), 'other':{'$MTK':'imageFolder', '$UDI':'1001'}})
+
+    def test_entity_and_udim(self):
+        images = {'img1':{'$ENT':'Head', '$UDI':'1001'}, 'img2':{'$ENT':'Head', '$UDI':'1002'},
+                  'img3':{'$ENT':'Body', '$UDI':'1001'}, 'img4':{'$ENT':'Head', '$UDI':'1001', '$CHA':'spec'}}
+        targets = self.masks.udim_targets(images)
+
+        self.assertEqual(sorted(targets), ['body1001', 'head1001', 'head1002'])
+        self.assertEqual(sorted(targets['head1001']), ['img1', 'img4'])
+
+    def test_udim_only_fallback(self):
+        targets = self.masks.udim_targets({'img1':{'$UDI':'1001'}, 'img2':{'$UDI':'1003'}})
+
+        # The mask without entity first, else the first mask of the udim
+        self.assertEqual(targets, {'free1001':['img1'], 'body1003':['img2']})
+
+    def test_unmatched_images_are_left_alone(self):
+        images = {'img1':{'$ENT':'Head', '$UDI':'1003'}, 'img2':{'$ENT':'Arm', '$UDI':'1001'},
+                  'img3':{'$UDI':'1099'}, 'img4':{}}
+
+        self.assertEqual(self.masks.udim_targets(images), {})
+
+    def test_entity_targets(self):
+        images = {'img1':{'$ENT':'Head', '$UDI':'1001'}, 'img2':{'$ENT':'Body'}, 'img3':{'$UDI':'1001'}}
+
+        self.assertEqual(self.masks.entity_targets(images), {'entity1':['img1']})
+
+    def test_lookups(self):
+        self.assertEqual(self.masks.entity('Head'), 'entity1')
+        self.assertEqual(self.masks.udim('Body', '1003'), 'body1003')
+        self.assertEqual(self.masks.udim(None, '1002'), None)
+        self.assertEqual(sorted(self.masks.udim_masks('1001')), ['body1001', 'free1001', 'head1001'])
+        self.assertEqual(sorted(self.masks.entity_udims('Head')), ['1001', '1002'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests of MTK_sort.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import MTK_sort
+
+
+def replay(current, moves):
+    """Apply the moves to the child order like texture.parent does"""
+    order = list(current)
+    for item, index in moves:
+        order.remove(item)
+        order.insert(index, item)
+
+    return order
+
+
+def lis_length(sequence):
+    """Length of the longest strictly increasing subsequence, the slow way"""
+    lengths = []
+    for i, value in enumerate(sequence):
+        lengths.append(1 + max([lengths[j] for j in range(i) if sequence[j] < value] or [0]))
+
+    return max(lengths or [0])
+
+
+class NaturalKeyTest(unittest.TestCase):
+
+    def test_numbers_by_value(self):
+        names = ["Mesh_diffuse.1010", "Mesh_diffuse.1002", "Mesh_diffuse.1001"]
+
+        self.assertEqual(sorted(names, key=MTK_sort.natural_key),
+                         ["Mesh_diffuse.1001", "Mesh_diffuse.1002", "Mesh_diffuse.1010"])
+
+    def test_case_insensitive(self):
+        names = ["Mesh.1002", "Mesh.1010", "mesh.1002"]
+
+        self.assertEqual(sorted(names, key=MTK_sort.natural_key), ["Mesh.1002", "mesh.1002", "Mesh.1010"])
+        self.assertEqual(sorted(["b", "A", "a", "B"], key=MTK_sort.natural_key), ["A", "a", "B", "b"])
+
+    def test_versions(self):
+        names = ["tex_v10", "tex_v2", "tex_v02", "tex"]
+
+        self.assertEqual(sorted(names, key=MTK_sort.natural_key), ["tex", "tex_v02", "tex_v2", "tex_v10"])
+
+
+class MovesTest(unittest.TestCase):
+
+    def test_target_order(self):
+        children = ["a", "x3", "b", "x1", "x2"]
+        target = MTK_sort.target_order(children, ["x1", "x2", "x3"], MTK_sort.natural_key)
+
+        # The items take the places of the items, highest first
+        self.assertEqual(target, ["a", "x3", "b", "x2", "x1"])
+
+    def test_longest_increasing(self):
+        sequence = [3, 1, 4, 1, 5, 9, 2, 6]
+        indices = MTK_sort.longest_increasing(sequence)
+
+        self.assertEqual(len(indices), lis_length(sequence))
+        values = [sequence[i] for i in indices]
+        self.assertEqual(values, sorted(set(values)))
+        self.assertEqual(indices, sorted(indices))
+        self.assertEqual(MTK_sort.longest_increasing([]), [])
+
+    def test_no_moves_if_sorted(self):
+        self.assertEqual(MTK_sort.minimal_moves(["a", "b", "c"], ["a", "b", "c"]), [])
+
+    def test_random_permutations(self):
+        generator = random.Random(7)
+        for size in range(1, 30):
+            for run in range(20):
+                target = ["item%s" % i for i in range(size)]
+                current = list(target)
+                generator.shuffle(current)
+                moves = MTK_sort.minimal_moves(current, target)
+
+                self.assertEqual(replay(current, moves), target)
+                position = dict((item, index) for index, item in enumerate(target))
+                self.assertEqual(len(moves), size - lis_length([position[item] for item in current]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Tests of UV_islands on synthetic quads.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import numpy as np
+
+import UV_islands
+import UV_mesh
+
+
+def strip(u, v, count, size=0.1, first_point=0):
+    """A strip of count quads along u which share their edges. Returns polygons and uvs."""
+    polygons = []
+    uvs = []
+    for i in range(count):
+        low = first_point + i * 2
+        polygons.append([low, low + 2, low + 3, low + 1])
+        uvs.append([(u + i * size, v), (u + (i + 1) * size, v), (u + (i + 1) * size, v + size), (u + i * size, v + size)])
+
+    return polygons, uvs
+
+
+def islands(*strips):
+    polygons = []
+    uvs = []
+    point = 0
+    for u, v, count in strips:
+        strip_polys, strip_uvs = strip(u, v, count, first_point=point)
+        polygons += strip_polys
+        uvs += strip_uvs
+        point += count * 2 + 2
+
+    poly_uvs = UV_mesh.pack(polygons, uvs)
+    return UV_islands.Islands(poly_uvs.offsets, poly_uvs.verts, poly_uvs.uvs)
+
+
+class UnionFindTest(unittest.TestCase):
+
+    def test_components(self):
+        labels = UV_islands.union_find(6, np.array([0, 4, 2]), np.array([1, 5, 1]))
+
+        self.assertEqual(labels.tolist(), [0, 0, 0, 1, 2, 2])
+
+    def test_no_links(self):
+        empty = np.zeros(0, dtype=np.int64)
+
+        self.assertEqual(UV_islands.union_find(3, empty, empty).tolist(), [0, 1, 2])
+
+
+class IslandsTest(unittest.TestCase):
+
+    def test_labels(self):
+        found = islands((0.1, 0.1, 3), (0.5, 0.5, 2))
+
+        self.assertEqual(found.count, 2)
+        self.assertEqual(found.labels.tolist(), [0, 0, 0, 1, 1])
+        self.assertTrue(np.allclose(found.bbox[0], [0.1, 0.1, 0.4, 0.2]))
+
+    def test_split_uvs_are_separate_islands(self):
+        # Same points, but the second quad has its own uvs: a uv seam
+        poly_uvs = UV_mesh.pack([[0, 1, 2, 3], [1, 4, 5, 2]],
+                                [[(0, 0), (0.1, 0), (0.1, 0.1), (0, 0.1)],
+                                 [(0.5, 0), (0.6, 0), (0.6, 0.1), (0.5, 0.1)]])
+        found = UV_islands.Islands(poly_uvs.offsets, poly_uvs.verts, poly_uvs.uvs)
+
+        self.assertEqual(found.count, 2)
+
+    def test_straddling(self):
+        # The second island crosses from 1001 into 1002, the third ends exactly on the border
+        found = islands((0.1, 0.1, 2), (0.8, 0.5, 3), (0.8, 0.8, 2))
+
+        self.assertEqual(found.straddling().tolist(), [1])
+
+    def test_main_udims(self):
+        found = islands((0.8, 0.5, 3), (1.7, 0.5, 5))
+
+        self.assertEqual(found.main_udims().tolist(), [1001, 1002])
+        self.assertEqual(found.udim_map()[1002].tolist(), [3, 4, 5, 6, 7])
+
+    def test_main_udims_below_zero(self):
+        # Islands far below v = 0 have UDIMs below 1
+        found = islands((0.5, -101.5, 3), (2.5, -0.5, 2))
+        main = found.main_udims()
+
+        self.assertEqual(main.tolist(), [1001 - 1020, 1003 - 10])
+
+    def test_shift_to_main_udim(self):
+        found = islands((0.1, 0.1, 2), (0.8, 0.5, 3))
+        corners, new_uvs = found.shift_to_main_udim([1])
+
+        # Only the corners of the second island move, by the part outside of 1001
+        self.assertEqual(corners.tolist(), list(range(8, 20)))
+        self.assertTrue(np.allclose(new_uvs - found.uvs[corners], [-0.1, 0.0]))
+        self.assertTrue((new_uvs[:, 0] <= 1.0).all())
+
+    def test_shift_below_zero(self):
+        found = islands((2.75, -3.5, 3))
+        corners, new_uvs = found.shift_to_main_udim([0])
+
+        self.assertTrue(np.allclose(new_uvs - found.uvs[corners], [-0.05, 0.0]))
+        self.assertEqual(found.bbox_udims()[0].tolist(), [1001 - 40 + 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
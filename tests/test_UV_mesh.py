@@ -0,0 +1,247 @@
+"""
+Tests of UV_mesh. MeshSource is run on a mock of the lx mesh accessors.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import UV_mesh
+
+
+class Symbols(object):
+    i_PTAG_PICK = "PICK"
+    i_VMAP_TEXTUREUV = "TXUV"
+    f_MESHEDIT_POL_TAGS = 1
+
+
+class Polygon(object):
+    """
+    Polygon accessor of the mock mesh. The PICK tag of each polygon is kept in tags.
+    Point IDs are the point index + 100, so IDs and indices can't be mixed up.
+    """
+
+    def __init__(self, tags, polygons, uvmaps):
+        self.tags = tags
+        self.polygons = polygons
+        self.uvmaps = uvmaps
+        self.index = None
+
+    def SelectByIndex(self, index):
+        self.index = index
+
+    def GetTag(self, tag_type):
+        return self.tags.get(self.index)
+
+    def SetTag(self, tag_type, value):
+        self.tags[self.index] = value
+
+    def VertexCount(self):
+        return len(self.polygons[self.index])
+
+    def VertexByIndex(self, vertex):
+        return self.polygons[self.index][vertex] + 100
+
+    def MapEvaluate(self, map_id, point_id, value):
+        uvs = self.uvmaps[map_id][self.index]
+        point = self.polygons[self.index].index(point_id - 100)
+        if uvs[point] is None:
+            return False
+        value.set(uvs[point])
+        return True
+
+
+class Point(object):
+    def __init__(self):
+        self.point_id = None
+        self.selects = 0
+
+    def Select(self, point_id):
+        self.point_id = point_id
+        self.selects += 1
+
+    def Index(self):
+        return self.point_id - 100
+
+
+class MeshMap(object):
+    def __init__(self, uvmaps):
+        self.uvmaps = uvmaps
+        self.name = None
+
+    def SelectByName(self, map_type, name):
+        if name not in self.uvmaps:
+            raise LookupError(name)
+        self.name = name
+
+    def ID(self):
+        return self.name
+
+
+class Storage(object):
+    def setType(self, value_type):
+        pass
+
+    def setSize(self, size):
+        pass
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class Mesh(object):
+    def __init__(self, poly_num, tags=None, polygons=None, uvmaps=None):
+        self.poly_num = poly_num
+        self.polygon = Polygon(tags or {}, polygons, uvmaps)
+        self.point = Point()
+        self.meshmap = MeshMap(uvmaps or {})
+
+    def PolygonCount(self):
+        return self.poly_num
+
+    def PolygonAccessor(self):
+        return self.polygon
+
+    def PointAccessor(self):
+        return self.point
+
+    def MeshMapAccessor(self):
+        return self.meshmap
+
+
+class Scan(object):
+    def __init__(self):
+        self.applied = 0
+
+    def SetMeshChange(self, index, change):
+        pass
+
+    def Apply(self):
+        self.applied += 1
+
+
+class LX(object):
+    symbol = Symbols
+
+    class object(object):
+        Polygon = Point = MeshMap = staticmethod(lambda accessor: accessor)
+        storage = Storage
+
+
+def mock_source(poly_num, tags=None, polygons=None, uvmaps=None):
+    """MeshSource on a mock mesh"""
+    source = UV_mesh.MeshSource.__new__(UV_mesh.MeshSource)
+    source.lx = LX
+    source.mesh = Mesh(poly_num, tags, polygons, uvmaps)
+    source.scan = Scan()
+    return source
+
+
+def set_members(tags, name):
+    return sorted(poly for poly, tag in tags.items() if tag and name in tag.split(";"))
+
+
+class SetSelSetsTest(unittest.TestCase):
+
+    def test_all_sets_are_written(self):
+        source = mock_source(6)
+        sets = {"$UDIM:1001":[0, 1, 2], "$UDIM:1002":[3, 4, 5]}
+
+        edited = source.set_selSets(sets, "$UDIM:")
+
+        tags = source.mesh.polygon.tags
+        self.assertEqual(edited, 6)
+        self.assertEqual(set_members(tags, "$UDIM:1001"), [0, 1, 2])
+        self.assertEqual(set_members(tags, "$UDIM:1002"), [3, 4, 5])
+        self.assertEqual(source.scan.applied, 1)
+
+    def test_only_given_polys_are_edited(self):
+        tags = {0:"$UDIM:1001", 1:"$UDIM:1001", 2:"$UDIM:1001", 3:"$UDIM:1002"}
+        source = mock_source(4, tags)
+        sets = {"$UDIM:1002":[1], "$UDIM:1003":[2]}
+
+        edited = source.set_selSets(sets, "$UDIM:", polys=[1, 2])
+
+        self.assertEqual(edited, 2)
+        self.assertEqual(set_members(tags, "$UDIM:1001"), [0])
+        self.assertEqual(set_members(tags, "$UDIM:1002"), [1, 3])
+        self.assertEqual(set_members(tags, "$UDIM:1003"), [2])
+
+    def test_other_sets_are_kept(self):
+        tags = {0:"Head;$UDIM:1002", 1:"$UDIM:1001"}
+        source = mock_source(2, tags)
+
+        source.set_selSets({"$UDIM:1001":[0], "$UDIM:1011":[1]}, "$UDIM:")
+
+        self.assertEqual(tags[0], "Head;$UDIM:1001")
+        self.assertEqual(tags[1], "$UDIM:1011")
+
+
+class ReadTest(unittest.TestCase):
+
+    def setUp(self):
+        polygons = [[0, 1, 2, 3], [1, 4, 2]]
+        uvs = [[(0.1, 0.1), (0.9, 0.1), (0.9, 0.9), (0.1, 0.9)], [(1.5, 0.5), None, (1.7, 0.9)]]
+        self.source = mock_source(2, polygons=polygons, uvmaps={"Texture":uvs})
+
+    def test_read(self):
+        poly_uvs = self.source.read("Texture")
+
+        self.assertEqual(poly_uvs.offsets.tolist(), [0, 4, 7])
+        self.assertEqual(poly_uvs.verts.tolist(), [0, 1, 2, 3, 1, 4, 2])
+        # Unmapped points get 0,0
+        self.assertEqual(poly_uvs.poly_uvs(1), [(1.5, 0.5), (0.0, 0.0), (1.7, 0.9)])
+
+    def test_read_without_verts(self):
+        poly_uvs = self.source.read("Texture", verts=False)
+
+        self.assertEqual(len(poly_uvs.verts), 0)
+        self.assertEqual(poly_uvs.first_uvs().tolist(), [[0.1, 0.1], [1.5, 0.5]])
+        self.assertEqual(self.source.mesh.point.selects, 0)
+
+    def test_missing_uvmap(self):
+        self.assertRaises(LookupError, self.source.read, "UVs")
+
+
+class PackTest(unittest.TestCase):
+
+    def test_offsets_and_first_uvs(self):
+        polygons = [[0, 1, 2, 3], [1, 4, 5]]
+        uvs = [[(0.1, 0.1), (0.9, 0.1), (0.9, 0.9), (0.1, 0.9)], [(1.5, 0.5), (1.9, 0.5), (1.7, 0.9)]]
+
+        poly_uvs = UV_mesh.ArraySource(polygons, {"Texture":uvs}).read("Texture")
+
+        self.assertEqual(poly_uvs.poly_count, 2)
+        self.assertEqual(poly_uvs.vertex_counts().tolist(), [4, 3])
+        self.assertEqual(poly_uvs.first_uvs().tolist(), [[0.1, 0.1], [1.5, 0.5]])
+        self.assertEqual(poly_uvs.poly_verts(1), [1, 4, 5])
+
+    def test_read_without_verts(self):
+        source = UV_mesh.ArraySource([[0, 1, 2]], {"Texture":[[(0.5, 0.5), (0.6, 0.5), (0.6, 0.6)]]})
+
+        poly_uvs = source.read("Texture", verts=False)
+
+        self.assertEqual(len(poly_uvs.verts), 0)
+        self.assertEqual(poly_uvs.offsets.tolist(), [0, 3])
+        self.assertEqual(len(poly_uvs.uvs), 3)
+
+    def test_array_source(self):
+        source = UV_mesh.ArraySource([[0, 1, 2]], {"B":[[(0, 0), (1, 0), (0, 1)]], "A":[[(0, 0), (1, 0), (0, 1)]]},
+                                     sel_sets={"$UDIM:1001":[0], "Head":[0]})
+
+        self.assertEqual(source.uvmap_names(), ["A", "B"])
+        self.assertEqual(source.selSet_names("$UDIM:"), set(["$UDIM:1001"]))
+        self.assertRaises(LookupError, source.read, "C")
+
+    def test_uvs_must_match_corners(self):
+        self.assertRaises(ValueError, UV_mesh.pack, [[0, 1, 2]], [[(0, 0), (1, 0)]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Tests of UV_overlap.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import UV_mesh
+import UV_overlap
+import UV_udim
+
+
+def square(u, v, size):
+    return [(u, v), (u + size, v), (u + size, v + size), (u, v + size)]
+
+
+def overlaps(squares):
+    """Overlapping polys of quads given as (u, v, size)"""
+    return polygon_overlaps([square(*values) for values in squares])
+
+
+def polygon_overlaps(uvs):
+    """Overlapping polys of polygons given as a list of corner uvs each"""
+    starts = [sum(len(corners) for corners in uvs[:i]) for i in range(len(uvs))]
+    polygons = [range(start, start + len(corners)) for start, corners in zip(starts, uvs)]
+    uv_data = UV_mesh.pack(polygons, uvs)
+
+    first_uvs = uv_data.first_uvs()
+    udim_map = UV_udim.bucket_polys(uv_data.poly_index(), first_uvs[:, 0], first_uvs[:, 1])
+    return UV_overlap.find_overlaps(uv_data, udim_map)[0]
+
+
+class FindOverlapsTest(unittest.TestCase):
+
+    def test_small_squares(self):
+        """Shells smaller than a grid cell are found"""
+        found = overlaps([(0.5, 0.5, 0.001), (0.5005, 0.5005, 0.001)])
+        self.assertEqual(found[1001].tolist(), [0, 1])
+
+    def test_small_square_in_large_one(self):
+        found = overlaps([(0.1, 0.1, 0.8), (0.4, 0.4, 0.0001), (1.2, 0.2, 0.1)])
+        self.assertEqual(found.keys(), [1001])
+        self.assertEqual(found[1001].tolist(), [0, 1])
+
+    def test_shared_edges_dont_overlap(self):
+        squares = [(0.1 * (i % 10), 0.1 * (i // 10), 0.1) for i in range(100)]
+        self.assertEqual(len(overlaps(squares)), 0)
+
+    def test_separate_udims(self):
+        """The same uvs in another UDIM don't overlap"""
+        found = overlaps([(0.2, 0.2, 0.3), (1.2, 0.2, 0.3), (1.3, 0.3, 0.3)])
+        self.assertEqual(found.keys(), [1002])
+        self.assertEqual(found[1002].tolist(), [1, 2])
+
+    def test_square_in_the_notch_of_a_concave_quad(self):
+        """The bounding box of a concave quad overlaps, the quad doesn't"""
+        dart = [(0.1, 0.1), (0.9, 0.1), (0.3, 0.3), (0.1, 0.9)]
+        self.assertEqual(len(polygon_overlaps([dart, square(0.35, 0.35, 0.2)])), 0)
+        self.assertEqual(polygon_overlaps([dart, square(0.2, 0.2, 0.2)])[1001].tolist(), [0, 1])
+
+    def test_triangle_and_ngon(self):
+        triangle = [(0.1, 0.1), (0.6, 0.1), (0.1, 0.6)]
+        hexagon = [(0.4, 0.2), (0.6, 0.2), (0.7, 0.4), (0.6, 0.6), (0.4, 0.6), (0.3, 0.4)]
+        self.assertEqual(polygon_overlaps([triangle, hexagon])[1001].tolist(), [0, 1])
+        self.assertEqual(len(polygon_overlaps([triangle, [(u + 0.2, v) for u, v in hexagon]])), 0)
+
+
+class PiecesTest(unittest.TestCase):
+
+    def test_convex_polygons_stay_whole(self):
+        """Triangles and convex quads are one piece, a triangle repeats its last corner"""
+        uvs = UV_overlap.np.array([(0, 0), (1, 0), (0, 1), (0, 0), (1, 0), (1, 1), (0, 1)], dtype=float)
+        polys, corners = UV_overlap.convex_pieces([0, 3, 7], uvs)
+        self.assertEqual(polys.tolist(), [0, 1])
+        self.assertEqual(corners.tolist(), [[0, 1, 2, 2], [3, 4, 5, 6]])
+
+    def test_concave_quads_and_ngons_are_split(self):
+        dart = [(0.1, 0.1), (0.9, 0.1), (0.3, 0.3), (0.1, 0.9)]
+        bowtie = [(0, 0), (1, 1), (1, 0), (0, 1)]
+        pentagon = [(0, 0), (1, 0), (1, 1), (0.5, 1.5), (0, 1)]
+        uvs = UV_overlap.np.array(dart + bowtie + pentagon, dtype=float)
+        polys, corners = UV_overlap.convex_pieces([0, 4, 8, 13], uvs)
+        self.assertEqual(polys.tolist(), [0, 0, 1, 1, 2, 2, 2])
+        self.assertEqual(corners[:, 3].tolist(), corners[:, 2].tolist())
+
+    def test_repeated_corner_doesnt_separate(self):
+        """A triangle padded with a repeated corner overlaps like the triangle"""
+        triangle = UV_overlap.np.array([[(0.0, 0.0), (1.0, 0.0), (0.0, 1.0), (0.0, 1.0)]])
+        inside = UV_overlap.np.array([[(0.1, 0.1), (0.3, 0.1), (0.3, 0.3), (0.1, 0.3)]])
+        outside = inside + 0.6
+        self.assertTrue(UV_overlap.pieces_overlap(triangle, inside)[0])
+        self.assertFalse(UV_overlap.pieces_overlap(triangle, outside)[0])
+
+
+class GridTest(unittest.TestCase):
+
+    def test_small_triangles_are_binned(self):
+        """Triangles much smaller than a cell still get a grid entry"""
+        tri_uvs = UV_overlap.np.array([[(0.5, 0.5), (0.5001, 0.5), (0.5, 0.5001)],
+                                       [(0.25, 0.25), (0.25001, 0.25), (0.25, 0.25001)]])
+        cells, tris = UV_overlap.rasterize(UV_overlap.piece_bounds(tri_uvs), 16)
+        self.assertEqual(tris.tolist(), [0, 1])
+        self.assertEqual(cells.tolist(), [8 * 16 + 8, 4 * 16 + 4])
+
+    def test_large_triangles_go_to_coarse_levels(self):
+        small = [[(0.5, 0.5), (0.5001, 0.5), (0.5, 0.5001)]] * 1000
+        large = [[(0.0, 0.0), (1.0, 0.0), (0.0, 1.0)]]
+        sizes, levels = UV_overlap.grid_levels(UV_overlap.piece_bounds(UV_overlap.np.array(small + large)))
+        self.assertEqual(levels[:-1].max(), 0)
+        self.assertLessEqual(sizes[levels[-1]], 2)
+
+    def test_pairs_are_found_once(self):
+        small = [[(0.5, 0.5), (0.5001, 0.5), (0.5, 0.5001)]] * 3
+        large = [[(0.0, 0.0), (1.0, 0.0), (0.0, 1.0)]]
+        tris_a, tris_b = UV_overlap.candidates(UV_overlap.piece_bounds(UV_overlap.np.array(small + large)))
+        pairs = sorted(tuple(sorted(pair)) for pair in zip(tris_a.tolist(), tris_b.tolist()))
+        self.assertEqual(pairs, [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
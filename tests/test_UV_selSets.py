@@ -0,0 +1,116 @@
+"""
+Tests of UV_selSets. The meshes are ArraySource stand-ins, lx is a mock.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+if "lx" not in sys.modules:
+    sys.modules["lx"] = types.ModuleType("lx")
+    sys.modules["lx"].out = lambda *args: None
+
+import UV_mesh
+import UV_selSets
+import UV_udim
+
+
+def quads(udims):
+    """Polygons and uvs of one small quad in the corner of each given UDIM"""
+    polygons = []
+    uvs = []
+    for index, udim in enumerate(udims):
+        u = (udim - 1001) % 10 + 0.1
+        v = (udim - 1001) // 10 + 0.1
+        polygons.append([index * 4, index * 4 + 1, index * 4 + 2, index * 4 + 3])
+        uvs.append([(u, v), (u + 0.1, v), (u + 0.1, v + 0.1), (u, v + 0.1)])
+
+    return polygons, uvs
+
+
+class SelSetsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        polygons, uvs = quads([1001, 1001, 1001, 1002])
+        self.mesh = UV_mesh.ArraySource(polygons, {"Texture":uvs})
+        self.mesh_source = UV_mesh.MeshSource
+        UV_mesh.MeshSource = lambda mesh_id, edit=False: self.mesh
+        self.cache_dir = UV_selSets.cache_dir
+        UV_selSets.cache_dir = lambda: self.directory
+        UV_udim.assignments.clear()
+
+    def tearDown(self):
+        UV_mesh.MeshSource = self.mesh_source
+        UV_selSets.cache_dir = self.cache_dir
+        UV_udim.assignments.clear()
+        shutil.rmtree(self.directory)
+
+    def move(self, poly, du):
+        self.mesh.uvmaps["Texture"][poly] = [(u + du, v) for u, v in self.mesh.uvmaps["Texture"][poly]]
+
+    def create(self):
+        return UV_selSets.create_selSets("mesh1", "Texture", self.directory)
+
+    def stale(self):
+        return UV_selSets.stale_meshes(["mesh1"], "Texture")
+
+    def test_create(self):
+        udim_map, edited = self.create()
+
+        self.assertEqual(edited, 4)
+        self.assertEqual(self.mesh.sel_sets, {"$UDIM:1001":[0, 1, 2], "$UDIM:1002":[3]})
+        self.assertEqual(self.create()[1], 0)
+
+    def test_move_between_existing_udims(self):
+        self.create()
+        self.move(2, 1.0)
+
+        self.assertEqual(self.stale(), ["mesh1"])
+        # A new session: the incremental update isn't available
+        UV_udim.assignments.clear()
+        udim_map, edited = self.create()
+
+        self.assertEqual(edited, 1)
+        self.assertEqual(self.mesh.sel_sets, {"$UDIM:1001":[0, 1], "$UDIM:1002":[2, 3]})
+        self.assertEqual(self.stale(), [])
+
+    def test_incremental_update(self):
+        self.create()
+        self.move(0, 1.0)
+        udim_map, edited = self.create()
+
+        self.assertEqual(edited, 1)
+        self.assertEqual(sorted(self.mesh.sel_sets["$UDIM:1002"]), [0, 3])
+        self.assertEqual(udim_map[1001].tolist(), [1, 2])
+
+    def test_move_inside_udim(self):
+        self.create()
+        self.move(1, 0.5)
+
+        self.assertEqual(self.stale(), [])
+        UV_udim.assignments.clear()
+        self.assertEqual(self.create()[1], 0)
+
+    def test_sets_without_cache_are_stale(self):
+        self.mesh.sel_sets = {"$UDIM:1001":[0, 1, 2, 3]}
+
+        self.assertEqual(self.stale(), ["mesh1"])
+
+    def test_read_only_lookups_keep_the_cache(self):
+        self.create()
+        self.move(2, 1.0)
+        UV_selSets.cached_map("mesh1", "Texture", self.mesh.read("Texture"), self.directory)
+        UV_selSets.udim_map("mesh1", "Texture", self.directory)
+
+        self.assertEqual(self.stale(), ["mesh1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
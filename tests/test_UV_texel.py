@@ -0,0 +1,49 @@
+"""
+Tests of UV_texel.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import UV_texel
+
+MB = 1024 * 1024
+
+
+def tile(udim, size, channels=4, bits=8, entity="Mesh", channel="diffuse"):
+    return {'entity':entity, 'channel':channel, 'udim':udim, 'width':size, 'height':size,
+            'channels':channels, 'bits':bits}
+
+
+class AnalyzeTest(unittest.TestCase):
+
+    def setUp(self):
+        # 1001 is fully covered, 1002 holds a sliver of uv area for a small part of the mesh
+        self.density = UV_texel.UDIMDensity([1001, 1002], [1.0, 0.01], [1.0, 0.0001])
+
+    def test_memory_follows_channels_and_bits(self):
+        tiles = [tile(1001, 4096), tile(1001, 4096, 3, 16, channel="spec"), tile(1001, 4096, 4, 32, channel="disp")]
+        rows, totals = UV_texel.analyze(tiles, self.density)
+
+        self.assertEqual([row['memory'] // MB for row in rows], [64, 96, 256])
+        self.assertEqual(totals[("Mesh", "disp")], 256 * MB)
+
+    def test_oversampled_tile_gets_lower_resolution(self):
+        rows, totals = UV_texel.analyze([tile(1001, 4096), tile(1002, 4096)], self.density, target_density=4096)
+
+        self.assertEqual(rows[0]['recommended'], 4096)
+        self.assertEqual(rows[1]['recommended'], 512)
+        self.assertEqual(rows[1]['saved'], (4096 * 4096 - 512 * 512) * 4)
+
+    def test_report_over_budget(self):
+        rows, totals = UV_texel.analyze([tile(1001, 4096, 4, 16)], self.density)
+        lines = UV_texel.report(rows, totals, 64 * MB)
+        self.assertEqual(lines[-1], "Over budget by 64.0 MB")
+
+
+if __name__ == "__main__":
+    unittest.main()
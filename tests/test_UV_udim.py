@@ -0,0 +1,198 @@
+"""
+Tests of UV_udim on synthetic arrays.
+Run from the kit folder: python -m unittest discover tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import numpy as np
+
+import UV_udim
+
+
+def as_dict(udim_map):
+    return dict((udim, polys.tolist()) for udim, polys in udim_map.iteritems())
+
+
+class UDIMNumbersTest(unittest.TestCase):
+
+    def test_tiles(self):
+        u = [0.5, 1.5, 9.5, 0.5, 3.2]
+        v = [0.5, 0.5, 0.5, 1.5, 2.7]
+        self.assertEqual(UV_udim.udim_numbers(u, v).tolist(), [1001, 1002, 1010, 1011, 1024])
+
+    def test_borders_belong_to_the_next_tile(self):
+        self.assertEqual(UV_udim.udim_numbers([1.0, 0.0], [0.0, 1.0]).tolist(), [1002, 1011])
+
+    def test_negative_coordinates(self):
+        """Negative uvs are floored, not truncated towards 0"""
+        self.assertEqual(UV_udim.udim_numbers([-0.5, 0.5, -0.5], [0.5, -0.5, -0.5]).tolist(), [1000, 991, 990])
+
+
+class BucketPolysTest(unittest.TestCase):
+
+    def test_groups_keep_the_poly_order(self):
+        udim_map = UV_udim.bucket_polys([7, 3, 5, 1], [1.5, 0.5, 1.2, 0.1], [0.5, 0.5, 0.5, 0.9])
+        self.assertEqual(udim_map.keys(), [1001, 1002])
+        self.assertEqual(as_dict(udim_map), {1001: [3, 1], 1002: [7, 5]})
+
+    def test_negative_coordinates(self):
+        udim_map = UV_udim.bucket_polys([0, 1, 2], [-0.5, 0.5, -1.5], [0.5, 0.5, -0.5])
+        self.assertEqual(as_dict(udim_map), {989: [2], 1000: [0], 1001: [1]})
+
+    def test_lengths_must_match(self):
+        self.assertRaises(ValueError, UV_udim.bucket_polys, [0, 1], [0.5], [0.5])
+
+
+class UDIMMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.udim_map = UV_udim.UDIMMap.from_udims([4, 0, 2, 1, 3], [1002, 1001, 1011, 1002, 1001])
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lookups(self):
+        self.assertEqual(len(self.udim_map), 3)
+        self.assertEqual(list(self.udim_map), [1001, 1002, 1011])
+        self.assertTrue(1002 in self.udim_map)
+        self.assertFalse(1003 in self.udim_map)
+        self.assertFalse(2000 in self.udim_map)
+        self.assertEqual(self.udim_map[1002].tolist(), [4, 1])
+        self.assertRaises(KeyError, lambda: self.udim_map[1003])
+        self.assertRaises(KeyError, lambda: self.udim_map[2000])
+
+    def test_offsets_must_fit_the_keys(self):
+        self.assertRaises(ValueError, UV_udim.UDIMMap, [1001, 1002], [0, 2], [0, 1])
+
+    def test_udim_of(self):
+        self.assertEqual([self.udim_map.udim_of(poly) for poly in range(5)], [1001, 1002, 1011, 1001, 1002])
+
+    def test_udim_of_missing_polys(self):
+        udim_map = UV_udim.UDIMMap.from_udims([1, 4], [1001, 1002])
+        self.assertEqual([udim_map.udim_of(poly) for poly in (-1, 0, 2, 3, 5)], [None] * 5)
+        self.assertEqual(UV_udim.UDIMMap([], [0], []).udim_of(0), None)
+
+    def test_bytes_round_trip(self):
+        data = self.udim_map.tobytes()
+        self.assertEqual(len(data), (4 + 3 + 4 + 5) * 4)
+        self.assertEqual(as_dict(UV_udim.UDIMMap.frombytes(data)), as_dict(self.udim_map))
+
+    def test_empty_round_trip(self):
+        udim_map = UV_udim.UDIMMap.frombytes(UV_udim.UDIMMap([], [0], []).tobytes())
+        self.assertEqual(len(udim_map), 0)
+        self.assertEqual(udim_map.polys.tolist(), [])
+
+    def test_fromarray_keeps_views(self):
+        data = np.frombuffer(self.udim_map.tobytes(), dtype="<i4")
+        udim_map = UV_udim.UDIMMap.fromarray(data)
+        self.assertTrue(np.may_share_memory(udim_map.polys, data))
+
+    def test_bad_data(self):
+        data = self.udim_map.tobytes()
+        self.assertRaises(ValueError, UV_udim.UDIMMap.frombytes, b"\0" * len(data))
+        self.assertRaises(ValueError, UV_udim.UDIMMap.frombytes, data[:8])
+        self.assertRaises(ValueError, UV_udim.UDIMMap.frombytes, data[:-4])
+        self.assertRaises(ValueError, UV_udim.UDIMMap.frombytes, data + data[-4:])
+
+    def test_file_round_trip(self):
+        path = os.path.join(self.directory, "map.bin")
+        self.udim_map.write(path)
+        self.assertEqual(as_dict(UV_udim.UDIMMap.read(path)), as_dict(self.udim_map))
+        self.assertEqual(as_dict(UV_udim.UDIMMap.read(path, mmap=True)), as_dict(self.udim_map))
+
+    def test_read_after_a_header(self):
+        """A map behind a header is read with the offset, e.g. from the UV_cache files"""
+        path = os.path.join(self.directory, "map.bin")
+        with open(path, "wb") as map_file:
+            map_file.write(b"x" * 48 + self.udim_map.tobytes())
+
+        for mmap in (False, True):
+            udim_map = UV_udim.UDIMMap.read(path, mmap=mmap, offset=48)
+            self.assertEqual(as_dict(udim_map), as_dict(self.udim_map))
+            self.assertEqual(udim_map.udim_of(2), 1011)
+
+    def test_merge_with_bases(self):
+        first = UV_udim.UDIMMap.from_udims([0, 1, 2], [1001, 1002, 1001])
+        second = UV_udim.UDIMMap.from_udims([0, 1], [1002, 1011])
+        merged = UV_udim.UDIMMap.merge([first, second], bases=[0, 3])
+        self.assertEqual(as_dict(merged), {1001: [0, 2], 1002: [1, 3], 1011: [4]})
+        self.assertEqual(merged.udim_of(4), 1011)
+
+    def test_merge_without_bases(self):
+        first = UV_udim.UDIMMap.from_udims([0], [1001])
+        second = UV_udim.UDIMMap.from_udims([0], [1002])
+        self.assertEqual(as_dict(UV_udim.UDIMMap.merge([first, second])), {1001: [0], 1002: [0]})
+        self.assertEqual(len(UV_udim.UDIMMap.merge([])), 0)
+
+
+class SnapBordersTest(unittest.TestCase):
+
+    def test_corners_move_towards_the_center(self):
+        # A quad from u 1 to 1.5 whose corners lie on the border at u = 1 and v = 0
+        uvs = [(1.0, 0.0), (1.5, 0.0), (1.5, 0.5), (1.0, 0.5)]
+        corners, new_uvs = UV_udim.snap_borders(uvs, [0, 0, 0, 0], offset=0.01)
+        self.assertEqual(corners.tolist(), [0, 1, 3])
+        np.testing.assert_allclose(new_uvs, [(1.01, 0.01), (1.5, 0.01), (1.01, 0.5)])
+
+    def test_corners_near_a_border(self):
+        """Corners closer than epsilon count as on the border"""
+        uvs = [(0.9999999, 0.5), (0.99, 0.5), (0.5, 0.9), (0.5, 0.1)]
+        corners, new_uvs = UV_udim.snap_borders(uvs, [0, 0, 0, 0], offset=0.01)
+        self.assertEqual(corners.tolist(), [0])
+        np.testing.assert_allclose(new_uvs, [(0.99, 0.5)])
+
+    def test_negative_borders(self):
+        uvs = [(-1.0, -0.5), (-1.5, -0.5), (-1.5, -0.2)]
+        corners, new_uvs = UV_udim.snap_borders(uvs, [0, 0, 0], offset=0.01)
+        self.assertEqual(corners.tolist(), [0])
+        np.testing.assert_allclose(new_uvs, [(-1.01, -0.5)])
+
+    def test_center_on_the_border(self):
+        """A polygon centered on a border is moved right from 0 and left from other borders"""
+        uvs = [(0.0, 0.2), (0.0, 0.4), (2.0, 0.2), (2.0, 0.4)]
+        corners, new_uvs = UV_udim.snap_borders(uvs, [0, 0, 1, 1], offset=0.01)
+        self.assertEqual(corners.tolist(), [0, 1, 2, 3])
+        np.testing.assert_allclose(new_uvs[:, 0], [0.01, 0.01, 1.99, 1.99])
+
+    def test_nothing_on_a_border(self):
+        corners, new_uvs = UV_udim.snap_borders([(0.5, 0.5), (0.6, 0.5), (0.6, 0.6)], [0, 0, 0])
+        self.assertEqual(len(corners), 0)
+        self.assertEqual(new_uvs.shape, (0, 2))
+
+
+class UDIMAssignmentTest(unittest.TestCase):
+
+    def test_update_returns_the_changed_polys(self):
+        offsets = [0, 3, 6, 9]
+        uvs = np.array([(0.1, 0.1), (0.2, 0.1), (0.1, 0.2)] * 3)
+        uvs[3:6, 0] += 1.0
+        assignment = UV_udim.UDIMAssignment(offsets, uvs)
+        self.assertEqual(assignment.udims.tolist(), [1001, 1002, 1001])
+        self.assertEqual(assignment.set_names(), set(["$UDIM:1001", "$UDIM:1002"]))
+
+        # Poly 0 moves to 1011, poly 2 moves inside of 1001
+        uvs[0:3, 1] += 1.0
+        uvs[6:9] += 0.05
+        changed, old_udims = assignment.update(offsets, uvs)
+        self.assertEqual(changed.tolist(), [0, 2])
+        self.assertEqual(old_udims.tolist(), [1001, 1001])
+        self.assertEqual(as_dict(assignment.udim_map()), {1001: [2], 1002: [1], 1011: [0]})
+
+        changed, old_udims = assignment.update(offsets, uvs)
+        self.assertEqual(len(changed), 0)
+
+    def test_update_needs_the_same_polys(self):
+        assignment = UV_udim.UDIMAssignment([0, 3], [(0.1, 0.1), (0.2, 0.1), (0.1, 0.2)])
+        self.assertRaises(ValueError, assignment.update, [0, 3, 6], [(0.1, 0.1), (0.2, 0.1), (0.1, 0.2)] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()